@@ -1,9 +1,6 @@
 import streamlit as st
-from utils.io import load_data, filter_by_region
-import sections.intro as intro
-import sections.overview as overview
-import sections.deep_dives as deep_dives
-import sections.conclusions as conclusions
+from utils.io import load_data, filter_by_region, REGIONS
+from utils.profiling import env_enabled, start_run, end_run, probe, render_report
 
 st.set_page_config(page_title="EEG Analytics", layout="wide")
 
@@ -31,36 +28,61 @@ def main():
     # --- Sidebar Filter (ONLY Brain Region) ---
     st.sidebar.header("Analysis Focus (分析焦点)")
     
-    region_options = [
-        "All Sensors (All Regions)", 
-        "Frontal Lobe (AF7 AF8)", 
-        "Temporal Lobe (TP9 TP10)"
-    ]
-    
     selected_region = st.sidebar.selectbox(
         "Select Brain Region (选择大脑区域)",
-        options=region_options,
+        options=REGIONS,
         index=0
     )
     
-    # Load Data
-    df = load_data()
-    
+    profiling = st.sidebar.toggle("Profiler (性能分析)", value=env_enabled(),
+                                  help="Time every section and prep/viz call, count cache hits and chart payload sizes")
+    start_run(profiling)
+
     # Get active sensors based on filter (e.g., returns ['1', '2'] for Frontal)
-    active_sensors = filter_by_region(df, selected_region)
+    active_sensors = filter_by_region(None, selected_region)
+
+    # --- Pages ---
+    # 每次交互只运行当前页面；数据集只在需要它的页面里加载（按缓存共享）
+    # 页面模块在首次打开时才导入：plotly / sklearn / scipy 不拖慢首页
+    def intro_page():
+        import sections.intro as intro
+        intro.render()
+
+    def overview_page():
+        import sections.overview as overview
+        # Overview (Uses full data usually, or filtered if preferred)
+        overview.render(load_data())
+
+    def deep_dives_page():
+        import sections.deep_dives as deep_dives
+        # Deep Dive (Passes the filtered sensor list to generate specific charts)
+        deep_dives.render(load_data(), active_sensors)
+
+    def conclusions_page():
+        import sections.conclusions as conclusions
+        conclusions.render(load_data())
+
+    def live_page():
+        import sections.live as live
+        live.render(active_sensors)
+
+    page = st.navigation([
+        st.Page(intro_page, title="Introduction (介绍)", default=True),
+        st.Page(overview_page, title="Overview (概览)"),
+        st.Page(deep_dives_page, title="Deep Dives (深度分析)"),
+        st.Page(conclusions_page, title="Conclusions (结论)"),
+        st.Page(live_page, title="Live Stream (实时流)"),
+    ])
+    try:
+        with probe("section", page.title):
+            page.run()
+    except BaseException:
+        # st.rerun / st.stop 等中断本次运行时也要结束记录（tracemalloc 按记录数引用计数）
+        end_run()
+        raise
+
+    render_report(end_run())
 
-    # --- Render Sections ---
-    intro.render(df)
-    
-    # Overview (Uses full data usually, or filtered if preferred)
-    overview.render(df) 
-    
-    # Deep Dive (Passes the filtered sensor list to generate specific charts)
-    deep_dives.render(df, active_sensors)
-    
-    conclusions.render()
-    
-    
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""
+Headless benchmark of the data-prep and chart functions.
+
+For every (scale, width) a synthetic dataset with the mental-state.csv
+schema is written to a scratch directory, loaded through utils.io, and
+each case is run with empty Streamlit caches:
+  seconds       cold wall time (caches cleared first; every case runs
+                once before the first measurement, so one-time imports
+                such as sklearn inside the first PCA fit are not counted)
+  warm_seconds  second call (cache hits)
+  peak_mb       tracemalloc peak of a separate cold run
+  figure_kb     size of fig.to_json(), i.e. what the browser receives
+
+Results are compared with a stored baseline; any metric above
+baseline x tolerance is reported and the exit status is 1.
+
+    python -m benchmarks.run                          # 1x and 10x rows
+    python -m benchmarks.run --scales 1 10 100 1000 --widths 1 4
+    python -m benchmarks.run --update-baseline
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from streamlit import logger as st_logger
+# 无 Streamlit 服务器时缓存装饰器会提示 "No runtime found"，这里静音（需在导入 utils 之前）
+st_logger.set_log_level("error")
+from utils.io import attach_labels, read_dataset, get_sensor_meta
+from utils.prep import (
+    get_feature_types,
+    get_pca,
+    get_correlation_engine,
+    get_correlation_network,
+    get_sample_indices,
+    prepare_brain_map_data,
+    prepare_spectrum_data,
+    prepare_violin_stats,
+)
+from utils.viz import (
+    plot_pca_analysis,
+    plot_covariance_matrix,
+    plot_frequency_spectrum,
+    plot_violin_comparison,
+    plot_violin_summary,
+    plot_parallel_coordinates,
+    plot_feature_correlation_network,
+)
+from core import cache as core_cache
+from core.compact import compact_enabled, compact_frame
+from benchmarks.synthetic import write_synthetic_csv
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# 允许的退化倍数（时间另加固定余量，避免毫秒级用例因抖动误报）
+TOLERANCE = {"seconds": 1.5, "peak_mb": 1.25, "figure_kb": 1.10}
+TIME_SLACK = 0.05
+ALL_SENSORS = list(get_sensor_meta().keys())
+
+def _network(df):
+    feature_types = get_feature_types(df)
+    types = ("mean", "std", "skew")
+    network = get_correlation_network(df, feature_types, types, top_n=120, threshold=0.7)
+    return plot_feature_correlation_network(network, feature_types, list(types), threshold=0.7)
+
+# (名称, 函数)：与页面上的调用方式一致
+CASES = [
+    ("get_feature_types", get_feature_types),
+    ("prepare_brain_map_data", lambda df: prepare_brain_map_data(df, "mean", ALL_SENSORS)),
+    ("plot_pca_analysis", lambda df: plot_pca_analysis(get_pca(df), df["Label"])[0]),
+    ("plot_covariance_matrix",
+     lambda df: plot_covariance_matrix(get_correlation_engine(df, get_feature_types(df)["covM"]), "covM")),
+    ("plot_frequency_spectrum",
+     lambda df: plot_frequency_spectrum(prepare_spectrum_data(df, ALL_SENSORS), layout="overlay")),
+    ("plot_violin_comparison", lambda df: plot_violin_comparison(df, "mean", ALL_SENSORS)),
+    ("plot_violin_summary", lambda df: plot_violin_summary(prepare_violin_stats(df, "mean", ALL_SENSORS), "mean")),
+    ("plot_parallel_coordinates",
+     lambda df: plot_parallel_coordinates(df, get_sample_indices(df, budget=3000))),
+    ("plot_feature_correlation_network", _network),
+]
+
+def _clear_caches():
+    core_cache.clear()   # utils 层下即 Streamlit 缓存
+    gc.collect()
+
+def _figure_kb(result):
+    if hasattr(result, "to_plotly_json"):   # 只统计 Plotly 图表
+        return len(result.to_json()) / 1024
+    return None
+
+def _measure(fn, *args):
+    """
+    Cold time, warm time, peak memory and figure size of fn(*args)
+    """
+    _clear_caches()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    fn(*args)
+    warm = time.perf_counter() - start
+
+    _clear_caches()
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "warm_seconds": warm,
+            "peak_mb": peak / 2 ** 20, "figure_kb": _figure_kb(result)}
+
+def _load(path):
+    """
+    load_data without the Streamlit wrapper: cold = CSV parse + cache
+    write, warm = memory-mapped binary cache (plus the float32 conversion
+    under EEG_COMPACT=1)
+    """
+    df = attach_labels(read_dataset(path))
+    return compact_frame(df) if compact_enabled() else df
+
+def _warm_up(selected, df):
+    """
+    Runs every case once, so that the modules imported lazily inside the
+    prep / chart functions (sklearn, scipy...) are loaded before timing
+    """
+    for _, fn in selected:
+        fn(df)
+
+def run_suite(scales, widths, cases=None, workdir=None):
+    selected = [c for c in CASES if cases is None or c[0] in cases]
+    results, warmed = {}, False
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)   # 二进制缓存 data/.cache/ 写到临时目录
+        try:
+            for width in widths:
+                for scale in scales:
+                    tag = f"scale={scale},width={width}"
+                    path = os.path.join(tmp, f"synthetic_{scale}x_{width}w.csv")
+                    rows, cols = write_synthetic_csv(path, scale, width)
+                    print(f"[{tag}] {rows} rows x {cols} columns", flush=True)
+                    if cases is None or "load_data" in cases:
+                        results[f"{tag}:load_data"] = _measure(_load, path)
+                        _report_line(tag, "load_data", results[f"{tag}:load_data"])
+                    df = _load(path)
+                    if not warmed:
+                        _warm_up(selected, df)
+                        warmed = True
+                    for name, fn in selected:
+                        results[f"{tag}:{name}"] = _measure(fn, df)
+                        _report_line(tag, name, results[f"{tag}:{name}"])
+                    del df
+                    os.remove(path)
+        finally:
+            os.chdir(cwd)
+    return results
+
+def _report_line(tag, name, r):
+    fig = "-" if r["figure_kb"] is None else f"{r['figure_kb']:.1f} KB"
+    print(f"  {name:34s} {r['seconds']:8.3f}s cold {r['warm_seconds']:8.4f}s warm "
+          f"{r['peak_mb']:9.1f} MB peak  fig {fig}", flush=True)
+
+def compare(results, baseline):
+    """
+    Rows of (case, metric, baseline, current, ratio, regressed)
+    """
+    rows = []
+    for key, current in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, factor in TOLERANCE.items():
+            b, c = base.get(metric), current.get(metric)
+            if b is None or c is None:
+                continue
+            limit = b * factor + (TIME_SLACK if metric == "seconds" else 0)
+            rows.append((key, metric, b, c, c / b if b else float("inf"), c > limit))
+    return rows
+
+def write_report(rows, path):
+    lines = ["| case | metric | baseline | current | ratio | |", "|---|---|---:|---:|---:|---|"]
+    for key, metric, b, c, ratio, regressed in rows:
+        lines.append(f"| {key} | {metric} | {b:.3f} | {c:.3f} | {ratio:.2f}x | {'REGRESSION' if regressed else 'ok'} |")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark prep and chart functions on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10],
+                        help="row multiples of the 2479-row dataset (100 and 1000 need tens of GB of RAM)")
+    parser.add_argument("--widths", type=int, nargs="+", default=[1],
+                        help="spectrum width multiples (more freq_* columns)")
+    parser.add_argument("--cases", nargs="+", help="subset of case names (load_data, plot_pca_analysis, ...)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--output", help="write raw results as JSON")
+    parser.add_argument("--report", help="write the baseline comparison as a Markdown table")
+    parser.add_argument("--workdir", help="scratch directory for the synthetic CSVs")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scales, args.widths, args.cases, args.workdir)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --update-baseline first")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        rows = compare(results, json.load(f))
+    if args.report:
+        write_report(rows, args.report)
+    regressions = [r for r in rows if r[5]]
+    for key, metric, b, c, ratio, _ in regressions:
+        print(f"REGRESSION {key} {metric}: {b:.3f} -> {c:.3f} ({ratio:.2f}x)")
+    print(f"{len(rows)} comparisons, {len(regressions)} regressions")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
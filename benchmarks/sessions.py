@@ -0,0 +1,107 @@
+"""
+Memory of one dataset held by N concurrent processes.
+
+For each mode, N worker processes import the app's modules, then load a
+synthetic dataset with the mental-state.csv schema and read every column.
+Each reports its proportional set size (PSS, shared pages split between
+the processes mapping them) before and after loading, after a warm-up on
+the first rows so pandas' one-time initialization is not counted. The
+sum of the differences is the physical memory the N copies of the
+dataset cost:
+  shared   core.shared.load_shared: one segment in shared memory
+  mapped   core.io.load_dataset with EEG_SHARED=0: the binary cache,
+           memory-mapped copy-on-write per process
+  private  pd.read_csv in every process
+"extra" is the cost of each process after the first, as a fraction of
+the first one's. The exit status is 1 when it exceeds --budget in the
+shared mode. Linux only (/proc/self/smaps_rollup).
+
+    python -m benchmarks.sessions
+    python -m benchmarks.sessions --processes 10 --scale 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("shared", "mapped", "private")
+
+WORKER = """
+import sys
+import numpy as np
+import pandas as pd
+from core.io import load_dataset, read_dataset, attach_labels
+from core.shared import load_shared
+
+def pss_kb():
+    with open("/proc/self/smaps_rollup") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+
+def touch(df):
+    return sum(float(np.sum(df[c].to_numpy())) for c in df.columns if c != "Label")   # 读到每一页
+
+mode, path = sys.argv[1:3]
+touch(attach_labels(pd.read_csv(path, nrows=8)))   # pandas 的一次性初始化不计入数据集
+print("imported", flush=True); sys.stdin.readline()
+before = pss_kb()
+df = {"shared": load_shared, "mapped": load_dataset,
+      "private": lambda p: attach_labels(read_dataset(p, use_cache=False))}[mode](path)
+touch(df)
+print("loaded", flush=True); sys.stdin.readline()
+print(pss_kb() - before, flush=True)
+"""
+
+def measure(mode, path, processes):
+    """
+    PSS increase of each of processes concurrent workers, in MB
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT, EEG_SHARED="0" if mode == "mapped" else "1")
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER, mode, path], cwd=os.path.dirname(path),
+                                env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(processes)]
+    # 两道栅栏：所有进程导入完毕后才记录基线，全部加载完毕后才读取 PSS，共享库的分摊在两次测量之间不变
+    for barrier in ("imported", "loaded"):
+        for w in workers:
+            assert w.stdout.readline().strip() == barrier
+        for w in workers:
+            w.stdin.write("\n")
+            w.stdin.flush()
+    deltas = [int(w.stdout.readline()) / 1024 for w in workers]
+    for w in workers:
+        w.wait()
+    return deltas
+
+def run(processes=10, scale=1):
+    with tempfile.TemporaryDirectory() as tmp:
+        from benchmarks.synthetic import write_synthetic_csv
+        path = os.path.join(tmp, "mental-state.csv")
+        write_synthetic_csv(path, scale=scale)
+        measure("mapped", path, 1)   # 预热：建立二进制缓存
+        return {mode: {n: sum(measure(mode, path, n)) for n in (1, processes)} for mode in MODES}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dataset memory of N concurrent processes")
+    parser.add_argument("--processes", type=int, default=10)
+    parser.add_argument("--scale", type=int, default=1, help="row multiple of the synthetic dataset")
+    parser.add_argument("--budget", type=float, default=0.25,
+                        help="largest shared-mode cost of each extra process, as a fraction of the first")
+    args = parser.parse_args(argv)
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("needs /proc/self/smaps_rollup (Linux)")
+        return 1
+
+    results = run(args.processes, args.scale)
+    n = args.processes
+    extra = {mode: (totals[n] - totals[1]) / max(n - 1, 1) / totals[1] for mode, totals in results.items()}
+    print(f"{'mode':10s} {'1 process':>12s} {f'{n} processes':>14s} {'extra':>7s}")
+    for mode, totals in results.items():
+        print(f"{mode:10s} {totals[1]:10.1f}MB {totals[n]:12.1f}MB {extra[mode]:7.2f}")
+    if extra["shared"] > args.budget:
+        print(f"OVER BUDGET shared {extra['shared']:.2f} > {args.budget:.2f}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Cold-start benchmark of the Streamlit app.
+
+Each repeat starts a fresh interpreter with `python -X importtime`,
+imports Streamlit's test runner and runs a one-line script once (the
+server has Streamlit loaded and initialized before the app's first run,
+so none of that is counted), then times the first run of app.py, i.e.
+the sidebar plus the default Introduction page:
+  seconds     wall time of the first script run (first paint)
+  import_s    time spent importing modules during that run
+  top         the slowest imports (cumulative) of that run
+  deferred    heavy packages that should only load on the pages using them
+
+The dataset's binary cache is built once before timing, as it would be
+after the first start. Without data/mental-state.csv a synthetic one is
+used. The exit status is 1 when the median exceeds the budget or a
+deferred package was imported.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 5 --budget 0.8 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 只在深度分析 / 实时页面需要的重型依赖；首页的计数读自缓存元数据，pandas 也不应导入
+DEFERRED = ("sklearn", "plotly", "scipy", "pandas")
+APP_FILES = ("app.py", "assets", "core", "sections", "utils")
+
+DRIVER = """
+import json, sys, time
+from streamlit import logger
+logger.set_log_level("error")
+from streamlit.testing.v1 import AppTest
+AppTest.from_string("import streamlit as st; st.write('warm-up')").run()   # 测试运行器自身的初始化
+at = AppTest.from_file("app.py", default_timeout=120)
+sys.stderr.write("#app\\n"); sys.stderr.flush()
+start = time.perf_counter()
+at.run()
+seconds = time.perf_counter() - start
+sys.stderr.write("#done\\n"); sys.stderr.flush()
+print(json.dumps({"seconds": seconds, "exceptions": [e.message for e in at.exception]}))
+"""
+
+def parse_importtime(stderr):
+    """
+    (name, self_us, cumulative_us, depth) of every module imported between
+    the driver's #app and #done markers
+    """
+    rows, inside = [], False
+    for line in stderr.splitlines():
+        if line.startswith("#app"):
+            inside = True
+        elif line.startswith("#done"):
+            break
+        elif inside and line.startswith("import time:") and "|" in line:
+            self_us, cumulative, name = line[len("import time:"):].split("|")
+            if not self_us.strip().isdigit():
+                continue   # 表头
+            depth = (len(name) - len(name.lstrip())) // 2
+            rows.append((name.strip(), int(self_us), int(cumulative), depth))
+    return rows
+
+def run_once(workdir):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", DRIVER], cwd=workdir,
+                          capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(proc.stderr)
+    base = min((d for _, _, _, d in rows), default=0)
+    result["import_s"] = sum(c for _, _, c, d in rows if d == base) / 1e6
+    result["top"] = [(n, c / 1e6) for n, _, c, d in sorted(rows, key=lambda r: -r[2])[:10]]
+    result["deferred"] = sorted({n.split(".")[0] for n, _, _, _ in rows if n.split(".")[0] in DEFERRED})
+    return result
+
+def _workdir(tmp):
+    """
+    The repo itself when the real dataset is present, otherwise a scratch
+    copy of the app (symlinks) with a synthetic dataset
+    """
+    if os.path.exists(os.path.join(ROOT, "data", "mental-state.csv")):
+        return ROOT
+    for name in APP_FILES:
+        os.symlink(os.path.join(ROOT, name), os.path.join(tmp, name))
+    os.makedirs(os.path.join(tmp, "data"))
+    from benchmarks.synthetic import write_synthetic_csv
+    write_synthetic_csv(os.path.join(tmp, "data", "mental-state.csv"))
+    return tmp
+
+def run(repeat=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = _workdir(tmp)
+        run_once(workdir)   # 预热：建立二进制缓存
+        return [run_once(workdir) for _ in range(repeat)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's first paint on a cold interpreter")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds allowed for the median first run")
+    parser.add_argument("--output", help="write the runs as JSON")
+    args = parser.parse_args(argv)
+
+    runs = run(args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(runs, f, indent=1)
+    median = statistics.median(r["seconds"] for r in runs)
+    imports = statistics.median(r["import_s"] for r in runs)
+    print(f"first paint {median:.3f}s median of {len(runs)} (imports {imports:.3f}s), budget {args.budget:.3f}s")
+    print("slowest imports:")
+    for name, seconds in runs[-1]["top"]:
+        print(f"  {name:50s} {seconds:7.3f}s")
+    failed = False
+    for r in runs:
+        for message in r["exceptions"]:
+            print(f"EXCEPTION {message}")
+            failed = True
+    deferred = sorted({p for r in runs for p in r["deferred"]})
+    if deferred:
+        print(f"DEFERRED packages imported on the first page: {', '.join(deferred)}")
+        failed = True
+    if median > args.budget:
+        print(f"OVER BUDGET {median:.3f}s > {args.budget:.3f}s")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
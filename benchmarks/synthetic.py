@@ -0,0 +1,49 @@
+"""
+Synthetic datasets with the column schema of mental-state.csv.
+
+Column names come from utils.features, so the schema (families, lag1_
+prefix, dropped redundant lag columns, freq bins) is exactly what the
+feature extractor writes. `width` widens the spectrum: the window is
+resampled to width x 150 points, which adds freq_* bins per sensor while
+keeping every other family unchanged.
+"""
+import numpy as np
+import pandas as pd
+from utils.features import N_SAMPLES, REDUNDANT_LAG, window_feature_names
+
+BASE_ROWS = 2479   # mental-state.csv 的行数
+N_LABELS = 3
+
+def synthetic_columns(width=1):
+    names = window_feature_names(n_samples=N_SAMPLES * width)
+    columns = ["lag1_" + c for c in names] + names
+    return [c for c in columns if not c.startswith(REDUNDANT_LAG)] + ["Label"]
+
+def synthetic_frame(scale=1, width=1, seed=0, block_rows=50_000):
+    """
+    BASE_ROWS x scale rows; every column is Gaussian with a per-label shift,
+    so states are separable to a similar degree as in the real data
+    """
+    rng = np.random.default_rng(seed)
+    columns = synthetic_columns(width)
+    n_rows, n_features = BASE_ROWS * scale, len(columns) - 1
+    shift = rng.normal(size=(N_LABELS, n_features))
+    spread = rng.uniform(1, 20, size=n_features)
+    offset = rng.normal(scale=50, size=n_features)
+    labels = rng.integers(0, N_LABELS, size=n_rows)
+
+    values = np.empty((n_rows, n_features))
+    # 分块生成，避免同时存在多份 (行 x 列) 临时数组
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        block = rng.standard_normal((stop - start, n_features))
+        block += shift[labels[start:stop]]
+        values[start:stop] = block * spread + offset
+    df = pd.DataFrame(values, columns=columns[:-1], copy=False)
+    df["Label"] = labels.astype(np.float64)
+    return df
+
+def write_synthetic_csv(path, scale=1, width=1, seed=0):
+    df = synthetic_frame(scale, width, seed)
+    df.to_csv(path, index=False)
+    return df.shape
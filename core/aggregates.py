@@ -0,0 +1,129 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# 立方体的统计量轴
+STATS = ("mean", "std", "count", "min", "q25", "median", "q75", "max")
+_QUANTILES = (0.25, 0.5, 0.75)
+
+class StateAggregates:
+    """
+    Per-label statistics of every column as a (label x column x statistic) cube.
+    The column axis is aligned with df.columns, so FeatureSchema positions
+    index it directly; non-numeric columns (e.g. Label) hold NaN.
+    """
+
+    def __init__(self, labels, columns, cube):
+        self.labels = list(labels)
+        self.columns = list(columns)
+        self.cube = cube
+        self._stat_index = {s: i for i, s in enumerate(STATS)}
+
+    def take(self, positions, stat="mean"):
+        """
+        (label x len(positions)) array of one statistic
+        """
+        return self.cube[:, np.asarray(positions, dtype=np.intp), self._stat_index[stat]]
+
+    def frame(self, positions, stat="mean"):
+        """
+        Same slice as take(), as a DataFrame indexed by label
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        return pd.DataFrame(self.take(positions, stat),
+                            index=pd.Index(self.labels, name="Label"),
+                            columns=[self.columns[i] for i in positions])
+
+def compute_state_aggregates(df, label_col="Label", label_names=None):
+    """
+    Computes STATS for every numeric column and every label.
+    Rows are sorted by label once; each label is then one contiguous block
+    reduced over all columns at the same time.
+    """
+    numeric = [i for i, (c, t) in enumerate(zip(df.columns, df.dtypes))
+               if c != label_col and pd.api.types.is_numeric_dtype(t)]
+    codes, uniques = pd.factorize(df[label_col], sort=True)
+    label_names = label_names or {}
+    labels = [label_names.get(u, u) for u in uniques]
+
+    values = df.iloc[:, numeric].to_numpy(dtype=np.float64)
+    return aggregate_matrix(values, codes, labels, df.columns, numeric)
+
+def aggregate_matrix(values, codes, labels, columns, positions):
+    """
+    Same cube from a (rows x features) matrix whose columns sit at
+    `positions` of `columns` (e.g. the float32 matrix of core.compact);
+    statistics keep the matrix dtype until they are written to the cube
+    """
+    order = np.argsort(codes, kind="stable")
+    values = values[order]
+    bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+
+    cube = np.full((len(labels), len(columns), len(STATS)), np.nan)
+    for k in range(len(labels)):
+        block = values[bounds[k]:bounds[k + 1]]
+        if block.shape[0] == 0:
+            continue
+        with warnings.catch_warnings():
+            # 全 NaN 的列得到 NaN 即可，不需要警告
+            warnings.simplefilter("ignore", RuntimeWarning)
+            stats = _block_stats(block)
+        for s, name in enumerate(STATS):
+            cube[k, positions, s] = stats[name]
+    return StateAggregates(labels, columns, cube)
+
+def _block_stats(block):
+    q25, median, q75 = np.nanquantile(block, _QUANTILES, axis=0)
+    return {
+        "mean": np.nanmean(block, axis=0),
+        # ddof=1 与 pandas 的 std 一致（单行时为 NaN）
+        "std": np.nanstd(block, axis=0, ddof=1),
+        "count": np.sum(~np.isnan(block), axis=0),
+        "min": np.nanmin(block, axis=0),
+        "q25": q25,
+        "median": median,
+        "q75": q75,
+        "max": np.nanmax(block, axis=0),
+    }
+
+class SpectrumTensor:
+    """
+    (state x sensor x frequency bin) tensors of the freq features: mean,
+    variance and a 95% confidence half-width of the mean, plus the matching
+    (state x sensor x column) mean of the topFreq features.
+    Gathered once from a StateAggregates cube; switching or overlaying
+    sensors only indexes these arrays.
+    """
+
+    def __init__(self, agg, schema, sensors, lag=0):
+        self.labels = agg.labels
+        self.sensors = list(sensors)
+        bins = sorted({int(b) for s in self.sensors for b in schema.spectrum(s, lag)[0]})
+        self.freq_bins = np.array(bins, dtype=np.int64)
+        bin_index = {b: i for i, b in enumerate(bins)}
+
+        shape = (len(self.labels), len(self.sensors), len(bins))
+        self.mean = np.full(shape, np.nan)
+        self.var = np.full(shape, np.nan)
+        self.ci95 = np.full(shape, np.nan)
+        for k, sensor in enumerate(self.sensors):
+            sensor_bins, positions = schema.spectrum(sensor, lag)
+            slots = [bin_index[int(b)] for b in sensor_bins]
+            std = agg.take(positions, "std")
+            count = agg.take(positions, "count")
+            self.mean[:, k, slots] = agg.take(positions, "mean")
+            self.var[:, k, slots] = std ** 2
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.ci95[:, k, slots] = 1.96 * std / np.sqrt(count)
+
+        # topFreq：每个传感器一组列（含 lag1_），按列位置顺序
+        top_positions = [schema.select("topFreq", sensor=s) for s in self.sensors]
+        width = max((len(p) for p in top_positions), default=0)
+        self.top_freq_columns = []
+        self.top_freq_mean = np.full((len(self.labels), len(self.sensors), width), np.nan)
+        for k, positions in enumerate(top_positions):
+            self.top_freq_columns.append([agg.columns[i] for i in positions])
+            self.top_freq_mean[:, k, :len(positions)] = agg.take(positions, "mean")
+
+    def sensor_index(self, sensor):
+        return self.sensors.index(sensor)
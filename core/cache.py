@@ -0,0 +1,106 @@
+"""
+Pluggable memoization for the analytics core.
+
+@memoize follows the st.cache_data convention: arguments whose name
+starts with "_" are left out of the key, so cached functions take the
+dataset fingerprint explicitly and the frame as `_df`. Where results are
+kept is decided by the active backend:
+  MemoryBackend  per-process LRU (default: batch jobs, notebooks, workers)
+  NullBackend    no caching
+The Streamlit app installs utils.profiling.StreamlitCacheBackend, which
+maps kind="data" / "resource" onto st.cache_data / st.cache_resource.
+"""
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+
+class MemoryBackend:
+    """
+    One LRU per function, shared by all threads of the process; results
+    are returned as-is (not copied), so callers must not modify them
+    """
+
+    def __init__(self):
+        self._stores = []
+
+    def wrap(self, fn, kind, max_entries):
+        signature = inspect.signature(fn)
+        store = OrderedDict()
+        lock = threading.Lock()
+        self._stores.append((store, lock))
+
+        @functools.wraps(fn)
+        def cached(*args, **kwargs):
+            key = _key(signature, args, kwargs)
+            with lock:
+                if key in store:
+                    store.move_to_end(key)
+                    return store[key]
+            value = fn(*args, **kwargs)   # 在锁外计算，慢函数不阻塞其他键
+            with lock:
+                store[key] = value
+                if max_entries is not None:
+                    while len(store) > max_entries:
+                        store.popitem(last=False)
+            return value
+        return cached
+
+    def clear(self):
+        for store, lock in self._stores:
+            with lock:
+                store.clear()
+
+class NullBackend:
+    def wrap(self, fn, kind, max_entries):
+        return fn
+
+    def clear(self):
+        pass
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+def _key(signature, args, kwargs):
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return tuple(_freeze(v) for name, v in bound.arguments.items() if not name.startswith("_"))
+
+_backend = MemoryBackend()
+
+def get_backend():
+    return _backend
+
+def set_backend(backend):
+    """
+    Installs backend for every memoized function (takes effect on their
+    next call); returns the previous one
+    """
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+def clear():
+    _backend.clear()
+
+def memoize(kind="data", max_entries=None):
+    """
+    Caches fn in the active backend; kind="resource" marks results that
+    are shared objects (engines with internal state) rather than values
+    """
+    def decorate(fn):
+        wrapped = {}   # 后端 -> 包装后的函数，切换后端时按需重新包装
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            backend = _backend
+            impl = wrapped.get(backend)
+            if impl is None:
+                impl = wrapped[backend] = backend.wrap(fn, kind, max_entries)
+            return impl(*args, **kwargs)
+        return call
+    return decorate
@@ -0,0 +1,301 @@
+"""
+How well, and how fast, standard classifiers decode the mental state.
+
+benchmark() trains one scikit-learn model on the feature matrix, limited
+to the columns of a sensor subset (core.io.filter_by_region) and/or a
+feature family (core.schema.FEATURE_GROUPS):
+  - rows are consecutive, overlapping 1 s windows, so folds are made of
+    contiguous time blocks (BLOCK_ROWS rows, stratified over blocks), and
+    training rows next to a test row are dropped (PURGE_ROWS); lagged
+    lag1_* columns, which repeat the previous row, are not used
+  - accuracy is nested cross-validation: in each outer fold the grid
+    point is chosen by an inner time-block CV on the training part only
+  - every (fold, grid point) pair, outer and inner, is one joblib task,
+    so folds and hyperparameters run in parallel
+  - the grid point with the best outer-fold accuracy (selection_accuracy,
+    optimistic: it is the score it was picked on) is refit on all rows in
+    the calling process, which then times training and single-row
+    inference without contention from other workers
+
+Scores and the refit model are stored in data/.cache/classify/ under a
+key over (dataset fingerprint, model, columns, folds, seed, grid, CV
+scheme, scikit-learn version); a benchmark already on disk is read back
+instead of retrained. Rows without a label are dropped; missing values are
+imputed with the training fold's column means.
+
+    python -m core.classify --models logistic lda --family mean -j 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from core.io import CACHE_DIR, DATA_PATH, REGIONS, dataset_fingerprint, filter_by_region, get_sensor_meta
+from core.schema import FEATURE_GROUPS, get_schema
+
+CLASSIFY_DIR = os.path.join(CACHE_DIR, "classify")
+FOLDS = 5
+INNER_FOLDS = 3
+# 相邻行是重叠的 1 秒窗口：按连续的时间块划分折，并去掉与测试行相邻的训练行
+BLOCK_ROWS = 50
+PURGE_ROWS = 1
+CV_SCHEME = f"nested-{INNER_FOLDS}/blocks-{BLOCK_ROWS}/purge-{PURGE_ROWS}"
+LATENCY_REPEATS = 50
+
+# 模型名 -> (说明, 参数网格)；估计器在 _estimator 中按名称构建（sklearn 只在训练时导入）
+MODELS = {
+    "logistic": ("Logistic regression (逻辑回归)", {"clf__C": [0.01, 0.1, 1.0]}),
+    "lda": ("Shrinkage LDA (收缩线性判别)", {"clf__shrinkage": [0.01, 0.1, 0.5]}),
+    "knn": ("k-nearest neighbours (k近邻)", {"clf__n_neighbors": [5, 15, 31]}),
+    "random_forest": ("Random forest (随机森林)", {"clf__max_depth": [None, 12], "clf__max_features": ["sqrt", 0.05]}),
+}
+
+def _estimator(model, seed):
+    from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.impute import SimpleImputer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    classifiers = {
+        "logistic": lambda: LogisticRegression(max_iter=2000),
+        "lda": lambda: LinearDiscriminantAnalysis(solver="lsqr"),
+        "knn": lambda: KNeighborsClassifier(),
+        "random_forest": lambda: RandomForestClassifier(n_estimators=100, random_state=seed, n_jobs=1),
+    }
+    return Pipeline([("impute", SimpleImputer()), ("scale", StandardScaler()), ("clf", classifiers[model]())])
+
+def _grid(model):
+    from sklearn.model_selection import ParameterGrid
+    return list(ParameterGrid(MODELS[model][1]))
+
+def select_features(df, sensors=None, family=None):
+    """
+    Feature columns of df for a sensor subset (ids as in get_sensor_meta)
+    and/or a FEATURE_GROUPS family; None means no restriction. Covariance
+    terms need both sensors of their pair in the subset, and columns tied
+    to no sensor are kept only when the subset is all sensors. Lagged
+    columns (lag1_*) are left out: they are the previous row's features,
+    so they would carry a test row into the neighbouring training row.
+    """
+    schema = get_schema(df)
+    if family is not None:
+        columns = schema.select_columns(family=list(FEATURE_GROUPS[family]), lag=0)
+    else:
+        columns = [c for c, t in zip(df.columns, df.dtypes) if c != "Label" and pd.api.types.is_numeric_dtype(t)
+                   and getattr(schema.key_of(c), "lag", 0) == 0]
+    if sensors is None or set(sensors) >= set(get_sensor_meta()):
+        return columns
+    sensors = set(sensors)
+    selected = []
+    for column in columns:
+        key = schema.key_of(column)
+        if key is None:
+            continue
+        if key.sensor_pair is not None:
+            if set(key.sensor_pair) <= sensors:
+                selected.append(column)
+        elif key.sensor in sensors:
+            selected.append(column)
+    return selected
+
+def config_key(fingerprint, model, columns, folds, seed):
+    # 版本号取自安装元数据：只读取已存结果时不必导入 sklearn（约 1 秒）
+    from importlib.metadata import version
+    columns_hash = hashlib.sha1(json.dumps(list(columns)).encode()).hexdigest()
+    grid = json.dumps(MODELS[model][1], sort_keys=True, default=str)
+    return hashlib.sha1(json.dumps([fingerprint, model, columns_hash, folds, seed, grid, CV_SCHEME,
+                                    version("scikit-learn")]).encode()).hexdigest()
+
+def _paths(key):
+    return os.path.join(CLASSIFY_DIR, key + ".json"), os.path.join(CLASSIFY_DIR, key + ".joblib")
+
+def cached_scores(key):
+    """
+    Stored scores of a benchmark configuration, or None
+    """
+    try:
+        with open(_paths(key)[0], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_model(key):
+    """
+    The refit pipeline stored with the scores of key, or None
+    """
+    import joblib
+    try:
+        return joblib.load(_paths(key)[1])
+    except (OSError, ValueError, EOFError):
+        return None
+
+def _save(key, scores, estimator):
+    import joblib
+    scores_path, model_path = _paths(key)
+    try:
+        os.makedirs(CLASSIFY_DIR, exist_ok=True)
+        joblib.dump(estimator, model_path + ".tmp")
+        os.replace(model_path + ".tmp", model_path)
+        # 分数最后写入：它存在即表示模型文件完整
+        with open(scores_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(scores, f)
+        os.replace(scores_path + ".tmp", scores_path)
+    except OSError:
+        pass   # 只读目录：结果只在本次调用中返回
+
+def _fit_fold(model, seed, params, X, y, train, test):
+    estimator = _estimator(model, seed).set_params(**params)
+    estimator.fit(X[train], y[train])
+    return float(np.mean(estimator.predict(X[test]) == y[test]))
+
+def _matrix(df, columns):
+    """
+    Feature matrix, label codes and source row position of the labelled rows
+    """
+    labels = df["Label"]
+    codes = labels.cat.codes.to_numpy() if isinstance(labels.dtype, pd.CategoricalDtype) else pd.factorize(labels, sort=True)[0]
+    keep = codes >= 0
+    return df[list(columns)].to_numpy(dtype=np.float64)[keep], codes[keep], np.flatnonzero(keep)
+
+def time_splits(y, positions, folds, seed=0):
+    """
+    (train, test) index pairs over contiguous blocks of BLOCK_ROWS source
+    rows, stratified by label over blocks; training rows within
+    PURGE_ROWS of a test row are dropped (overlapping windows, lag1_*)
+    """
+    from sklearn.model_selection import StratifiedGroupKFold
+    groups = positions // BLOCK_ROWS
+    near = np.zeros(positions.max() + PURGE_ROWS + 2, dtype=bool)
+    splits = []
+    for train, test in StratifiedGroupKFold(n_splits=folds, shuffle=True, random_state=seed).split(positions, y, groups):
+        near[:] = False
+        for offset in range(-PURGE_ROWS, PURGE_ROWS + 1):
+            near[np.clip(positions[test] + offset, 0, None)] = True
+        splits.append((train[~near[positions[train]]], test))
+    return splits
+
+def benchmark(df, model, columns, folds=FOLDS, seed=0, n_jobs=-1, use_cache=True, train=True):
+    """
+    Scores dict of one model on df[columns]: nested-CV accuracy (mean /
+    std over the outer folds), the selected params with their own outer
+    fold score (selection_accuracy), the per-grid-point accuracies, the
+    refit time on all rows (fit_ms), single-row inference
+    latency (latency_ms, median of LATENCY_REPEATS) and batch throughput
+    (batch_us_per_row); includes "key" for cached_scores / load_model.
+    With train=False only stored scores are returned (None otherwise).
+    """
+    columns = list(columns)
+    key = config_key(dataset_fingerprint(df), model, columns, folds, seed)
+    if use_cache:
+        scores = cached_scores(key)
+        if scores is not None:
+            return scores
+    if not columns or not train:
+        return None
+    from joblib import Parallel, delayed
+
+    X, y, positions = _matrix(df, columns)
+    outer = time_splits(y, positions, folds, seed)
+    inner = [[(train[a], train[b]) for a, b in time_splits(y[train], positions[train], INNER_FOLDS, seed)]
+             for train, _ in outer]
+    grid = _grid(model)
+    # 每个 (参数组合, 折) 是一个 joblib 任务：外层折的网格（选最终参数）与各外层折内部的网格一起并行
+    tasks = [(params, train, test) for params in grid for train, test in outer]
+    tasks += [(params, train, test) for splits in inner for params in grid for train, test in splits]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(model, seed, params, X, y, train, test) for params, train, test in tasks)
+    accuracy = np.array(results[:len(grid) * folds]).reshape(len(grid), folds)
+    inner_accuracy = np.array(results[len(grid) * folds:]).reshape(folds, len(grid), INNER_FOLDS).mean(axis=2)
+    # 嵌套交叉验证：每个外层测试折只用自己训练部分上选出的参数，不参与参数选择
+    nested = np.array(Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(model, seed, grid[int(np.argmax(scores))], X, y, train, test)
+        for scores, (train, test) in zip(inner_accuracy, outer)))
+    best = int(np.argmax(accuracy.mean(axis=1)))
+
+    estimator = _estimator(model, seed).set_params(**grid[best])
+    start = time.perf_counter()
+    estimator.fit(X, y)
+    fit_s = time.perf_counter() - start
+    start = time.perf_counter()
+    estimator.predict(X)
+    batch_s = time.perf_counter() - start
+    rows = X[np.arange(LATENCY_REPEATS) % len(X)]
+    latency = []
+    for row in rows:
+        start = time.perf_counter()
+        estimator.predict(row[None, :])
+        latency.append(time.perf_counter() - start)
+
+    scores = {
+        "key": key,
+        "model": model,
+        "features": len(columns),
+        "rows": int(len(y)),
+        "folds": folds,
+        "cv": CV_SCHEME,
+        "accuracy": float(nested.mean()),
+        "accuracy_std": float(nested.std()),
+        "selection_accuracy": float(accuracy[best].mean()),
+        "best_params": dict(grid[best]),
+        "grid": [{"params": params, "accuracy": float(acc)} for params, acc in zip(grid, accuracy.mean(axis=1))],
+        "fit_ms": fit_s * 1e3,
+        "latency_ms": float(np.median(latency)) * 1e3,
+        "batch_us_per_row": batch_s / len(X) * 1e6,
+    }
+    _save(key, scores, estimator)
+    return scores
+
+def compare(df, models, sensor_sets, family=None, folds=FOLDS, seed=0, n_jobs=-1, use_cache=True, train=True):
+    """
+    One row per (sensor subset, model): nested-CV accuracy, the grid
+    score of the chosen params, latencies and accuracy per millisecond of
+    single-row inference, best first.
+    sensor_sets maps a display name to sensor ids (None = all sensors);
+    with train=False configurations not on disk are left out.
+    """
+    rows = []
+    for name, sensors in sensor_sets.items():
+        columns = select_features(df, sensors, family)
+        for model in models:
+            scores = benchmark(df, model, columns, folds, seed, n_jobs, use_cache, train)
+            if scores is None:
+                continue
+            rows.append({"Sensors": name, "Model": model, "Features": scores["features"],
+                         "Accuracy": scores["accuracy"], "Accuracy Std": scores["accuracy_std"],
+                         "Selection Accuracy": scores["selection_accuracy"],
+                         "Fit (ms)": scores["fit_ms"], "Latency (ms)": scores["latency_ms"],
+                         "Batch (us/row)": scores["batch_us_per_row"],
+                         "Accuracy / ms": scores["accuracy"] / scores["latency_ms"],
+                         "Params": json.dumps(scores["best_params"], default=str)})
+    table = pd.DataFrame(rows)
+    return table.sort_values("Accuracy / ms", ascending=False, ignore_index=True) if len(table) else table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nested cross-validated accuracy and latency of mental-state classifiers")
+    parser.add_argument("dataset", nargs="?", default=None, help="feature CSV (default: data/mental-state.csv)")
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--family", default=None, choices=list(FEATURE_GROUPS), help="one feature family (default: all)")
+    parser.add_argument("--regions", nargs="+", default=REGIONS, choices=REGIONS)
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--jobs", type=int, default=-1, help="joblib workers (default: all cores)")
+    parser.add_argument("--no-cache", action="store_true", help="retrain even when the scores are on disk")
+    args = parser.parse_args(argv)
+
+    from core.io import load_dataset
+    df = load_dataset(args.dataset or DATA_PATH)
+    sensor_sets = {region: filter_by_region(df, region) for region in args.regions}
+    table = compare(df, args.models, sensor_sets, args.family, args.folds, args.seed, args.jobs,
+                    use_cache=not args.no_cache)
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.max_colwidth", 60):
+        print(table.to_string(float_format=lambda v: f"{v:.4g}"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Compact float32 representation of a dataset.
+
+One C-ordered float32 (rows x features) matrix, the label codes and the
+column index, instead of ~1000 float64 pandas columns. With
+EEG_COMPACT=1 the app loads its dataset through compact_frame(): the
+frame's feature columns become float32 views of that one matrix and the
+float64 frame is dropped, so the dataset takes half the resident memory.
+The aggregate cube, the PCA fit and the regional row means in core.prep
+read the matrix directly (row-wise reductions read contiguous rows);
+every other chart reads the float32 columns and converts only the
+columns it asks for to float64.
+
+validate() reports how far every aggregate moves from the float64
+results, so the mode can be checked on a dataset before switching it on:
+
+    python -m core.compact data/mental-state.csv
+"""
+import argparse
+import os
+import sys
+import warnings
+import numpy as np
+import pandas as pd
+from core.aggregates import STATS, aggregate_matrix, compute_state_aggregates
+from core.pca import fit_pca, fit_pca_matrix
+from core.schema import get_schema
+
+COMPACT_ENV = "EEG_COMPACT"   # "1" / "on" 开启
+CHUNK_ROWS = 65_536
+_registry = {}   # 指纹 -> CompactDataset（compact_frame 建立的矩阵，get_compact 直接复用）
+# validate 的相对误差分母下限（相对于该统计量的最大量级）
+REL_FLOOR = 1e-6
+
+def compact_enabled():
+    return os.environ.get(COMPACT_ENV, "").lower() in ("1", "true", "yes", "on")
+
+class CompactDataset:
+    """
+    values: (rows x features) float32, C order; codes: label code per row
+    (-1 = missing); labels: name of each code; positions: position of each
+    feature column in the source frame (schema positions map through it)
+    """
+
+    def __init__(self, values, codes, labels, columns, positions):
+        self.values = values
+        self.codes = codes
+        self.labels = list(labels)
+        self.columns = list(columns)
+        self.positions = np.asarray(positions, dtype=np.intp)
+        self._index = np.full(self.positions.max() + 1 if len(self.positions) else 0, -1, dtype=np.intp)
+        self._index[self.positions] = np.arange(len(self.positions))
+
+    @classmethod
+    def from_frame(cls, df, label_col="Label", dtype=np.float32):
+        positions = [i for i, (c, t) in enumerate(zip(df.columns, df.dtypes))
+                     if c != label_col and pd.api.types.is_numeric_dtype(t)]
+        values = np.empty((len(df), len(positions)), dtype=dtype)
+        # 按行块转换，临时数组只占一个块
+        for start in range(0, len(df), CHUNK_ROWS):
+            values[start:start + CHUNK_ROWS] = df.iloc[start:start + CHUNK_ROWS, positions].to_numpy(dtype=dtype)
+        codes, uniques = pd.factorize(df[label_col], sort=True)
+        return cls(values, codes, list(uniques), [df.columns[i] for i in positions], positions)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.codes.nbytes
+
+    def columns_of(self, frame_positions):
+        """
+        Matrix columns of source-frame positions (e.g. from FeatureSchema)
+        """
+        return self._index[np.asarray(frame_positions, dtype=np.intp)]
+
+    def take(self, frame_positions):
+        return self.values[:, self.columns_of(frame_positions)]
+
+    def row_mean(self, frame_positions):
+        """
+        Mean of the given columns per row, accumulated in float64
+        """
+        return self.take(frame_positions).mean(axis=1, dtype=np.float64)
+
+    def aggregates(self, frame_columns):
+        """
+        StateAggregates cube aligned with the source frame's columns
+        """
+        return aggregate_matrix(self.values, self.codes, self.labels, frame_columns, self.positions)
+
+    def fit_pca(self, features=None, n_components=2):
+        if features is None:
+            return fit_pca_matrix(self.values, self.columns, n_components)
+        lookup = {c: j for j, c in enumerate(self.columns)}
+        return fit_pca_matrix(self.values[:, [lookup[c] for c in features]], list(features), n_components)
+
+def compact_frame(df, label_col="Label"):
+    """
+    df served from one CompactDataset: its numeric feature columns become
+    float32 column views of the matrix, the label and any other column
+    are kept as they are, and the dataset is registered under df's
+    fingerprint (lookup_compact). Once df itself is dropped, only the
+    float32 matrix stays resident.
+    """
+    from core.io import dataset_fingerprint
+    fingerprint = dataset_fingerprint(df)
+    compact = CompactDataset.from_frame(df, label_col)
+    data = {c: df[c].array for c in df.columns}
+    for j, column in enumerate(compact.columns):
+        data[column] = compact.values[:, j]   # 视图，不复制
+    frame = pd.DataFrame(data, columns=df.columns, copy=False)
+    frame.attrs["fingerprint"] = fingerprint
+    _registry[fingerprint] = compact
+    return frame
+
+def lookup_compact(fingerprint):
+    """
+    The CompactDataset behind a compact_frame() frame, or None
+    """
+    return _registry.get(fingerprint)
+
+def forget_compact(fingerprint):
+    _registry.pop(fingerprint, None)
+
+def _max_dev(reference, compact, floor=REL_FLOOR):
+    """
+    Largest absolute difference, and the largest difference relative to
+    the magnitude of its own column (last axis: feature, component; a 1-D
+    input is one column). Column magnitudes are floored at floor x the
+    largest one, so columns that are ~0 don't blow the ratio up; positions
+    NaN in both are skipped, NaN in only one counts as infinite
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    compact = np.asarray(compact, dtype=np.float64)
+    if reference.size == 0:
+        return 0.0, 0.0
+    diff = np.abs(compact - reference)
+    diff[np.isnan(reference) & np.isnan(compact)] = 0.0
+    diff = np.nan_to_num(diff, nan=np.inf)
+    # 按列取参考值的量级：整张统计表的最大值会掩盖小量级列的误差
+    magnitude = np.nan_to_num(np.abs(reference), nan=0.0).reshape(len(reference), -1).max(axis=0)
+    scale = np.maximum(magnitude, floor * magnitude.max())
+    scale[scale == 0] = 1.0   # 全为 0 的统计量退化为绝对误差
+    relative = diff.reshape(len(reference), -1) / scale
+    return float(diff.max()), float(relative.max())
+
+def _aligned_scores(reference, compact):
+    # 主成分的符号不唯一：按与 float64 结果的方向对齐后再比较
+    signs = np.sign(np.sum(reference * compact, axis=0))
+    signs[signs == 0] = 1
+    return compact * signs
+
+def validate(df, compact=None, families=("mean", "std", "skew")):
+    """
+    DataFrame of (aggregate, max_abs_dev, max_rel_dev) comparing the
+    compact results with the float64 ones: every statistic of the state
+    cube, the PCA explained variance and scores, and the regional means
+    of each family over all sensors
+    """
+    compact = compact if compact is not None else CompactDataset.from_frame(df)
+    rows = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        reference = compute_state_aggregates(df)
+        cube = compact.aggregates(df.columns)
+    for s, stat in enumerate(STATS):
+        rows.append((f"state {stat}", *_max_dev(reference.cube[..., s], cube.cube[..., s])))
+
+    pca64, pca32 = fit_pca(df), compact.fit_pca()
+    if pca64 is not None:
+        rows.append(("pca explained_variance_ratio",
+                     *_max_dev(pca64.explained_variance_ratio_, pca32.explained_variance_ratio_)))
+        rows.append(("pca scores", *_max_dev(pca64.scores, _aligned_scores(pca64.scores, pca32.scores))))
+
+    schema = get_schema(df)
+    for family in families:
+        positions = schema.select(family, lag=0, variant="")
+        if len(positions):
+            reference_mean = df.iloc[:, positions].to_numpy(dtype=np.float64).mean(axis=1)
+            rows.append((f"regional {family}", *_max_dev(reference_mean, compact.row_mean(positions))))
+    return pd.DataFrame(rows, columns=["aggregate", "max_abs_dev", "max_rel_dev"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare float32 compact-mode aggregates with float64")
+    parser.add_argument("dataset", nargs="?", default=None, help="feature CSV (default: data/mental-state.csv)")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="largest acceptable relative deviation")
+    args = parser.parse_args(argv)
+
+    from core.io import DATA_PATH, load_dataset
+    df = load_dataset(args.dataset or DATA_PATH)
+    compact = CompactDataset.from_frame(df)
+    float64_mb = sum(df[c].to_numpy().nbytes for c in compact.columns) / 2 ** 20
+    print(f"{len(df)} rows x {len(compact.columns)} features: "
+          f"float64 {float64_mb:.1f} MB -> compact {compact.nbytes / 2 ** 20:.1f} MB")
+    report = validate(df, compact)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3g}"))
+    worst = report["max_rel_dev"].max()
+    print(f"largest relative deviation {worst:.3g} (tolerance {args.tolerance:g})")
+    return 0 if worst <= args.tolerance else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+BLOCK_SIZE = 64
+MAX_CACHED_TILES = 512
+
+class CorrelationEngine:
+    """
+    Pearson correlation of a column set, computed tile by tile.
+    Columns are standardized once into a float32 (rows x columns) matrix Z,
+    so a tile is Z[:, rows].T @ Z[:, cols] - memory stays O(rows x columns)
+    and the full (columns x columns) matrix is never materialized.
+    Tiles are BLOCK_SIZE x BLOCK_SIZE blocks cached in an LRU.
+    When the full matrix is already known (streamed ingest, core.ingest),
+    pass it as `correlation` and tiles are slices of it.
+    """
+
+    def __init__(self, df, columns, block_size=BLOCK_SIZE, max_tiles=MAX_CACHED_TILES, correlation=None):
+        self.columns = list(columns)
+        self.block_size = block_size
+        self.max_tiles = max_tiles
+        self._matrix = None if correlation is None else np.asarray(correlation, dtype=np.float32)
+        self._z = _standardize(df, self.columns) if correlation is None else None
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.columns)
+
+    def _block(self, bi, bj):
+        # 对称矩阵：只缓存 bi <= bj 的块
+        if bi > bj:
+            return self._block(bj, bi).T
+        b = self.block_size
+        if self._matrix is not None:
+            return self._matrix[bi * b:(bi + 1) * b, bj * b:(bj + 1) * b]
+        key = (bi, bj)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+        tile = self._z[:, bi * b:(bi + 1) * b].T @ self._z[:, bj * b:(bj + 1) * b]
+        np.clip(tile, -1.0, 1.0, out=tile)
+        with self._lock:
+            self._tiles[key] = tile
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def window(self, row_start, col_start, size):
+        """
+        Correlation sub-matrix rows [row_start, row_start+size) x
+        cols [col_start, col_start+size), assembled from cached blocks
+        """
+        row_stop = min(row_start + size, self.size)
+        col_stop = min(col_start + size, self.size)
+        out = np.empty((max(row_stop - row_start, 0), max(col_stop - col_start, 0)), dtype=np.float32)
+        b = self.block_size
+        for bi in range(row_start // b, (row_stop - 1) // b + 1 if row_stop > row_start else 0):
+            r0, r1 = max(row_start, bi * b), min(row_stop, (bi + 1) * b)
+            for bj in range(col_start // b, (col_stop - 1) // b + 1 if col_stop > col_start else 0):
+                c0, c1 = max(col_start, bj * b), min(col_stop, (bj + 1) * b)
+                tile = self._block(bi, bj)
+                out[r0 - row_start:r1 - row_start, c0 - col_start:c1 - col_start] = \
+                    tile[r0 - bi * b:r1 - bi * b, c0 - bj * b:c1 - bj * b]
+        return out
+
+def _standardize(df, columns):
+    """
+    (x - mean) / (std * sqrt(n - 1)) per column, as float32, so that
+    Z.T @ Z is the correlation matrix. Missing values count as the mean;
+    constant columns become all-NaN (their correlation is undefined).
+    """
+    n = len(df)
+    positions = df.columns.get_indexer(columns)
+    z = np.empty((n, len(columns)), dtype=np.float32)
+    # 按列块标准化，避免一次性生成 float64 副本
+    for start in range(0, len(columns), BLOCK_SIZE):
+        chunk = df.iloc[:, positions[start:start + BLOCK_SIZE]].to_numpy(dtype=np.float64)
+        mean = np.nanmean(chunk, axis=0) if n else np.zeros(chunk.shape[1])
+        centered = np.nan_to_num(chunk - mean)
+        norm = np.sqrt((centered ** 2).sum(axis=0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z[:, start:start + BLOCK_SIZE] = centered / np.where(norm > 0, norm, np.nan)
+    return z
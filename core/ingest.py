@@ -0,0 +1,373 @@
+"""
+Out-of-core ingest of feature CSVs larger than memory.
+
+ingest(path) reads the CSV once, in chunks, with an explicit dtype per
+column inferred from the header and the first rows, and keeps only what
+the deep-dive charts need:
+  - count / mean / std / min / max of every column per state, exact
+    (merged chunk by chunk); the quartiles come from the sample
+  - column means, std devs and the feature correlation matrix (centered
+    cross-products merged chunk by chunk), for the covariance heatmap,
+    the correlation network and the PCA components
+  - a per-label reservoir sample of raw rows (core.sampling) for the
+    plots that need points: PCA scores, violins, parallel coordinates
+Memory is one chunk plus the (features x features) matrix and the
+sample, whatever the number of rows. The summary is stored next to the
+binary cache (data/.cache/<stem>/ingest/) and reused until the CSV
+changes.
+
+load_ingested() returns the sample as a frame and registers the summary
+under the frame's fingerprint, so core.prep serves the full-data
+aggregates, correlations and PCA for it. The app takes this path for
+CSVs above EEG_INGEST_MB (default 1024 MB):
+
+    python -m core.ingest data/all-subjects.csv     # ingest ahead of the first start
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from core.aggregates import STATS, StateAggregates, _QUANTILES
+from core.io import (
+    CACHE_VERSION,
+    DATA_PATH,
+    _cache_is_valid,
+    _cache_paths,
+    _read_cache,
+    _read_meta,
+    _write_cache,
+    _write_meta,
+    attach_labels,
+    source_fingerprint,
+)
+from core.pca import fit_pca_moments
+from core.sampling import StratifiedReservoir
+
+INGEST_ENV = "EEG_INGEST_MB"   # CSV 超过该大小（MB）时走流式导入；0 = 总是
+DEFAULT_INGEST_MB = 1024
+CHUNK_BYTES = 16 * 2 ** 20   # 每块约 16 MB 的 float64 值（1000 列约 2000 行）；解析缓冲与临时数组是它的数倍
+SAMPLE_PER_LABEL = 2000
+INFER_ROWS = 1000
+FINGERPRINT_SUFFIX = "-ingest"   # 与完整加载的数据框区分缓存键
+
+def ingest_threshold():
+    return float(os.environ.get(INGEST_ENV, DEFAULT_INGEST_MB)) * 2 ** 20
+
+def use_ingest(path=DATA_PATH):
+    return os.path.getsize(path) > ingest_threshold()
+
+def infer_dtypes(path, rows=INFER_ROWS):
+    """
+    {column: dtype} for read_csv, from the header and the first rows:
+    float64 for every column that parses as numbers (so a later NaN or
+    decimal never changes a column's type between chunks), object otherwise
+    """
+    head = pd.read_csv(path, nrows=rows)
+    return {c: np.float64 if pd.api.types.is_numeric_dtype(t) else object for c, t in head.dtypes.items()}
+
+class _HashingReader:
+    # read_csv 读到的字节同时进入内容哈希：一遍读取既解析又得到指纹（与 core.io 的文件哈希相同）
+    def __init__(self, f):
+        self._f = f
+        self.hash = hashlib.blake2b(digest_size=16)
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.hash.update(data)
+        return data
+
+class _Moments:
+    """
+    Per-column count / mean / M2 / min / max of one label, merged chunk
+    by chunk (Chan et al.); NaN values are skipped
+    """
+
+    def __init__(self, width):
+        self.n = np.zeros(width)
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+
+    def update(self, block):
+        n = np.sum(~np.isnan(block), axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nansum(block, axis=0) / n
+            m2 = np.nansum((block - mean) ** 2, axis=0)
+            total = self.n + n
+            delta = np.where(n > 0, mean - self.mean, 0.0)
+            share = np.where(total > 0, n / total, 0.0)
+        self.m2 += m2 + delta ** 2 * self.n * share
+        self.mean += delta * share
+        self.n = total
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # 块内全 NaN 的列
+            self.min = np.fmin(self.min, np.nanmin(block, axis=0))
+            self.max = np.fmax(self.max, np.nanmax(block, axis=0))
+
+    def stats(self):
+        seen = self.n > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.where(self.n > 1, np.sqrt(self.m2 / (self.n - 1)), np.nan)   # ddof=1，与 pandas 一致
+        return {
+            "mean": np.where(seen, self.mean, np.nan),
+            "std": std,
+            "count": self.n,
+            "min": np.where(seen, self.min, np.nan),
+            "max": np.where(seen, self.max, np.nan),
+        }
+
+class _CrossProducts:
+    """
+    Row count, column means and centered cross-product matrix of the
+    features, merged chunk by chunk. A missing value counts as its
+    column's mean in that chunk (as in core.correlation).
+    """
+
+    def __init__(self, width):
+        self.n = 0
+        self.mean = np.zeros(width)
+        self.c = np.zeros((width, width))
+
+    def update(self, block):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            chunk_mean = np.nanmean(block, axis=0)
+        chunk_mean = np.where(np.isnan(chunk_mean), self.mean, chunk_mean)
+        centered = np.nan_to_num(block - chunk_mean)
+        n = block.shape[0]
+        total = self.n + n
+        delta = chunk_mean - self.mean
+        self.c += centered.T @ centered + np.outer(delta, delta) * (self.n * n / total)
+        self.mean += delta * (n / total)
+        self.n = total
+
+    def std(self):
+        # 总体标准差（ddof=0），与 StandardScaler 一致
+        return np.sqrt(np.diag(self.c) / max(self.n, 1))
+
+    def correlation(self):
+        d = np.sqrt(np.diag(self.c))
+        d = np.where(d > 0, d, np.nan)   # 常数列的相关系数无定义
+        return np.clip(self.c / np.outer(d, d), -1.0, 1.0)
+
+class IngestedDataset:
+    """
+    Full-data summary of a streamed CSV plus its row sample.
+    aggregates is aligned with `columns` (the sample frame's columns);
+    mean / std / correlation are over `features`.
+    """
+
+    def __init__(self, fingerprint, columns, features, rows, missing, label_counts,
+                 aggregates, mean, std, correlation, sample):
+        self.fingerprint = fingerprint
+        self.columns = list(columns)
+        self.features = list(features)
+        self.rows = rows
+        self.missing = missing
+        self.label_counts = label_counts
+        self.aggregates = aggregates
+        self.mean = mean
+        self.std = std
+        self.correlation = correlation
+        self.sample = sample   # 原始标签（数值），load_ingested 再转为文字类别
+        self._feature_index = {c: i for i, c in enumerate(self.features)}
+
+    def _indices(self, columns):
+        return [self._feature_index[c] for c in columns]
+
+    def correlation_of(self, columns):
+        idx = self._indices(columns)
+        return self.correlation[np.ix_(idx, idx)]
+
+    def fit_pca(self, features=None, n_components=2):
+        """
+        PCA components from the full-data correlation matrix, scores of the
+        sample rows
+        """
+        features = self.features if features is None else list(features)
+        idx = self._indices(features)
+        result = fit_pca_moments(features, self.mean[idx], self.std[idx], self.correlation_of(features), n_components)
+        if result is not None:
+            result.scores = result.transform(self.sample[features])
+        return result
+
+    def frame(self):
+        """
+        The sample with readable labels, carrying the dataset fingerprint
+        """
+        df = attach_labels(self.sample.copy(deep=False))
+        df.attrs["fingerprint"] = self.fingerprint
+        return df
+
+def _label_order(raw_labels, label_col):
+    """
+    Cube row of every raw label value: LABEL_MAP order, as in
+    compute_state_aggregates; and the readable names
+    """
+    names = attach_labels(pd.DataFrame({label_col: raw_labels}), label_col)[label_col]
+    codes, uniques = pd.factorize(names, sort=True)
+    return codes, list(uniques)
+
+def ingest(path, chunk_rows=None, sample_per_label=SAMPLE_PER_LABEL, seed=0, label_col="Label"):
+    """
+    One pass over the CSV in chunks of chunk_rows (default: CHUNK_BYTES
+    of values); returns an IngestedDataset
+    """
+    dtypes = infer_dtypes(path)
+    if label_col not in dtypes:
+        raise ValueError(f"{path}: no {label_col} column")
+    columns = list(dtypes)
+    chunk_rows = chunk_rows or max(256, CHUNK_BYTES // (8 * len(columns)))
+    numeric = [i for i, c in enumerate(columns) if c != label_col and dtypes[c] is np.float64]
+    width = len(numeric)
+
+    per_label, label_rows, global_code = {}, {}, {}
+    cross = _CrossProducts(width)
+    reservoir = StratifiedReservoir(sample_per_label, seed=seed)
+    sample = None
+    rows = missing = 0
+    with open(path, "rb") as f:
+        reader = _HashingReader(f)
+        for chunk in pd.read_csv(reader, dtype=dtypes, chunksize=chunk_rows):
+            chunk.index = pd.RangeIndex(rows, rows + len(chunk))
+            missing += int(chunk.isna().sum().sum())
+            values = chunk.iloc[:, numeric].to_numpy(dtype=np.float64)
+            cross.update(values)
+
+            codes, uniques = pd.factorize(chunk[label_col])
+            mapping = np.empty(len(uniques), dtype=np.int64)
+            for k, raw in enumerate(uniques):
+                mask = codes == k
+                mapping[k] = global_code.setdefault(raw, len(global_code))
+                per_label.setdefault(raw, _Moments(width)).update(values[mask])
+                label_rows[raw] = label_rows.get(raw, 0) + int(mask.sum())
+            reservoir.update(np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1), row_offset=rows)
+
+            # 样本只保留蓄水池中的行：旧样本中仍被选中的 + 本块新进入的
+            keep = reservoir.indices()
+            fresh = chunk.loc[keep[keep >= rows]]
+            sample = fresh if sample is None else pd.concat([sample[sample.index.isin(keep)], fresh])
+            rows += len(chunk)
+    fingerprint = reader.hash.hexdigest() + FINGERPRINT_SUFFIX
+    sample = (sample if sample is not None else pd.DataFrame(columns=columns)).reset_index(drop=True)
+
+    raw_labels = list(per_label)
+    order, labels = _label_order(raw_labels, label_col)
+    cube = np.full((len(labels), len(columns), len(STATS)), np.nan)
+    label_counts = pd.Series(0, index=pd.CategoricalIndex(labels, name=label_col), name="count")
+    sample_codes = pd.Series(sample[label_col].to_numpy()).map(dict(zip(raw_labels, order))).to_numpy()
+    sample_values = sample.iloc[:, numeric].to_numpy(dtype=np.float64)
+    for raw, row in zip(raw_labels, order):
+        for name, value in per_label[raw].stats().items():
+            cube[row, numeric, STATS.index(name)] = value
+        label_counts.iloc[row] += label_rows[raw]
+        block = sample_values[sample_codes == row]
+        if len(block):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                quartiles = np.nanquantile(block, _QUANTILES, axis=0)
+            for name, value in zip(("q25", "median", "q75"), quartiles):
+                cube[row, numeric, STATS.index(name)] = value
+
+    return IngestedDataset(fingerprint, columns, [columns[i] for i in numeric], rows, missing,
+                           label_counts.sort_values(ascending=False, kind="stable"),
+                           StateAggregates(labels, columns, cube),
+                           cross.mean, cross.std(), cross.correlation(), sample)
+
+def _summary_root(path):
+    root, _ = _cache_paths(path)
+    return os.path.join(root, "ingest")
+
+def save_summary(dataset, root, source, sample_per_label):
+    """
+    Writes the summary arrays, the sample (binary-cache layout) and, last,
+    meta.json; only numeric samples are stored, as in core.io
+    """
+    if not all(pd.api.types.is_numeric_dtype(t) for t in dataset.sample.dtypes):
+        return
+    os.makedirs(root, exist_ok=True)
+    agg = dataset.aggregates
+    tmp = os.path.join(root, "summary.tmp.npz")
+    np.savez(tmp, cube=agg.cube, mean=dataset.mean, std=dataset.std, correlation=dataset.correlation,
+             label_counts=dataset.label_counts.to_numpy())
+    os.replace(tmp, os.path.join(root, "summary.npz"))
+    sample_root = os.path.join(root, "sample")
+    _write_cache(dataset.sample, sample_root, os.path.join(sample_root, "meta.json"), source)
+    _write_meta({
+        "version": CACHE_VERSION,
+        "source": source,
+        "sample_per_label": sample_per_label,
+        "fingerprint": dataset.fingerprint,
+        "columns": dataset.columns,
+        "features": dataset.features,
+        "labels": agg.labels,
+        "count_labels": [str(c) for c in dataset.label_counts.index],
+        "rows": dataset.rows,
+        "missing": dataset.missing,
+    }, os.path.join(root, "meta.json"))
+
+def read_summary(root, meta):
+    arrays = np.load(os.path.join(root, "summary.npz"))
+    sample_root = os.path.join(root, "sample")
+    sample = _read_cache(sample_root, _read_meta(os.path.join(sample_root, "meta.json")))
+    label_counts = pd.Series(arrays["label_counts"], name="count",
+                             index=pd.CategoricalIndex(meta["count_labels"], categories=meta["labels"], name="Label"))
+    return IngestedDataset(meta["fingerprint"], meta["columns"], meta["features"], meta["rows"], meta["missing"],
+                           label_counts, StateAggregates(meta["labels"], meta["columns"], arrays["cube"]),
+                           arrays["mean"], arrays["std"], arrays["correlation"], sample)
+
+_registry = {}   # 指纹 -> IngestedDataset（本进程内已加载的流式导入摘要）
+
+def lookup(fingerprint):
+    return _registry.get(fingerprint)
+
+def load_summary(path=DATA_PATH, sample_per_label=SAMPLE_PER_LABEL, use_cache=True):
+    """
+    The stored summary of path when it is current, otherwise a fresh
+    ingest (stored for the next start)
+    """
+    root = _summary_root(path)
+    meta = _read_meta(os.path.join(root, "meta.json"))
+    fingerprint = source_fingerprint(path)
+    if use_cache and _cache_is_valid(meta, path, fingerprint) and meta.get("sample_per_label") == sample_per_label:
+        return read_summary(root, meta)
+    dataset = ingest(path, sample_per_label=sample_per_label)
+    try:
+        save_summary(dataset, root, dict(fingerprint, hash=dataset.fingerprint.removesuffix(FINGERPRINT_SUFFIX)), sample_per_label)
+    except OSError:
+        pass   # 只读目录：下次启动重新导入
+    return dataset
+
+def load_ingested(path=DATA_PATH, sample_per_label=SAMPLE_PER_LABEL):
+    """
+    Sample frame of a streamed dataset; its summary is registered for
+    core.prep under the frame's fingerprint
+    """
+    dataset = load_summary(path, sample_per_label)
+    _registry[dataset.fingerprint] = dataset
+    return dataset.frame()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a feature CSV into the out-of-core summary")
+    parser.add_argument("dataset", nargs="?", default=None, help="feature CSV (default: data/mental-state.csv)")
+    parser.add_argument("--sample-per-label", type=int, default=SAMPLE_PER_LABEL, help="raw rows kept per state")
+    parser.add_argument("--force", action="store_true", help="re-ingest even when the stored summary is current")
+    args = parser.parse_args(argv)
+
+    path = args.dataset or DATA_PATH
+    start = time.perf_counter()
+    dataset = load_summary(path, args.sample_per_label, use_cache=not args.force)
+    print(f"{path}: {dataset.rows} rows x {len(dataset.columns)} columns, {dataset.missing} missing values "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"sample {len(dataset.sample)} rows; per state: "
+          + ", ".join(f"{label} {count}" for label, count in dataset.label_counts.items()))
+    print(f"summary in {_summary_root(path)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import numpy as np
+# pandas 只在构建数据框的函数里导入：首页只读取缓存元数据（cached_overview），不付出 pandas 的导入时间
+
+DATA_PATH = "data/mental-state.csv"
+# 二进制缓存目录：首次加载 CSV 后按列类型写成 .npy 矩阵，之后直接内存映射
+CACHE_DIR = os.path.join("data", ".cache")
+CACHE_VERSION = 1
+
+# 定义标签映射字典：将数字转换为人类可读的文字
+LABEL_MAP = {
+    0: "Neutral (中性)", 
+    1: "Relaxed (放松)", 
+    2: "Concentrating (专注)"
+}
+
+# 侧边栏的脑区选项（filter_by_region 的取值）
+REGIONS = [
+    "All Sensors (All Regions)",
+    "Frontal Lobe (AF7 AF8)",
+    "Temporal Lobe (TP9 TP10)"
+]
+
+def _file_hash(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def source_fingerprint(path=DATA_PATH):
+    """
+    Size and mtime of the source CSV (cheap, no read of the file body)
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _cache_paths(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    root = os.path.join(CACHE_DIR, stem)
+    return root, os.path.join(root, "meta.json")
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(meta, meta_path):
+    tmp_meta = meta_path + ".tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, meta_path)
+
+def _cache_is_valid(meta, path, fingerprint):
+    """
+    Size must match; if only mtime moved (touch, re-copy) fall back to
+    the content hash before deciding to rebuild.
+    """
+    if meta is None or meta.get("version") != CACHE_VERSION:
+        return False
+    cached = meta["source"]
+    if cached["size"] != fingerprint["size"]:
+        return False
+    if cached["mtime_ns"] == fingerprint["mtime_ns"]:
+        return True
+    return cached.get("hash") == _file_hash(path)
+
+def _frame_overview(df, label_col="Label"):
+    """
+    Rows, missing values and per-state row counts of a loaded frame, as
+    plain JSON types for the cache metadata
+    """
+    counts = []
+    if label_col in df.columns:
+        labels = attach_labels(df[[label_col]].copy(), label_col)[label_col]
+        counts = [[str(name), int(n)] for name, n in labels.value_counts().items()]
+    return {"rows": len(df), "missing": int(df.isna().sum().sum()), "label_counts": counts}
+
+def _write_cache(df, root, meta_path, fingerprint, overview=None):
+    """
+    Group columns by dtype and store each group as one column-major .npy
+    matrix, so every column is a contiguous slice of a memory-mapped file.
+    """
+    os.makedirs(root, exist_ok=True)
+    blocks = []
+    for i, (dtype, cols) in enumerate(df.columns.groupby(df.dtypes).items()):
+        members = set(cols)
+        cols = [c for c in df.columns if c in members]  # 保持原始列顺序
+        values = np.ascontiguousarray(df[cols].to_numpy(dtype=dtype).T)
+        file_name = f"block_{i}.npy"
+        tmp_path = os.path.join(root, file_name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp_path, os.path.join(root, file_name))
+        blocks.append({"file": file_name, "columns": cols})
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": fingerprint,
+        "columns": list(df.columns),
+        "blocks": blocks,
+    }
+    if overview is not None:
+        meta["overview"] = overview
+    # meta.json 最后写入：它存在即表示缓存完整
+    _write_meta(meta, meta_path)
+
+def _read_cache(root, meta, mmap_mode="c"):
+    import pandas as pd
+    data = {}
+    for block in meta["blocks"]:
+        # copy-on-write 映射：按需读页，原地修改只影响本进程，不会写回缓存文件
+        values = np.load(os.path.join(root, block["file"]), mmap_mode=mmap_mode)
+        for col, column_values in zip(block["columns"], values):
+            data[col] = column_values
+    return pd.DataFrame(data, columns=meta["columns"], copy=False)
+
+def read_dataset(path=DATA_PATH, use_cache=True):
+    """
+    Reads the feature CSV through the binary cache.
+    The CSV is parsed only when the cache is missing or the source changed
+    (size, mtime or content hash); otherwise the .npy blocks are memory-mapped.
+    """
+    import pandas as pd
+    if not use_cache:
+        df = pd.read_csv(path)
+        df.attrs["fingerprint"] = _file_hash(path)
+        return df
+
+    fingerprint = source_fingerprint(path)
+    root, meta_path = _cache_paths(path)
+    meta = _read_meta(meta_path)
+
+    if _cache_is_valid(meta, path, fingerprint):
+        df = _read_cache(root, meta)
+        if meta["source"]["mtime_ns"] != fingerprint["mtime_ns"] or "overview" not in meta:
+            # 内容未变，只是 mtime 变了：记录新的 mtime，下次不必再算哈希；较早的缓存补写概况
+            meta["source"].update(fingerprint)
+            if "overview" not in meta:
+                meta["overview"] = _frame_overview(df)
+            try:
+                _write_meta(meta, meta_path)
+            except OSError:
+                pass
+        df.attrs["fingerprint"] = meta["source"]["hash"]
+        return df
+
+    df = pd.read_csv(path)
+    content_hash = _file_hash(path)
+    # 只缓存纯数值数据；含字符串列时直接返回解析结果
+    if all(pd.api.types.is_numeric_dtype(t) for t in df.dtypes):
+        try:
+            _write_cache(df, root, meta_path, dict(fingerprint, hash=content_hash), _frame_overview(df))
+        except OSError:
+            pass  # 只读目录等情况下退化为每次解析 CSV
+    df.attrs["fingerprint"] = content_hash
+    return df
+
+def cached_fingerprint(path=DATA_PATH):
+    """
+    Content hash of path recorded by its binary cache, without loading the
+    dataset; None when the cache is missing or stale
+    """
+    root, meta_path = _cache_paths(path)
+    meta = _read_meta(meta_path)
+    if _cache_is_valid(meta, path, source_fingerprint(path)):
+        return meta["source"]["hash"]
+    return None
+
+def cached_overview(path=DATA_PATH):
+    """
+    Rows, missing values and (label name, rows) pairs of path recorded by
+    its binary cache, without importing pandas or loading the dataset;
+    None when the cache is missing or stale
+    """
+    root, meta_path = _cache_paths(path)
+    meta = _read_meta(meta_path)
+    if "overview" in (meta or {}) and _cache_is_valid(meta, path, source_fingerprint(path)):
+        return meta["overview"]
+    return None
+
+def attach_labels(df, label_col="Label", label_map=LABEL_MAP):
+    """
+    Replaces the numeric label column with a Categorical of readable names,
+    in LABEL_MAP order (so .cat.codes are the original 0/1/2).
+    Unknown label values keep their own category instead of being dropped.
+    """
+    import pandas as pd
+    if label_col not in df.columns or isinstance(df[label_col].dtype, pd.CategoricalDtype):
+        return df
+    raw = df[label_col]
+    names = raw.map(label_map)
+    unknown = names.isna() & raw.notna()
+    if unknown.any():
+        names = names.where(~unknown, raw.astype(str))
+    categories = list(label_map.values())
+    categories += sorted(set(names[unknown]) - set(categories))
+    # 只替换这一列，不复制其余特征列
+    df[label_col] = pd.Categorical(names, categories=categories)
+    return df
+
+def dataset_fingerprint(df):
+    """
+    Content hash identifying a dataset, used as the key of derived caches.
+    Frames from read_dataset carry the source hash; others are hashed here.
+    """
+    fingerprint = df.attrs.get("fingerprint")
+    if fingerprint is None:
+        import pandas as pd
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr(list(df.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        fingerprint = h.hexdigest()
+    return fingerprint
+
+def load_dataset(path=DATA_PATH):
+    # Label 在加载时一次性转换为带文字类别的 Categorical，下游直接使用
+    return attach_labels(read_dataset(path))
+
+def get_sensor_meta():
+    # Defines metadata for sensors including coordinates for the Brain Map
+    # 0=TP9 (Left Ear), 1=AF7 (Left Front), 2=AF8 (Right Front), 3=TP10 (Right Ear)
+    return {
+        "0": {"name": "TP9", "region": "Temporal", "x": -4, "y": 0},
+        "1": {"name": "AF7", "region": "Frontal",  "x": -1.5, "y": 3},
+        "2": {"name": "AF8", "region": "Frontal",  "x": 1.5, "y": 3},
+        "3": {"name": "TP10", "region": "Temporal", "x": 4, "y": 0}
+    }
+
+def filter_by_region(df, region_selection):
+    """
+    Returns a list of column suffixes (e.g. ['0', '3']) based on selection
+    """
+    meta = get_sensor_meta()
+
+    if region_selection == "Frontal Lobe (AF7 AF8)":
+        return ["1", "2"]
+    elif region_selection == "Temporal Lobe (TP9 TP10)":
+        return ["0", "3"]
+    else: # All Sensors
+        return ["0", "1", "2", "3"]
@@ -0,0 +1,37 @@
+import numpy as np
+
+def correlation_edges(corr_matrix, threshold):
+    """
+    Upper-triangle pairs with |corr| >= threshold.
+    Returns (i, j, weight) arrays and the symmetric 0/1 adjacency matrix.
+    """
+    strength = np.abs(np.nan_to_num(corr_matrix))
+    adjacency = strength >= threshold
+    np.fill_diagonal(adjacency, False)
+    i, j = np.nonzero(np.triu(adjacency, k=1))
+    return i, j, strength[i, j], adjacency.astype(np.float64)
+
+def force_directed_layout(adjacency, iterations=50, seed=0, repulsion=0.1, attraction=0.05):
+    """
+    简单力导向布局（向量化版）
+    每个节点对都有排斥力 diff/dist*repulsion，有边的节点对再加吸引力 -diff*attraction；
+    所有节点对的力通过 NumPy 广播一次算完，每轮 O(n^2) 次数组运算而不是 Python 循环。
+    固定 seed 时结果确定，可以缓存。
+    """
+    n = adjacency.shape[0]
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2)) * 2 - 1  # 初始随机位置
+    if n < 2:
+        return pos
+
+    for _ in range(iterations):
+        # |p_i - p_j|^2 = |p_i|^2 + |p_j|^2 - 2 p_i.p_j，不需要 (n, n, 2) 的差值数组
+        sq = (pos ** 2).sum(axis=1)
+        dist = np.sqrt(np.maximum(sq[:, None] + sq[None, :] - 2 * pos @ pos.T, 0.0)) + 0.01
+        coef = repulsion / dist - attraction * adjacency
+        np.fill_diagonal(coef, 0.0)
+        # sum_j coef_ij * (pos_i - pos_j) = pos_i * sum_j coef_ij - (coef @ pos)_i
+        pos = pos + pos * coef.sum(axis=1)[:, None] - coef @ pos
+        # 归一化到[-1, 1]范围
+        pos = (pos - pos.mean(axis=0)) / (pos.std(axis=0) + 0.01) * 0.5
+    return pos
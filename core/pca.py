@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+# 求解器选择阈值
+RANDOMIZED_MIN_FEATURES = 500    # 宽数据：随机化 SVD 只求前几个主成分
+INCREMENTAL_MIN_ROWS = 200_000   # 行数很多：按行块 IncrementalPCA，不一次性标准化整个矩阵
+CHUNK_ROWS = 20_000
+
+class PCAResult:
+    """
+    One fitted PCA: scaler + model + the scores of the fitted rows.
+    The scatter plot, the explained-variance metrics and transform() of new
+    samples all come from this single fit.
+    """
+
+    def __init__(self, features, scaler, model, scores, solver):
+        self.features = list(features)
+        self.scaler = scaler
+        self.model = model
+        self.scores = scores
+        self.solver = solver
+
+    @property
+    def components_(self):
+        return self.model.components_
+
+    @property
+    def explained_variance_ratio_(self):
+        return self.model.explained_variance_ratio_
+
+    def transform(self, X):
+        """
+        Projects new samples (DataFrame with the fitted columns, or an array
+        in the same column order) onto the fitted components
+        """
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features].to_numpy(dtype=np.float64)
+        scores = np.empty((X.shape[0], self.model.n_components_))
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            chunk = _standardize(self.scaler, X[start:start + CHUNK_ROWS])
+            scores[start:start + CHUNK_ROWS] = self.model.transform(chunk)
+        return scores
+
+def _standardize(scaler, chunk):
+    scaled = scaler.transform(chunk)
+    # 缺失值标准化后置 0，相当于用列均值填充
+    return np.nan_to_num(scaled, nan=0.0)
+
+def choose_solver(n_rows, n_features, n_components):
+    if n_rows >= INCREMENTAL_MIN_ROWS:
+        return "incremental"
+    if n_features >= RANDOMIZED_MIN_FEATURES and n_components < min(n_rows, n_features) // 2:
+        return "randomized"
+    return "full"
+
+def fit_pca(df, features=None, n_components=2, random_state=0):
+    """
+    Standardizes the features and fits PCA with the solver that suits the
+    data shape. Returns None when there is nothing to fit.
+    features defaults to every numeric column except Label.
+    """
+    if features is None:
+        features = [c for c, t in zip(df.columns, df.dtypes)
+                    if c != 'Label' and pd.api.types.is_numeric_dtype(t)]
+    positions = df.columns.get_indexer(features)
+    return _fit(len(df), features, lambda start, stop: df.iloc[start:stop, positions].to_numpy(dtype=np.float64),
+                n_components, random_state)
+
+def fit_pca_matrix(X, features, n_components=2, random_state=0):
+    """
+    Same fit on an in-memory (rows x features) matrix; a float32 matrix is
+    standardized and decomposed in float32 (half the memory of the copy)
+    """
+    return _fit(X.shape[0], features, lambda start, stop: X[start:stop], n_components, random_state)
+
+class _MomentScaler:
+    """
+    StandardScaler stand-in built from streamed column means / std devs
+    """
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+class _EigenModel:
+    """
+    PCA stand-in: the leading eigenvectors of the correlation matrix
+    """
+
+    def __init__(self, components, explained_variance, explained_variance_ratio):
+        self.components_ = components
+        self.explained_variance_ = explained_variance
+        self.explained_variance_ratio_ = explained_variance_ratio
+        self.n_components_ = len(components)
+
+    def transform(self, X):
+        return X @ self.components_.T
+
+def fit_pca_moments(features, mean, std, correlation, n_components=2):
+    """
+    Same PCA from streamed moments instead of rows (core.ingest): the
+    eigenvectors of the features' correlation matrix are the components
+    of the standardized data. scores is None; the caller projects the rows
+    it keeps with transform().
+    """
+    n_features = len(features)
+    if n_features == 0:
+        return None
+    n_components = min(n_components, n_features)
+    corr = np.nan_to_num(correlation)   # 常数列标准化后全为 0，与 StandardScaler 一致
+    eigvals, eigvecs = np.linalg.eigh(corr)
+    order = np.argsort(eigvals)[::-1][:n_components]
+    components = eigvecs[:, order].T
+    # 与 sklearn 相同的符号约定：每个主成分中绝对值最大的分量为正
+    signs = np.sign(components[np.arange(n_components), np.argmax(np.abs(components), axis=1)])
+    components *= np.where(signs == 0, 1, signs)[:, None]
+    explained = np.clip(eigvals[order], 0, None)
+    total = np.trace(corr)
+    ratio = explained / total if total > 0 else np.zeros_like(explained)
+    scaler = _MomentScaler(np.asarray(mean, dtype=np.float64), np.where(std > 0, std, 1.0))
+    return PCAResult(features, scaler, _EigenModel(components, explained, ratio), None, "moments")
+
+def _fit(n_rows, features, read, n_components, random_state):
+    """
+    read(start, stop) returns rows start:stop of the feature matrix
+    """
+    n_features = len(features)
+    if n_rows == 0 or n_features == 0:
+        return None
+    n_components = min(n_components, n_rows, n_features)
+    solver = choose_solver(n_rows, n_features, n_components)
+    # sklearn（连带 scipy.stats）导入约需 1 秒，只在第一次拟合时导入
+    from sklearn.decomposition import PCA, IncrementalPCA
+    from sklearn.preprocessing import StandardScaler
+
+    if solver == "incremental":
+        # 两遍按行块扫描：先拟合标准化参数，再增量拟合 PCA，内存只占一个块
+        scaler = StandardScaler()
+        for chunk in _row_chunks(n_rows, read):
+            scaler.partial_fit(chunk)
+        model = IncrementalPCA(n_components=n_components)
+        for chunk in _row_chunks(n_rows, read):
+            model.partial_fit(_standardize(scaler, chunk))
+        result = PCAResult(features, scaler, model, None, solver)
+        result.scores = np.vstack([model.transform(_standardize(scaler, chunk))
+                                   for chunk in _row_chunks(n_rows, read)])
+        return result
+
+    X = read(0, n_rows)
+    scaler = StandardScaler().fit(X)
+    model = PCA(n_components=n_components,
+                svd_solver="randomized" if solver == "randomized" else "full",
+                random_state=random_state)
+    X = _standardize(scaler, X)
+    # 用 transform 而不是 fit_transform：随机化 SVD 下二者略有差异，
+    # 这样已拟合样本的得分与 transform(新样本) 完全一致
+    scores = model.fit(X).transform(X)
+    return PCAResult(features, scaler, model, scores, solver)
+
+def _row_chunks(n_rows, read):
+    # IncrementalPCA.partial_fit 要求每块的行数不少于主成分数，最后一小块并入前一块
+    starts = list(range(0, n_rows, CHUNK_ROWS))
+    if len(starts) > 1 and n_rows - starts[-1] < CHUNK_ROWS // 2:
+        starts.pop()
+    for i, start in enumerate(starts):
+        stop = starts[i + 1] if i + 1 < len(starts) else n_rows
+        yield read(start, stop)
@@ -0,0 +1,348 @@
+"""
+Cached analytics on a loaded dataset, without Streamlit.
+
+Every get_* / prepare_* function keys its cache on the dataset
+fingerprint, through the core.cache backend (an in-process LRU by
+default, st.cache_data inside the app). With EEG_COMPACT=1 the state
+cube, PCA and regional means come from the float32 matrix of
+core.compact (for a frame from compact_frame, the matrix its columns are
+views of); the mode is part of every affected cache key. For the
+sample frame of a streamed CSV (core.ingest), the state cube, PCA
+components, correlations and dataset overview come from its full-data
+summary instead of the sample rows; feature separability and the
+classifier benchmark use the sample rows.
+"""
+import pandas as pd
+import numpy as np
+from core.cache import memoize
+from core.schema import get_schema, FEATURE_GROUPS
+from core.aggregates import compute_state_aggregates, SpectrumTensor
+from core.pca import fit_pca
+from core.layout import correlation_edges, force_directed_layout
+from core.correlation import CorrelationEngine
+from core.density import kde_by_group
+from core.sampling import stratified_sample
+from core.compact import CompactDataset, compact_enabled, lookup_compact
+from core.io import dataset_fingerprint, get_sensor_meta
+from core.ingest import lookup
+from core.separability import N_PERMUTATIONS, frame_separability, rank_features
+from core.classify import compare
+
+@memoize(kind="resource", max_entries=4)
+def _compact(fingerprint, _df):
+    # compact_frame 载入的数据框本身就是这个矩阵的视图：复用它，不再转换一份
+    compact = lookup_compact(fingerprint)
+    return compact if compact is not None else CompactDataset.from_frame(_df)
+
+def get_compact(df):
+    """
+    float32 矩阵 + 标签编码 + 列索引（每个数据集构建一次，跨会话共享）
+    """
+    return _compact(dataset_fingerprint(df), df)
+
+def regional_average(df, positions, compact=None):
+    """
+    所选列的逐行均值（小提琴图的区域平均）；compact 模式下读取 float32 连续行
+    """
+    if compact is None:
+        compact = compact_enabled()
+    if compact:
+        return get_compact(df).row_mean(positions)
+    return df.iloc[:, positions].to_numpy(dtype=np.float64).mean(axis=1)
+
+@memoize(max_entries=8)
+def _fit_pca(fingerprint, features, n_components, compact, _df):
+    features = list(features) if features is not None else None
+    ingested = lookup(fingerprint)
+    if ingested is not None:
+        return ingested.fit_pca(features, n_components)
+    if compact:
+        return get_compact(_df).fit_pca(features, n_components)
+    return fit_pca(_df, features, n_components)
+
+def get_pca(df, features=None, n_components=2):
+    """
+    缓存的 PCA 拟合结果（按数据集指纹 + 特征子集）
+    features 默认是除 Label 以外的全部数值列
+    """
+    key = tuple(features) if features is not None else None
+    return _fit_pca(dataset_fingerprint(df), key, n_components, compact_enabled(), df)
+
+def get_pca_data(df, features=None):
+    pca = get_pca(df, features)
+    if pca is None:
+        return pd.DataFrame()
+    pca_df = pd.DataFrame(data=pca.scores[:, :2], columns=['PC1', 'PC2'])
+    # Label 已在加载时转换为文字类别（Categorical）
+    pca_df['Label'] = df['Label'].to_numpy()
+    return pca_df
+
+@memoize(max_entries=4)
+def _state_aggregates(fingerprint, compact, _df):
+    ingested = lookup(fingerprint)
+    if ingested is not None:
+        return ingested.aggregates
+    if compact:
+        return get_compact(_df).aggregates(_df.columns)
+    return compute_state_aggregates(_df)
+
+def get_state_aggregates(df):
+    """
+    每个状态 x 每列 x 统计量 (mean/std/count/分位数) 的聚合立方体
+    按数据集指纹缓存，各图表只切片，不再重新 groupby 原始行
+    """
+    return _state_aggregates(dataset_fingerprint(df), compact_enabled(), df)
+
+@memoize(max_entries=16)
+def _correlation_network(fingerprint, features, threshold, seed, _df):
+    features = list(features)
+    ingested = lookup(fingerprint)
+    if ingested is not None:
+        corr_matrix = ingested.correlation_of(features)
+    else:
+        corr_matrix = np.corrcoef(_df[features].to_numpy(dtype=np.float64).T)
+    i, j, weight, adjacency = correlation_edges(corr_matrix, threshold)
+    pos = force_directed_layout(adjacency, seed=seed)
+    return {"features": features, "edges": (i, j, weight), "pos": pos}
+
+def get_correlation_network(df, feature_types, selected_types=('mean', 'std', 'skew'),
+                            top_n=200, threshold=0.7, seed=0):
+    """
+    特征相关性网络：边（|相关系数| >= 阈值）和力导向布局坐标
+    布局固定随机种子，按 (数据集, 特征集合, 阈值) 缓存
+    """
+    features = []
+    for feat_type in selected_types:
+        features.extend(feature_types.get(feat_type, []))
+    features = features[:top_n]
+    if len(features) == 0:
+        return None
+    return _correlation_network(dataset_fingerprint(df), tuple(features), threshold, seed, df)
+
+@memoize(kind="resource", max_entries=16)
+def _correlation_engine(fingerprint, columns, _df):
+    ingested = lookup(fingerprint)
+    correlation = ingested.correlation_of(columns) if ingested is not None else None
+    return CorrelationEngine(_df, list(columns), correlation=correlation)
+
+def get_correlation_engine(df, columns):
+    """
+    分块相关性引擎（每个数据集 + 特征集合一个实例，跨会话共享）
+    kind="resource"（应用中即 cache_resource）：引擎内部的块缓存会随翻页不断填充
+    """
+    if len(columns) == 0:
+        return None
+    return _correlation_engine(dataset_fingerprint(df), tuple(columns), df)
+
+@memoize(max_entries=8)
+def _overview(fingerprint, _df):
+    ingested = lookup(fingerprint)
+    if ingested is not None:
+        return {"rows": ingested.rows, "missing": ingested.missing, "label_counts": ingested.label_counts}
+    return {"rows": len(_df), "missing": int(_df.isna().sum().sum()), "label_counts": _df['Label'].value_counts()}
+
+def get_overview(df):
+    """
+    行数、缺失值总数和各状态行数；流式导入的数据集取自全量摘要，而不是样本
+    """
+    return _overview(dataset_fingerprint(df), df)
+
+@memoize(max_entries=4)
+def _separability(fingerprint, n_permutations, seed, _df):
+    return frame_separability(_df, n_permutations=n_permutations, seed=seed)
+
+def get_separability(df, n_permutations=N_PERMUTATIONS, seed=0):
+    """
+    每个特征列区分各状态的能力（ANOVA F、Kruskal-Wallis H、互信息、效应量、置换 p 值）
+    流式导入的数据集按样本行计算
+    """
+    return _separability(dataset_fingerprint(df), n_permutations, seed, df)
+
+def get_top_features(df, k=50, by="f"):
+    """
+    按 by 排序的前 k 个最能区分状态的特征列名
+    """
+    return rank_features(get_separability(df), by, k)
+
+def prepare_separability_table(df, k=20, by="f"):
+    """
+    前 k 个特征的分离度统计表，附特征类型（Family）和传感器（Sensor，协方差类为传感器对）
+    """
+    table = get_separability(df)
+    top = table.loc[rank_features(table, by, k)].reset_index()
+    schema = get_schema(df)
+    meta = get_sensor_meta()
+    families, sensors = [], []
+    for column in top["feature"]:
+        key = schema.key_of(column)
+        families.append(key.family if key is not None else "")
+        if key is not None and key.sensor_pair is not None:
+            sensors.append("-".join(meta[s]["name"] for s in key.sensor_pair if s in meta))
+        elif key is not None and key.sensor in meta:
+            sensors.append(meta[key.sensor]["name"])
+        else:
+            sensors.append("")
+    top.insert(1, "Family", families)
+    top.insert(2, "Sensor", sensors)
+    return top
+
+def prepare_classifier_table(df, models, sensor_sets, family=None, train=False):
+    """
+    各 (传感器子集, 模型) 的交叉验证准确率与训练/推理延迟
+    结果按配置缓存在磁盘（data/.cache/classify/）；train=False 时只读取已有结果，不训练
+    """
+    return compare(df, list(models), sensor_sets, family, train=train)
+
+def get_feature_types(df):
+    """
+    将特征按类型分类
+    返回一个字典，键为特征类型，值为该类型的所有特征列名列表
+    """
+    schema = get_schema(df)
+    return {group: schema.select_columns(family=list(families))
+            for group, families in FEATURE_GROUPS.items()}
+
+def prepare_brain_map_data(df, feature_family, active_sensors):
+    """
+    为大脑拓扑图聚合数据
+    """
+    return brain_map_frame(get_schema(df), get_state_aggregates(df), feature_family, active_sensors)
+
+def brain_map_frame(schema, agg, feature_family, active_sensors):
+    """
+    拓扑图数据框：任意聚合立方体（录制数据集或实时会话）的各状态均值
+    """
+    meta = get_sensor_meta()
+    map_data = []
+    # 只循环过滤器允许的传感器
+    for s_id in active_sensors:
+        pos = schema.position(feature_family, s_id)
+        if pos is not None:
+            # 从聚合立方体中取各状态的均值（尚无数据的状态跳过）
+            for label, value in zip(agg.labels, agg.take([pos], "mean")[:, 0]):
+                if np.isnan(value):
+                    continue
+                map_data.append({
+                    "State": label,  # "Neutral (中性)" 等文字
+                    "Sensor": meta[s_id]["name"],
+                    "X": meta[s_id]["x"],
+                    "Y": meta[s_id]["y"],
+                    "Value": value
+                })
+    return pd.DataFrame(map_data)
+
+@memoize(max_entries=4)
+def _spectrum_tensor(fingerprint, compact, _df):
+    return SpectrumTensor(get_state_aggregates(_df), get_schema(_df), list(get_sensor_meta().keys()))
+
+def get_spectrum_tensor(df):
+    """
+    状态 x 传感器 x 频率点 的均值/方差/置信区间张量，每个数据集只构建一次
+    """
+    return _spectrum_tensor(dataset_fingerprint(df), compact_enabled(), df)
+
+def prepare_spectrum_data(df, sensor_ids):
+    """
+    频谱图数据：所选传感器各频率点在每个状态下的均值和 95% 置信区间
+    sensor_ids 可以是单个传感器或列表（叠加 / 小多图）
+    """
+    return spectrum_frame(get_spectrum_tensor(df), sensor_ids)
+
+def spectrum_frame(spectrum, sensor_ids):
+    """
+    频谱数据框：任意 SpectrumTensor（录制数据集或实时会话）
+    """
+    if isinstance(sensor_ids, str):
+        sensor_ids = [sensor_ids]
+    meta = get_sensor_meta()
+    
+    frames = []
+    for s_id in sensor_ids:
+        k = spectrum.sensor_index(s_id)
+        mean = spectrum.mean[:, k, :]
+        ci = spectrum.ci95[:, k, :]
+        valid = ~np.isnan(mean)
+        frames.append(pd.DataFrame({
+            'Frequency': np.broadcast_to(spectrum.freq_bins, mean.shape)[valid],
+            'Amplitude': mean[valid],
+            'CI_Low': (mean - ci)[valid],
+            'CI_High': (mean + ci)[valid],
+            'State': np.broadcast_to(np.array(spectrum.labels, dtype=object)[:, None], mean.shape)[valid],
+            'Sensor': meta[s_id]["name"],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=['Frequency', 'Amplitude', 'CI_Low', 'CI_High', 'State', 'Sensor'])
+    return pd.concat(frames, ignore_index=True)
+
+def prepare_top_freq_table(df, sensor_id):
+    """
+    topFreq 统计表：行为 topFreq 列，列为状态
+    """
+    spectrum = get_spectrum_tensor(df)
+    k = spectrum.sensor_index(sensor_id)
+    columns = spectrum.top_freq_columns[k]
+    if len(columns) == 0:
+        return pd.DataFrame()
+    return pd.DataFrame(spectrum.top_freq_mean[:, k, :len(columns)].T,
+                        index=columns,
+                        columns=pd.Index(spectrum.labels, name="Label"))
+
+@memoize(max_entries=32)
+def _violin_stats(fingerprint, feature_family, active_sensors, compact, _df):
+    positions = get_schema(_df).select(feature_family, lag=0, variant="", sensor=list(active_sensors))
+    if len(positions) == 0:
+        return None
+    # 区域平均（按行），只在缓存未命中时对原始行计算一次
+    regional_avg = regional_average(_df, positions, compact)
+    labels = _df['Label']
+    codes = _label_codes(_df)
+    if isinstance(labels.dtype, pd.CategoricalDtype):
+        names = list(labels.cat.categories)
+    else:
+        names = list(pd.factorize(labels, sort=True)[1])
+    grid, densities, stats = kde_by_group(regional_avg, codes, len(names))
+    states = [(name, densities[k], stats[k]) for k, name in enumerate(names) if stats[k] is not None]
+    return {"grid": grid, "states": states}
+
+def prepare_violin_stats(df, feature_family, active_sensors):
+    """
+    小提琴图的服务端汇总：每个状态的 KDE 曲线（固定点数）和箱线统计量
+    按 (数据集, 特征类型, 区域) 缓存，图表大小与行数无关
+    """
+    return _violin_stats(dataset_fingerprint(df), feature_family, tuple(active_sensors), compact_enabled(), df)
+
+@memoize(max_entries=16)
+def _sample_indices(fingerprint, budget, allocation, seed, _df):
+    return stratified_sample(_label_codes(_df), budget, allocation=allocation, seed=seed)
+
+def get_sample_indices(df, budget=2000, allocation="proportional", seed=0):
+    """
+    按状态分层的蓄水池抽样（行号），最多约 budget 行，按数据集缓存
+    allocation: 'proportional' 按各状态行数比例，'equal' 各状态等量
+    """
+    if len(df) <= budget:
+        return None
+    return _sample_indices(dataset_fingerprint(df), budget, allocation, seed, df)
+
+def prepare_parallel_bands(df, columns=('mean_0', 'mean_1', 'mean_2', 'mean_3')):
+    """
+    平行坐标密度带：各状态在每一列上的 q25 / 中位数 / q75（直接取自聚合立方体）
+    """
+    positions = [df.columns.get_loc(c) for c in columns if c in df.columns]
+    if not positions:
+        return pd.DataFrame()
+    agg = get_state_aggregates(df)
+    quantiles = {stat: agg.take(positions, stat) for stat in ("q25", "median", "q75")}
+    return pd.DataFrame({
+        'State': np.repeat(agg.labels, len(positions)),
+        'Column': [df.columns[p] for p in positions] * len(agg.labels),
+        'Q25': quantiles["q25"].ravel(),
+        'Median': quantiles["median"].ravel(),
+        'Q75': quantiles["q75"].ravel(),
+    })
+
+def _label_codes(df):
+    labels = df['Label']
+    if isinstance(labels.dtype, pd.CategoricalDtype):
+        return labels.cat.codes.to_numpy()
+    return pd.factorize(labels, sort=True)[0]
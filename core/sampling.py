@@ -0,0 +1,78 @@
+import numpy as np
+
+class StratifiedReservoir:
+    """
+    Per-label reservoir sample of row indices.
+    Every row gets a uniform random key and each label keeps the `capacity`
+    rows with the smallest keys, which is a uniform sample without
+    replacement of that label's rows. Rows can be fed in chunks (update),
+    so the same sampler serves in-memory frames and streamed input.
+    """
+
+    def __init__(self, capacity, seed=0):
+        # capacity: 每个标签的容量（int）或 {label_code: 容量}
+        self.capacity = capacity
+        self._rng = np.random.default_rng(seed)
+        self._keys = {}
+        self._rows = {}
+
+    def _capacity_of(self, code):
+        if isinstance(self.capacity, dict):
+            return self.capacity.get(code, 0)
+        return self.capacity
+
+    def update(self, codes, row_offset=0):
+        """
+        Offers rows row_offset .. row_offset+len(codes)-1 with label codes
+        (negative codes = missing label, skipped)
+        """
+        codes = np.asarray(codes)
+        keys = self._rng.random(len(codes))
+        rows = np.arange(row_offset, row_offset + len(codes))
+        for code in np.unique(codes[codes >= 0]):
+            code = int(code)
+            cap = self._capacity_of(code)
+            if cap <= 0:
+                continue
+            mask = codes == code
+            k = np.concatenate([self._keys.get(code, np.empty(0)), keys[mask]])
+            r = np.concatenate([self._rows.get(code, np.empty(0, dtype=np.int64)), rows[mask]])
+            if len(k) > cap:
+                keep = np.argpartition(k, cap - 1)[:cap]
+                k, r = k[keep], r[keep]
+            self._keys[code], self._rows[code] = k, r
+        return self
+
+    def indices(self):
+        """
+        Sampled row indices of all labels, in ascending row order
+        """
+        if not self._rows:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(list(self._rows.values())))
+
+def allocate_budget(counts, budget, allocation="proportional"):
+    """
+    Splits a total row budget over labels: 'proportional' to label size or
+    'equal' per label (capped by what each label has)
+    """
+    counts = {int(c): int(n) for c, n in counts.items() if n > 0}
+    if not counts:
+        return {}
+    total = sum(counts.values())
+    if budget >= total:
+        return dict(counts)
+    if allocation == "equal":
+        share = {c: budget // len(counts) for c in counts}
+    else:
+        share = {c: int(round(budget * n / total)) for c, n in counts.items()}
+    return {c: min(share[c], counts[c]) for c in counts}
+
+def stratified_sample(codes, budget, allocation="proportional", seed=0):
+    """
+    Row indices of a stratified sample of at most ~budget rows
+    """
+    codes = np.asarray(codes)
+    labels, counts = np.unique(codes[codes >= 0], return_counts=True)
+    capacity = allocate_budget(dict(zip(labels, counts)), budget, allocation)
+    return StratifiedReservoir(capacity, seed=seed).update(codes).indices()
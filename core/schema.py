@@ -0,0 +1,130 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+
+# 列名结构（来自 eeg-feature-generation 脚本）：
+#   [lag1_]<family>[_<variant>]_<sensor>     e.g. lag1_mean_d_h2h1_0, mean_q1_2
+#   [lag1_]covM_<i>_<j> / logcovM_<i>_<j>     传感器对
+#   [lag1_]topFreq_<rank>_<sensor>
+#   [lag1_]freq_<bin>_<sensor>                e.g. freq_010_0 (bin = 10 x Hz)
+FeatureKey = namedtuple("FeatureKey", ["family", "lag", "variant", "freq_bin", "sensor_pair", "sensor"])
+
+_COLUMN_RE = re.compile(r"^(?:lag(?P<lag>\d+)_)?(?P<family>[A-Za-z]+)_(?P<rest>.+)$")
+_PAIR_FAMILIES = ("covM", "logcovM")
+
+# get_feature_types 的分组 -> 列名中的 family
+# covM 历史上用子串匹配，因此也包含 logcovM 列，这里保持同样的分组
+FEATURE_GROUPS = {
+    "mean": ("mean",),
+    "std": ("std",),
+    "skew": ("skew",),
+    "kurt": ("kurt",),
+    "covM": ("covM", "logcovM"),
+    "logcovM": ("logcovM",),
+    "eigen": ("eigenval",),
+    "freq": ("freq",),
+    "topFreq": ("topFreq",),
+}
+
+def parse_column(name):
+    """
+    Parses one column name into a FeatureKey, or None if it is not a feature
+    (e.g. 'Label')
+    """
+    match = _COLUMN_RE.match(name)
+    if match is None:
+        return None
+    family = match.group("family")
+    lag = int(match.group("lag") or 0)
+    parts = match.group("rest").split("_")
+
+    if family in _PAIR_FAMILIES:
+        if len(parts) != 2:
+            return None
+        return FeatureKey(family, lag, "", None, (parts[0], parts[1]), None)
+    if family == "freq":
+        if len(parts) != 2 or not parts[0].isdigit():
+            return None
+        return FeatureKey(family, lag, "", int(parts[0]), None, parts[1])
+    # topFreq 的 variant 是排名 ("1".."10")，其余如 d_h2h1 / q1 / d_q1q2
+    return FeatureKey(family, lag, "_".join(parts[:-1]), None, None, parts[-1])
+
+class FeatureSchema:
+    """
+    Parsed index of every column: FeatureKey -> integer column position.
+    Built once per column set; all lookups are by key instead of string scans.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.keys = [parse_column(c) for c in self.columns]
+        self._by_name = {c: i for i, c in enumerate(self.columns)}
+        self._positions = {}
+        for pos, key in enumerate(self.keys):
+            if key is not None:
+                self._positions[key] = pos
+
+        # 每个字段一列数组，select() 用向量化掩码过滤
+        self._family = np.array([k.family if k else "" for k in self.keys], dtype=object)
+        self._lag = np.array([k.lag if k else -1 for k in self.keys], dtype=np.int64)
+        self._variant = np.array([k.variant if k else "" for k in self.keys], dtype=object)
+        self._sensor = np.array([(k.sensor or "") if k else "" for k in self.keys], dtype=object)
+        self._freq_bin = np.array([k.freq_bin if k and k.freq_bin is not None else -1
+                                   for k in self.keys], dtype=np.int64)
+        self._parsed = np.array([k is not None for k in self.keys], dtype=bool)
+
+    def position(self, family, sensor=None, lag=0, variant="", freq_bin=None, sensor_pair=None):
+        return self._positions.get(FeatureKey(family, lag, variant, freq_bin, sensor_pair, sensor))
+
+    def column(self, family, sensor=None, lag=0, variant="", freq_bin=None, sensor_pair=None):
+        """
+        Exact column name for a key, e.g. column("mean", "1") -> "mean_1"
+        """
+        pos = self.position(family, sensor, lag, variant, freq_bin, sensor_pair)
+        return None if pos is None else self.columns[pos]
+
+    def select(self, family=None, lag=None, variant=None, sensor=None):
+        """
+        Integer positions matching every given field (None = any value).
+        family / sensor may be a single value or a list of values.
+        """
+        mask = self._parsed.copy()
+        if family is not None:
+            mask &= np.isin(self._family, _as_list(family))
+        if lag is not None:
+            mask &= self._lag == lag
+        if variant is not None:
+            mask &= self._variant == variant
+        if sensor is not None:
+            mask &= np.isin(self._sensor, _as_list(sensor))
+        return np.flatnonzero(mask)
+
+    def select_columns(self, family=None, lag=None, variant=None, sensor=None):
+        return [self.columns[i] for i in self.select(family, lag, variant, sensor)]
+
+    def spectrum(self, sensor, lag=0):
+        """
+        (freq_bins, positions) of one sensor's freq columns, sorted by bin
+        """
+        positions = self.select("freq", lag=lag, sensor=sensor)
+        bins = self._freq_bin[positions]
+        order = np.argsort(bins, kind="stable")
+        return bins[order], positions[order]
+
+    def key_of(self, column):
+        pos = self._by_name.get(column)
+        return None if pos is None else self.keys[pos]
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+@lru_cache(maxsize=8)
+def _schema_for_columns(columns):
+    return FeatureSchema(columns)
+
+def get_schema(df):
+    """
+    Returns the (cached) FeatureSchema of a DataFrame's columns
+    """
+    return _schema_for_columns(tuple(df.columns))
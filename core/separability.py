@@ -0,0 +1,218 @@
+"""
+How well every feature column separates the mental states.
+
+separability() scores all columns at once, each statistic in a few
+batched NumPy passes over the (rows x features) matrix:
+  f, f_p          one-way ANOVA F and its F-distribution p-value
+  h, h_p          Kruskal-Wallis H (tie-corrected) and its chi2 p-value
+  mi              mutual information (nats) between the label and the
+                  feature cut into equal-frequency bins
+  eta_sq          ANOVA effect size, SSB / SST
+  epsilon_sq      Kruskal-Wallis effect size, H / (N - 1)
+  cohen_d, pair   largest |Cohen's d| over state pairs, and that pair
+  perm_p, perm_q  permutation p-value of F (labels shuffled), and its
+                  Benjamini-Hochberg adjustment over all columns
+Permutations run in fixed-size batches on a thread pool. Every batch has
+its own seed spawned from `seed`, so results do not depend on the number
+of workers. Missing values count as the column mean; rows without a
+label are dropped.
+
+    python -m core.separability data/mental-state.csv --top 20
+"""
+import argparse
+import sys
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+N_PERMUTATIONS = 1000
+PERMUTATION_BATCH = 50
+MI_BINS = 16
+COLUMNS = ["f", "f_p", "h", "h_p", "mi", "eta_sq", "epsilon_sq", "cohen_d", "pair", "perm_p", "perm_q"]
+
+def _one_hot(codes, n_labels):
+    return (codes[None, :] == np.arange(n_labels)[:, None]).astype(np.float64)
+
+def _between_ss(sums, counts, total):
+    # SSB = sum_k S_k^2 / n_k - S^2 / N（按标签的列和 S_k，可整批计算）
+    return np.sum(sums ** 2 / counts[..., None], axis=-2) - total ** 2 / counts.sum()
+
+def _tie_correction(X):
+    """
+    1 - sum(t^3 - t) / (N^3 - N) per column, t = sizes of tied groups
+    """
+    n, width = X.shape
+    s = np.sort(X, axis=0).T.ravel()   # 逐列排序后按列展开
+    starts = np.ones(s.size, dtype=bool)
+    starts[1:] = s[1:] != s[:-1]
+    starts[::n] = True   # 每列第一个元素总是新的一组
+    start_idx = np.flatnonzero(starts)
+    lengths = np.diff(np.append(start_idx, s.size)).astype(np.float64)
+    ties = np.bincount(start_idx // n, weights=lengths ** 3 - lengths, minlength=width)
+    return 1.0 - ties / (n ** 3 - n)
+
+def _mutual_information(ranks, codes, n_labels, bins):
+    n, width = ranks.shape
+    binned = np.minimum(((ranks - 1) * bins / n).astype(np.int64), bins - 1)
+    # 所有列的 (bin, label) 联合频数一次 bincount 得到：width x bins x labels
+    index = (np.arange(width)[None, :] * bins + binned) * n_labels + codes[:, None]
+    joint = np.bincount(index.ravel(), minlength=width * bins * n_labels).reshape(width, bins, n_labels) / n
+    p_bin = joint.sum(axis=2, keepdims=True)
+    p_label = joint.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = joint * np.log(joint / (p_bin * p_label))
+    return np.nansum(terms, axis=(1, 2))
+
+def _cohen_d(means, variances, counts, labels):
+    best = np.zeros(means.shape[1])
+    pair = np.full(means.shape[1], "", dtype=object)
+    for i in range(len(labels)):
+        for j in range(i + 1, len(labels)):
+            dof = counts[i] + counts[j] - 2
+            if dof <= 0:
+                continue
+            pooled = np.sqrt(((counts[i] - 1) * variances[i] + (counts[j] - 1) * variances[j]) / dof)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                d = np.abs(means[i] - means[j]) / pooled
+            better = np.nan_to_num(d, nan=-1.0) > best
+            best = np.where(better, d, best)
+            pair[better] = f"{labels[i]} vs {labels[j]}"
+    return best, pair
+
+def _permutation_counts(X, codes, n_labels, observed, n_permutations, seed, workers):
+    """
+    Per column, how many label permutations reach the observed SSB; like
+    the observed SSB, only labels that have rows take part
+    """
+    counts = np.bincount(codes, minlength=n_labels).astype(np.float64)
+    present = np.flatnonzero(counts > 0)   # 没有行的标签计数为 0，参与计算会得到 NaN
+    counts = counts[present]
+    total = X.sum(axis=0)
+    threshold = observed - 1e-9 * np.abs(observed)   # 浮点误差内相等也算
+    sizes = [min(PERMUTATION_BATCH, n_permutations - start) for start in range(0, n_permutations, PERMUTATION_BATCH)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    def batch(size, seed_seq):
+        rng = np.random.default_rng(seed_seq)
+        shuffled = rng.permuted(np.broadcast_to(codes, (size, len(codes))), axis=1)
+        # 每个标签一次矩阵乘：(size x rows) @ (rows x features)
+        sums = np.stack([(shuffled == k).astype(np.float64) @ X for k in present], axis=1)
+        return np.sum(_between_ss(sums, counts, total) >= threshold, axis=0)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(batch, sizes, seeds))
+
+def _benjamini_hochberg(p):
+    p = np.asarray(p, dtype=np.float64)
+    order = np.argsort(p)
+    ranked = p[order] * len(p) / np.arange(1, len(p) + 1)
+    q = np.minimum.accumulate(ranked[::-1])[::-1]
+    out = np.empty_like(q)
+    out[order] = np.minimum(q, 1.0)
+    return out
+
+def separability(values, codes, labels, features, n_permutations=N_PERMUTATIONS, seed=0,
+                 workers=None, bins=MI_BINS):
+    """
+    DataFrame (index = features, columns = COLUMNS) for a (rows x
+    features) matrix and label codes into labels (-1 = no label)
+    """
+    # scipy 只在第一次计算时导入
+    from scipy.stats import chi2, f as f_dist, rankdata
+
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.asarray(codes)
+    keep = codes >= 0
+    X, codes = values[keep], codes[keep].astype(np.int64)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        X = np.where(np.isnan(X), np.nanmean(X, axis=0), X)
+    n, k = X.shape[0], len(labels)
+    one_hot = _one_hot(codes, k)
+    counts = one_hot.sum(axis=1)
+    present = counts > 0
+    groups = int(present.sum())
+    table = pd.DataFrame(np.nan, index=pd.Index(features, name="feature"), columns=COLUMNS)
+    table["pair"] = ""
+    if groups < 2 or n <= groups:
+        return table
+
+    sums = one_hot @ X
+    total = X.sum(axis=0)
+    ssb = _between_ss(sums[present], counts[present], total)
+    sst = np.sum((X - total / n) ** 2, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f = (ssb / (groups - 1)) / ((sst - ssb) / (n - groups))
+        eta_sq = ssb / sst
+
+    ranks = rankdata(X, axis=0)
+    rank_sums = one_hot[present] @ ranks
+    h = 12.0 / (n * (n + 1)) * np.sum(rank_sums ** 2 / counts[present, None], axis=0) - 3 * (n + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = h / _tie_correction(X)
+
+    means = sums / np.where(counts > 0, counts, np.nan)[:, None]
+    squares = one_hot @ (X ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variances = (squares - counts[:, None] * means ** 2) / (counts[:, None] - 1)
+    cohen_d, pair = _cohen_d(means, variances, counts, list(labels))
+
+    table["f"] = f
+    table["f_p"] = f_dist.sf(f, groups - 1, n - groups)
+    table["h"] = h
+    table["h_p"] = chi2.sf(h, groups - 1)
+    table["mi"] = _mutual_information(ranks, codes, k, bins)
+    table["eta_sq"] = eta_sq
+    table["epsilon_sq"] = h / (n - 1)
+    table["cohen_d"] = cohen_d
+    table["pair"] = pair
+    if n_permutations > 0:
+        reached = _permutation_counts(X, codes, k, ssb, n_permutations, seed, workers)
+        table["perm_p"] = (reached + 1) / (n_permutations + 1)
+        table["perm_q"] = _benjamini_hochberg(table["perm_p"].fillna(1.0))
+    return table
+
+def frame_separability(df, label_col="Label", n_permutations=N_PERMUTATIONS, seed=0, workers=None):
+    """
+    separability() of every numeric column of df against label_col
+    """
+    features = [c for c, t in zip(df.columns, df.dtypes)
+                if c != label_col and pd.api.types.is_numeric_dtype(t)]
+    codes, uniques = pd.factorize(df[label_col], sort=True)
+    values = df[features].to_numpy(dtype=np.float64)
+    return separability(values, codes, list(uniques), features, n_permutations, seed, workers)
+
+def rank_features(table, by="f", k=None):
+    """
+    Feature names, best first: descending for statistics and effect
+    sizes, ascending for p / q values; the first k only when given
+    """
+    ascending = by.endswith("_p") or by.endswith("_q")
+    ranked = table[by].sort_values(ascending=ascending, na_position="last", kind="stable")
+    names = list(ranked.index)
+    return names[:k] if k is not None else names
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank every feature by how well it separates the mental states")
+    parser.add_argument("dataset", nargs="?", default=None, help="feature CSV (default: data/mental-state.csv)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--by", default="f", choices=[c for c in COLUMNS if c != "pair"])
+    parser.add_argument("--permutations", type=int, default=N_PERMUTATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="threads for the permutations (default: all cores)")
+    parser.add_argument("--output", help="write the full table as CSV")
+    args = parser.parse_args(argv)
+
+    from core.io import DATA_PATH, load_dataset
+    table = frame_separability(load_dataset(args.dataset or DATA_PATH), n_permutations=args.permutations,
+                               seed=args.seed, workers=args.workers)
+    if args.output:
+        table.to_csv(args.output)
+    top = table.loc[rank_features(table, args.by, args.top)]
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(top.to_string(float_format=lambda v: f"{v:.4g}"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
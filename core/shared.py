@@ -0,0 +1,202 @@
+"""
+Dataset matrix shared between processes.
+
+publish(df) writes the numeric columns of a dataset once into shared
+memory, in the core.io binary-cache layout (one column-major .npy block
+per dtype) under /dev/shm, or the temp directory where there is no
+/dev/shm, keyed by the dataset fingerprint. attach(fingerprint) maps an
+already published dataset. Both return a frame whose columns are
+read-only views of the segment, so every Streamlit server process and
+export worker on the same dataset reads the same physical pages: N
+processes cost one copy of the matrix plus their own state.
+
+Segments are reference-counted across processes: each process using one
+has a pid file in <segment>/holders/, release() (or interpreter exit)
+removes it, and the last live holder removes the segment. Pid files of
+processes that exited without releasing (pool workers, crashes) are
+pruned whenever the holders are counted. Frames already handed out stay
+valid after removal, the mapping lives as long as they do.
+
+    EEG_SHARED=0   every process keeps its own frame (core.io.load_dataset)
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from core.io import DATA_PATH, _read_cache, _read_meta, _write_cache, attach_labels, cached_fingerprint, dataset_fingerprint, read_dataset
+
+try:
+    import fcntl
+except ImportError:   # Windows：没有 flock，也不能删除仍被映射的文件，只在本进程内计数
+    fcntl = None
+
+SHARED_ENV = "EEG_SHARED"   # "0" / "off" 关闭
+SEGMENT_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+PREFIX = "eeg-"
+
+_refs = {}   # 指纹 -> 本进程持有的引用数
+_local = threading.Lock()
+
+def shared_enabled():
+    return os.environ.get(SHARED_ENV, "1").lower() not in ("0", "false", "no", "off")
+
+def segment_path(fingerprint):
+    return os.path.join(SEGMENT_DIR, PREFIX + fingerprint)
+
+@contextmanager
+def _locked():
+    """
+    Serializes publish / attach / release across processes
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(SEGMENT_DIR, PREFIX + "shared.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True   # 其他用户的进程
+    return True
+
+def holders(fingerprint):
+    """
+    Pids of the live processes holding the segment; pid files of exited
+    processes are removed
+    """
+    root = os.path.join(segment_path(fingerprint), "holders")
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return []
+    live = []
+    for name in names:
+        if name.isdigit() and fcntl is not None and _alive(int(name)):
+            live.append(int(name))
+        else:
+            try:
+                os.remove(os.path.join(root, name))
+            except OSError:
+                pass
+    return sorted(live)
+
+def _hold(fingerprint):
+    # 调用方已持有 _local 和 _locked()
+    count = _refs.get(fingerprint, 0)
+    if count == 0:
+        root = os.path.join(segment_path(fingerprint), "holders")
+        os.makedirs(root, exist_ok=True)
+        open(os.path.join(root, str(os.getpid())), "w").close()
+    _refs[fingerprint] = count + 1
+
+def _frame(fingerprint):
+    root = segment_path(fingerprint)
+    meta = _read_meta(os.path.join(root, "meta.json"))
+    if meta is None or meta["source"].get("hash") != fingerprint:
+        return None
+    df = _read_cache(root, meta, mmap_mode="r")
+    df.attrs["fingerprint"] = fingerprint
+    return df
+
+def attach(fingerprint):
+    """
+    Read-only frame over the published segment of fingerprint (one more
+    reference), or None when it is not published
+    """
+    with _local, _locked():
+        df = _frame(fingerprint)
+        if df is not None:
+            _hold(fingerprint)
+        return df
+
+def publish(df):
+    """
+    Shared read-only copy of df, or the existing one when the dataset is
+    already published (one more reference either way). Returns None when
+    df has non-numeric columns or the segment cannot be written, e.g.
+    /dev/shm is full.
+    """
+    if not all(pd.api.types.is_numeric_dtype(t) for t in df.dtypes):
+        return None
+    fingerprint = dataset_fingerprint(df)
+    with _local, _locked():
+        shared = _frame(fingerprint)
+        if shared is None:
+            root = segment_path(fingerprint)
+            tmp = f"{root}.tmp-{os.getpid()}"
+            try:
+                # 写到临时目录再改名：meta.json 存在即表示段完整
+                _write_cache(df, tmp, os.path.join(tmp, "meta.json"), {"hash": fingerprint})
+                shutil.rmtree(root, ignore_errors=True)   # 残留的不完整段
+                os.replace(tmp, root)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+                return None
+            shared = _frame(fingerprint)
+        _hold(fingerprint)
+        return shared
+
+def release(fingerprint):
+    """
+    Drops one reference; at zero the process leaves the segment, and the
+    last live holder removes it
+    """
+    with _local:
+        count = _refs.pop(fingerprint, 0) - 1
+        if count > 0:
+            _refs[fingerprint] = count
+            return
+        if count < 0:
+            return
+        with _locked():
+            root = segment_path(fingerprint)
+            try:
+                os.remove(os.path.join(root, "holders", str(os.getpid())))
+            except OSError:
+                pass
+            if not holders(fingerprint):
+                shutil.rmtree(root, ignore_errors=True)
+
+def load_shared(path=DATA_PATH):
+    """
+    load_dataset through the shared segment: the first process publishes
+    the matrix, the others attach to it. Falls back to the process's own
+    memory-mapped frame when sharing is off or not possible.
+    """
+    if not shared_enabled():
+        return attach_labels(read_dataset(path))
+    # 已发布时直接映射，不必先建一个磁盘缓存上的数据框
+    fingerprint = cached_fingerprint(path)
+    df = attach(fingerprint) if fingerprint else None
+    if df is None:
+        df = read_dataset(path)
+        shared = publish(df)
+        if shared is not None:
+            df = shared
+    return attach_labels(df)
+
+@atexit.register
+def _release_all():
+    for fingerprint in list(_refs):
+        _refs[fingerprint] = 1
+        release(fingerprint)
+
+def _after_fork():
+    # 子进程继承映射但不继承登记：它自己 attach / publish 时再登记
+    global _local
+    _refs.clear()
+    _local = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
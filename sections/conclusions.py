@@ -1,6 +1,46 @@
+import pandas as pd
 import streamlit as st
+from utils.profiling import plotly_chart
+from utils.figcache import cached_figure
+from utils.prep import get_separability, prepare_separability_table
+from utils.viz import plot_separability_ranking
 
-def render():
+RANK_BY = {
+    "ANOVA F": "f",
+    "Kruskal-Wallis H": "h",
+    "Mutual Information (互信息)": "mi",
+    "max |Cohen's d|": "cohen_d",
+}
+
+@st.fragment
+def _separability_panel(df):
+    st.markdown("#### Feature Separability Ranking (特征可分性排序)")
+    st.info("Every feature scored against the three mental states in batched passes: ANOVA F, Kruskal-Wallis H, mutual information, effect sizes and label-permutation p-values (fixed seed). The top features also drive the PCA and correlation views of the Deep Dives page (每个特征对三种心理状态的区分能力：ANOVA F、Kruskal-Wallis H、互信息、效应量和标签置换 p 值（固定随机种子）。排名靠前的特征也用于深度分析页的 PCA 和相关性视图)")
+
+    col_a, col_b = st.columns(2)
+    with col_a:
+        by = RANK_BY[st.selectbox("Rank By (排序依据)", options=list(RANK_BY.keys()), index=0)]
+    with col_b:
+        k = st.slider("Top Features (特征数量)", 5, 50, 15, step=5)
+
+    top = prepare_separability_table(df, k, by)
+    fig = cached_figure(df, "plot_separability_ranking", (k, by), lambda: plot_separability_ranking(top, by))
+    plotly_chart(fig, use_container_width=True)
+
+    table = get_separability(df)
+    significant = int((table["perm_q"] < 0.05).sum())
+    st.metric("Features with permutation q < 0.05 (置换检验 q < 0.05 的特征数)", f"{significant} / {len(table)}")
+
+    col_c, col_d = st.columns([3, 2])
+    with col_c:
+        st.dataframe(top[["feature", "Family", "Sensor", "f", "h", "mi", "eta_sq", "cohen_d", "pair", "perm_p", "perm_q"]],
+                     hide_index=True, use_container_width=True)
+    with col_d:
+        # 排名靠前的特征集中在哪些特征类型和传感器上
+        st.markdown("**Top features by family and sensor (按特征类型和传感器统计):**")
+        st.dataframe(pd.crosstab(top["Family"], top["Sensor"]), use_container_width=True)
+
+def render(df):
     st.markdown("### 4. Conclusions and Observations (结论与观察)")
     
     # Feature Analysis Summary
@@ -23,3 +63,5 @@ def render():
     **State Consistency (状态一致性)**: In the Violin Plots, the distribution shape for 'Concentrating' is notably narrow and elongated, whereas 'Relaxed' and 'Neutral' shapes are wide and flat. A narrow distribution implies low variance among samples, proving that Concentration is a highly consistent and stable neural state. Conversely, Relaxation is characterized by high variability and lower predictability.
     (状态一致性: 在小提琴图中, 专注的分布形状显著狭窄且细长, 而放松和中性的形状则宽且扁. 狭窄的分布意味着样本间方差低, 证明专注是一种高度一致且稳定的神经状态. 相反, 放松的特征是高变异性和较低的可预测性)
     """)
+
+    _separability_panel(df)
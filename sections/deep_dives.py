@@ -1,31 +1,41 @@
 import streamlit as st
-from utils.prep import get_feature_types, prepare_brain_map_data
+from utils.io import REGIONS, filter_by_region
+from utils.profiling import plotly_chart
+from utils.figcache import cached_figure
+from utils.prep import (
+    get_feature_types,
+    get_pca,
+    get_top_features,
+    prepare_classifier_table,
+    MODELS,
+    get_correlation_network,
+    get_correlation_engine,
+    prepare_brain_map_data,
+    prepare_spectrum_data,
+    prepare_top_freq_table,
+    prepare_violin_stats
+)
 from utils.viz import (
     plot_feature_type_counts,
     plot_pca_analysis,
     plot_covariance_matrix,
     plot_frequency_spectrum,
     plot_brain_map,
-    plot_violin_comparison
+    plot_violin_summary,
+    plot_feature_correlation_network,
+    plot_accuracy_latency
 )
 
-def render(df, active_sensors):
-    st.markdown("### 3. Deep Dive Analysis (深度分析)")
-    
-    # Page Summary
-    st.info("""
-    **Page Overview (页面概述):** This section provides comprehensive feature analysis including feature type statistics, dimensionality reduction (PCA), covariance matrix visualization, frequency spectrum analysis, and spatial activation maps with distribution comparisons.
-    (本节提供全面的特征分析，包括特征类型统计、降维分析(PCA)、协方差矩阵可视化、频率结构分析和空间激活图与分布对比)
-    
-    **What This Page Does (页面功能):** 
-    - Feature Type Statistics: Count and distribution of different feature types (mean, std, skew, etc.) (特征类型统计：统计各类特征的数量分布)
-    - PCA Analysis: Dimensionality reduction to visualize data structure in 2D (PCA分析：降维分析将高维数据投影到二维空间)
-    - Covariance Matrix: Visualization of feature correlations in covariance matrix features (协方差矩阵：可视化covM特征之间的相关性)
-    - Frequency Spectrum: Analysis of frequency domain characteristics (频率结构分析：分析频率域特征)
-    - Spatial Analysis: Brain topography maps and distribution comparisons across three dimensions (空间分析：大脑拓扑图和三个维度的分布对比)
-    """)
-    
-    # Get feature type classification
+# 相关矩阵的额外虚拟类型：按 ANOVA F 排序的前 100 个区分特征（选中时才计算排序）
+TOP_SEPARATING = "Top separating"
+PCA_INPUTS = {
+    "All features (全部特征)": None,
+    "Top 20 separating (前20个区分特征)": 20,
+    "Top 50 separating (前50个区分特征)": 50,
+    "Top 100 separating (前100个区分特征)": 100,
+}
+
+def _feature_types_panel(df, active_sensors):
     feature_types = get_feature_types(df)
     
     # --- 1. Feature Type Statistics ---
@@ -34,8 +44,9 @@ def render(df, active_sensors):
     
     col1, col2 = st.columns([2, 1])
     with col1:
-        fig_counts = plot_feature_type_counts(feature_types)
-        st.plotly_chart(fig_counts, use_container_width=True)
+        fig_counts = cached_figure(df, "plot_feature_type_counts", (),
+                                   lambda: plot_feature_type_counts(feature_types))
+        plotly_chart(fig_counts, use_container_width=True)
     
     with col2:
         st.markdown("**Feature Type Descriptions (特征类型说明):**")
@@ -54,37 +65,67 @@ def render(df, active_sensors):
                                        key=lambda x: x[1], reverse=True):
             desc = type_descriptions.get(feat_type, "")
             st.metric(feat_type, count, help=desc)
-    
-    st.markdown("---")
-    
+
+def _pca_panel(df, active_sensors):
     # --- 2. PCA Dimensionality Reduction ---
     st.markdown("#### (2). PCA Dimensionality Reduction (PCA降维分析)")
     st.info("Use principal component analysis to project high-dimensional data into 2D space to observe overall data structure and class separation (使用主成分分析将高维数据投影到二维空间，观察数据的整体结构和类别分离情况)")
     
-    pca_fig, explained_var = plot_pca_analysis(df)
+    # 可选只用最能区分状态的前 k 个特征（见结论页的可分性排序）
+    top_k = PCA_INPUTS[st.selectbox("PCA Input Features (PCA输入特征)", options=list(PCA_INPUTS.keys()), index=0)]
+    features = get_top_features(df, top_k) if top_k else None
+    pca = get_pca(df, features)
+    pca_fig = cached_figure(df, "plot_pca_analysis", (top_k,), lambda: plot_pca_analysis(pca, df['Label'])[0])
+    explained_var = None
+    if pca is not None and len(pca.explained_variance_ratio_) >= 2:
+        ratio = pca.explained_variance_ratio_
+        explained_var = {'PC1': ratio[0], 'PC2': ratio[1], 'Total': ratio[0] + ratio[1]}
     if explained_var:
         col2a, col2b = st.columns([2, 1])
         with col2a:
-            st.plotly_chart(pca_fig, use_container_width=True)
+            plotly_chart(pca_fig, use_container_width=True)
         with col2b:
             st.markdown("**Explained Variance Ratio (解释方差比例):**")
             st.metric("PC1 Explained Variance (PC1解释方差)", f"{explained_var['PC1']:.2%}")
             st.metric("PC2 Explained Variance (PC2解释方差)", f"{explained_var['PC2']:.2%}")
             st.metric("Total Explained Variance (累计解释方差)", f"{explained_var['Total']:.2%}")
     else:
-        st.plotly_chart(pca_fig, use_container_width=True)
-    
-    st.markdown("---")
+        plotly_chart(pca_fig, use_container_width=True)
+
+@st.fragment
+def _correlation_matrix_panel(df, active_sensors):
+    feature_types = get_feature_types(df)
     
     # --- 3. Covariance Matrix Visualization ---
     st.markdown("#### (3). Covariance Matrix Visualization (协方差矩阵可视化)")
-    st.info("Visualize correlation matrix of covM features (可视化covM特征之间的相关性矩阵)")
-    
-    covM_fig = plot_covariance_matrix(df, feature_types)
-    st.plotly_chart(covM_fig, use_container_width=True)
+    st.info("Visualize correlation matrix of covM features; pick another feature family and page or zoom through the full matrix (可视化covM特征之间的相关性矩阵；可切换特征类型并翻页/缩放浏览完整矩阵)")
     
-    st.markdown("---")
+    col3a, col3b, col3c, col3d = st.columns(4)
+    with col3a:
+        corr_family = st.selectbox(
+            "Feature Family (特征类型)",
+            options=list(feature_types.keys()) + [TOP_SEPARATING],
+            index=list(feature_types.keys()).index("covM")
+        )
+    if corr_family == TOP_SEPARATING:
+        corr_columns = get_top_features(df, 100)
+    else:
+        corr_columns = feature_types.get(corr_family, [])
+    with col3b:
+        corr_size = st.selectbox("Window Size (窗口大小)", options=[30, 60, 120, 240], index=0)
+    max_start = max(len(corr_columns) - 1, 0)
+    with col3c:
+        corr_row = st.number_input("First Row (起始行)", 0, max_start, 0, step=corr_size)
+    with col3d:
+        corr_col = st.number_input("First Column (起始列)", 0, max_start, 0, step=corr_size)
     
+    engine = get_correlation_engine(df, corr_columns)
+    covM_fig = cached_figure(df, "plot_covariance_matrix", (corr_family, int(corr_row), int(corr_col), corr_size),
+                             lambda: plot_covariance_matrix(engine, corr_family, int(corr_row), int(corr_col), corr_size))
+    plotly_chart(covM_fig, use_container_width=True)
+
+@st.fragment
+def _spectrum_panel(df, active_sensors):
     # --- 4. Frequency Spectrum Analysis ---
     st.markdown("#### (4). Frequency Spectrum Analysis (频率结构分析)")
     st.info("Analyze frequency domain features. freq features form the longest feature sequence, perfect for spectrum plots (分析频率域特征，freq特征是最长的特征序列，非常适合做频谱图)")
@@ -104,55 +145,70 @@ def render(df, active_sensors):
     )
     selected_sensor = sensor_options[selected_sensor_name]
     
-    freq_fig = plot_frequency_spectrum(df, feature_types, sensor_id=selected_sensor)
-    st.plotly_chart(freq_fig, use_container_width=True)
+    spectrum_view = st.radio(
+        "Spectrum View (频谱视图)",
+        options=["Selected Sensor (所选传感器)", "Overlay All Sensors (叠加全部传感器)", "Small Multiples (分传感器小图)"],
+        horizontal=True
+    )
+    spectrum_sensors = selected_sensor if spectrum_view.startswith("Selected") else list(sensor_options.values())
+    spectrum_layout = 'small_multiples' if spectrum_view.startswith("Small") else 'overlay'
+    freq_fig = cached_figure(df, "plot_frequency_spectrum", (selected_sensor, spectrum_view),
+                             lambda: plot_frequency_spectrum(prepare_spectrum_data(df, spectrum_sensors),
+                                                             sensor_id=selected_sensor, layout=spectrum_layout))
+    plotly_chart(freq_fig, use_container_width=True)
     
     # Display topFreq analysis
     st.markdown("##### Top Frequency Analysis (Top频率分析)")
-    topFreq_cols = feature_types.get('topFreq', [])
-    if len(topFreq_cols) > 0:
-        sensor_topFreq_cols = [c for c in topFreq_cols if c.endswith(f'_{selected_sensor}')]
-        if len(sensor_topFreq_cols) > 0:
-            # Display topFreq statistics by state
-            from utils.prep import LABEL_MAP
-            df_topFreq = df.copy()
-            df_topFreq['Label'] = df_topFreq['Label'].map(LABEL_MAP).fillna(df_topFreq['Label'])
-            
-            topFreq_stats = df_topFreq.groupby('Label')[sensor_topFreq_cols].mean().T
-            st.dataframe(topFreq_stats, use_container_width=True)
-    
-    st.markdown("---")
-    
+    topFreq_stats = prepare_top_freq_table(df, selected_sensor)
+    if not topFreq_stats.empty:
+        # Display topFreq statistics by state
+        st.dataframe(topFreq_stats, use_container_width=True)
+
+def _brain_map_figure(df, family, title, active_sensors):
+    return cached_figure(df, "plot_brain_map", (family, tuple(active_sensors)),
+                         lambda: plot_brain_map(prepare_brain_map_data(df, family, active_sensors), title))
+
+def _violin_figure(df, family, active_sensors):
+    return cached_figure(df, "plot_violin_summary", (family, tuple(active_sensors)),
+                         lambda: plot_violin_summary(prepare_violin_stats(df, family, active_sensors), family))
+
+@st.fragment
+def _spatial_panel(df, active_sensors):
     # --- 5. Spatial Activation Analysis (Brain Maps & Violin Plots) ---
     st.markdown("#### (5). Spatial Activation Analysis (空间激活分析)")
     st.write("Exploring spatial activation and statistical distributions across three dimensions (探索三个维度的空间激活和统计分布)")
     
+    # 三个维度各自一个惰性子标签：只计算当前打开的那一个
+    dimensions = st.tabs(["A. Mean (均值)", "B. Std Dev (标准差)", "C. Skewness (偏度)"],
+                         on_change="rerun", key="spatial_dimension")
+    for tab, dimension in zip(dimensions, [_mean_dimension, _std_dimension, _skew_dimension]):
+        if tab.open:
+            with tab:
+                dimension(df, active_sensors)
+
+def _mean_dimension(df, active_sensors):
     # --- DIMENSION 1: MEAN (Signal Power) ---
     st.markdown("##### A. Signal Power Mean Voltage (信号功率 平均电压)")
     
     col1a, col1b = st.columns([1, 1])
     with col1a:
         # Brain Map for Mean
-        map_data = prepare_brain_map_data(df, "mean", active_sensors)
-        st.plotly_chart(plot_brain_map(map_data, "Mean"), use_container_width=True)
+        plotly_chart(_brain_map_figure(df, "mean", "Mean", active_sensors), use_container_width=True)
     with col1b:
         # Violin for Mean
-        st.plotly_chart(plot_violin_comparison(df, "mean", active_sensors), use_container_width=True)
-
-    st.markdown("---")
+        plotly_chart(_violin_figure(df, "mean", active_sensors), use_container_width=True)
 
+def _std_dimension(df, active_sensors):
     # --- DIMENSION 2: STD (Signal Stability) ---
     st.markdown("##### B. Signal Stability Standard Deviation (信号稳定性 标准差)")
     
     col2a, col2b = st.columns([1, 1])
     with col2a:
-        map_data = prepare_brain_map_data(df, "std", active_sensors)
-        st.plotly_chart(plot_brain_map(map_data, "Std Dev"), use_container_width=True)
+        plotly_chart(_brain_map_figure(df, "std", "Std Dev", active_sensors), use_container_width=True)
     with col2b:
-        st.plotly_chart(plot_violin_comparison(df, "std", active_sensors), use_container_width=True)
-
-    st.markdown("---")
+        plotly_chart(_violin_figure(df, "std", active_sensors), use_container_width=True)
 
+def _skew_dimension(df, active_sensors):
     # --- DIMENSION 3: SKEW (Signal Shape) ---
     st.markdown("##### C. Signal Shape Skewness (信号形状 偏度)")
     
@@ -186,9 +242,105 @@ def render(df, active_sensors):
     
     col3a, col3b = st.columns([1, 1])
     with col3a:
-        map_data = prepare_brain_map_data(df, "skew", active_sensors)
-        st.plotly_chart(plot_brain_map(map_data, "Skew"), use_container_width=True)
+        plotly_chart(_brain_map_figure(df, "skew", "Skew", active_sensors), use_container_width=True)
     with col3b:
-        st.plotly_chart(plot_violin_comparison(df, "skew", active_sensors), use_container_width=True)
+        plotly_chart(_violin_figure(df, "skew", active_sensors), use_container_width=True)
+
+@st.fragment
+def _network_panel(df, active_sensors):
+    feature_types = get_feature_types(df)
+    
+    # --- 6. Feature Correlation Network ---
+    st.markdown("#### (6). Feature Correlation Network (特征相关性网络)")
+    st.info("Features are connected when their absolute correlation exceeds the threshold; the layout is cached per feature set and threshold (当特征之间的相关系数绝对值超过阈值时相连；布局按特征集合和阈值缓存)")
+    
+    col6a, col6b, col6c = st.columns(3)
+    with col6a:
+        network_types = st.multiselect(
+            "Feature Types (特征类型)",
+            options=["mean", "std", "skew", "kurt"],
+            default=["mean", "std", "skew"]
+        )
+    with col6b:
+        network_top_n = st.slider("Number of Features (特征数量)", 10, 300, 120, step=10)
+    with col6c:
+        network_threshold = st.slider("Correlation Threshold (相关性阈值)", 0.5, 0.95, 0.7, step=0.05)
+    
+    def build_network():
+        network = get_correlation_network(df, feature_types, tuple(network_types),
+                                          top_n=network_top_n, threshold=network_threshold)
+        return plot_feature_correlation_network(network, feature_types, network_types,
+                                                threshold=network_threshold)
+    plotly_chart(cached_figure(df, "plot_feature_correlation_network",
+                               (tuple(network_types), network_top_n, network_threshold), build_network),
+                 use_container_width=True)
+
+@st.fragment
+def _decoding_panel(df, active_sensors):
+    feature_types = get_feature_types(df)
+    
+    # --- 7. Mental State Decoding ---
+    st.markdown("#### (7). Mental State Decoding (心理状态解码)")
+    st.info("Cross-validated accuracy of standard classifiers on the selected region (sidebar) or all regions, with training time and single-sample inference latency: the best accuracy per millisecond points to the sensor subset for on-device decoding. Folds and hyperparameter grids train in parallel; results are stored on disk per configuration (在侧边栏所选区域或所有区域上训练标准分类器，报告交叉验证准确率、训练时间和单样本推理延迟：每毫秒准确率最高的传感器子集最适合设备端解码。各折与超参数网格并行训练，结果按配置保存在磁盘上)")
+    st.caption("Accuracy is nested cross-validation over contiguous time blocks: neighbouring rows are overlapping windows, so folds never split them, and hyperparameters are chosen on each training part only. Selection Accuracy is the score the chosen parameters were picked on, and is optimistic (准确率为按连续时间块划分的嵌套交叉验证：相邻行是重叠窗口，不会被分到不同折，超参数只在各训练部分上选择。Selection Accuracy 是选参时的得分，偏乐观)")
+    
+    col7a, col7b, col7c = st.columns(3)
+    with col7a:
+        models = st.multiselect("Models (模型)", options=list(MODELS.keys()), default=["logistic", "lda"],
+                                format_func=lambda m: MODELS[m][0])
+    with col7b:
+        family = st.selectbox("Feature Family (特征类型)", options=["All features (全部特征)"] + list(feature_types.keys()),
+                              index=0, key="decoding_family")
+    with col7c:
+        compare_regions = st.checkbox("Compare all regions (比较所有区域)", value=True)
+    if compare_regions:
+        sensor_sets = {region: filter_by_region(df, region) for region in REGIONS}
+    else:
+        sensor_sets = {"Selected region (所选区域)": list(active_sensors)}
+    family = family if family in feature_types else None
+    
+    # 训练可能需要几十秒：默认只显示磁盘上已有的结果，点击按钮才训练缺少的配置
+    if st.button("Train missing configurations (训练缺少的配置)"):
+        with st.spinner("Training classifiers (训练分类器)...", show_time=True):
+            table = prepare_classifier_table(df, models, sensor_sets, family, train=True)
+    else:
+        table = prepare_classifier_table(df, models, sensor_sets, family)
+    if table.empty:
+        st.warning("No stored results for this configuration yet; press the button to train (该配置尚无已保存的结果，请点击按钮训练)")
+        return
+    plotly_chart(plot_accuracy_latency(table), use_container_width=True)
+    st.dataframe(table, hide_index=True, use_container_width=True)
+
+# (标签, 渲染函数)：只运行当前打开的标签；带控件的面板是 fragment，控件变化只重跑该面板
+PANELS = [
+    ("(1) Feature Types (特征类型)", _feature_types_panel),
+    ("(2) PCA", _pca_panel),
+    ("(3) Correlation Matrix (相关矩阵)", _correlation_matrix_panel),
+    ("(4) Spectrum (频谱)", _spectrum_panel),
+    ("(5) Spatial (空间激活)", _spatial_panel),
+    ("(6) Correlation Network (相关网络)", _network_panel),
+    ("(7) Decoding (状态解码)", _decoding_panel),
+]
 
-    st.markdown("---")
+def render(df, active_sensors):
+    st.markdown("### 3. Deep Dive Analysis (深度分析)")
+    
+    # Page Summary
+    st.info("""
+    **Page Overview (页面概述):** This section provides comprehensive feature analysis including feature type statistics, dimensionality reduction (PCA), covariance matrix visualization, frequency spectrum analysis, and spatial activation maps with distribution comparisons.
+    (本节提供全面的特征分析，包括特征类型统计、降维分析(PCA)、协方差矩阵可视化、频率结构分析和空间激活图与分布对比)
+    
+    **What This Page Does (页面功能):** 
+    - Feature Type Statistics: Count and distribution of different feature types (mean, std, skew, etc.) (特征类型统计：统计各类特征的数量分布)
+    - PCA Analysis: Dimensionality reduction to visualize data structure in 2D (PCA分析：降维分析将高维数据投影到二维空间)
+    - Covariance Matrix: Visualization of feature correlations in covariance matrix features (协方差矩阵：可视化covM特征之间的相关性)
+    - Frequency Spectrum: Analysis of frequency domain characteristics (频率结构分析：分析频率域特征)
+    - Spatial Analysis: Brain topography maps and distribution comparisons across three dimensions (空间分析：大脑拓扑图和三个维度的分布对比)
+    - Decoding: Cross-validated classifier accuracy and latency per sensor subset (状态解码：各传感器子集上分类器的交叉验证准确率与延迟)
+    """)
+    
+    tabs = st.tabs([label for label, _ in PANELS], on_change="rerun", key="deep_dive_panel")
+    for tab, (_, panel) in zip(tabs, PANELS):
+        if tab.open:
+            with tab:
+                panel(df, active_sensors)
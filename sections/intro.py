@@ -1,6 +1,7 @@
 import streamlit as st
+from utils.io import load_data, load_overview
 
-def render(df):
+def render():
     st.title("EEG brainwave data visualization")
     
     st.markdown("### 1. Data Context (数据背景)")
@@ -38,13 +39,16 @@ def render(df):
     st.info("In image-based EEG feature generation, these multidimensional characteristics are further organized into 2D matrices—such as frequency-by-channel, time-frequency maps, or spatial topography plots—so that each EEG sample can be treated as an image input to a neural network classifier. (在图像化脑电特征生成中，这些多维特征进一步被组织成二维矩阵，如频率-通道图、时频图或空间拓扑图，从而使每个脑电样本都可以作为图像输入到神经网络分类器中)")
     st.info("Thus, the dataset's columns arise from different steps of EEG preprocessing and feature extraction, each representing a numerical descriptor derived from brain electrical activity. (因此，数据集中的列来自脑电预处理与特征提取的不同步骤，每一列都代表从脑部电活动中计算得到的数值特征)")
     # --- Metrics (One Row) ---
+    # 行数 / 缺失值 / 类别分布取自全量数据（流式导入时 df 只是样本）
+    # 首页只读二进制缓存里记录的概况：不导入 pandas、不加载数据集，首屏更快
+    overview = load_overview()
     c1, c2, c3 = st.columns(3)
     with c1:
-        st.metric("Total Samples (样本数)", len(df))
+        st.metric("Total Samples (样本数)", overview["rows"])
     with c2:
         st.metric("Recording Duration (录制时长)", "60s per state (每状态60秒)")
     with c3:
-        st.metric("Missing Values (缺失值)", df.isna().sum().sum())
+        st.metric("Missing Values (缺失值)", overview["missing"])
     
     st.markdown("---")
     
@@ -55,12 +59,17 @@ def render(df):
     
     with col_table1:
         st.markdown("**Class Distribution Data (类别分布数据)**")
-        # Display the count of each label
-        st.dataframe(df['Label'].value_counts(), use_container_width=True)
+        # Display the count of each label (Markdown 表格：st.dataframe 会导入 pandas)
+        rows = "\n".join(f"| {label} | {count} |" for label, count in overview["label_counts"])
+        st.markdown("| Label | count |\n|---|---:|\n" + rows)
         
     with col_table2:
         st.markdown("**Raw Data Preview (原始数据预览)**")
         # Display first few rows to show data structure
-        st.dataframe(df.head(), use_container_width=True)
+        # 展开时才加载数据集（on_change="rerun" 使内容按需运行）
+        preview = st.expander("Show first rows (显示前几行)", key="intro_preview", on_change="rerun")
+        if preview.open:
+            with preview:
+                st.dataframe(load_data().head(), use_container_width=True)
     
     st.markdown("---")
\ No newline at end of file
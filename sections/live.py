@@ -0,0 +1,58 @@
+import streamlit as st
+from utils.profiling import plotly_chart
+from utils.io import LABEL_MAP, get_sensor_meta
+from utils.prep import get_live_session, prepare_live_brain_map_data, prepare_live_spectrum_data
+from utils.viz import plot_brain_map, plot_frequency_spectrum
+
+def render(active_sensors):
+    st.markdown("### Live Session (实时会话)")
+    st.info("Samples stream in from a local socket or a growing file; every completed 1 s window updates the per-state running averages below. "
+            "Start `python -m utils.stream raw.csv --port 5555` to replay a recording. "
+            "(样本来自本地 socket 或持续写入的文件，每个完成的 1 秒窗口都会增量更新各状态的累计均值)")
+
+    col_src, col_addr, col_state, col_fps = st.columns([1, 2, 2, 1])
+    with col_src:
+        source_kind = st.selectbox("Source (数据源)", options=["socket", "file"])
+    with col_addr:
+        default = "127.0.0.1:5555" if source_kind == "socket" else "data/live.csv"
+        address = st.text_input("Address / Path (地址 / 路径)", value=default)
+    with col_state:
+        label_names = list(LABEL_MAP.values())
+        current = st.selectbox("Current State (当前状态)", options=label_names,
+                               help="Used for samples that carry no label (样本不带标签时使用)")
+    with col_fps:
+        fps = st.slider("Refresh (Hz)", 0.5, 5.0, 2.0, step=0.5)
+
+    try:
+        session = get_live_session(source_kind, address.strip())
+    except ValueError as e:
+        st.error(f"Invalid address (地址无效): {e}")
+        return
+    # 会话按数据源在所有浏览器会话间共享：当前状态只作用于本页面的 poll，不修改共享会话
+    label = label_names.index(current)
+    if st.button("Reset Statistics (重置统计)"):
+        session.reset()
+
+    meta = get_sensor_meta()
+    sensor_options = {f"{meta[s]['name']} ({s})": s for s in active_sensors}
+    col_family, col_sensor = st.columns(2)
+    with col_family:
+        family = st.selectbox("Brain Map Feature (拓扑图特征)", options=["mean", "std", "skew"])
+    with col_sensor:
+        sensor_label = st.selectbox("Spectrum Sensor (频谱传感器)", options=list(sensor_options.keys()))
+
+    # 只有这个片段按帧率重跑，页面其余部分保持不变
+    @st.fragment(run_every=1.0 / fps)
+    def live_charts():
+        session.poll(label)
+        counts = session.window_counts()
+        st.caption(f"{session.source.status} · {session.n_windows} windows · "
+                   + " · ".join(f"{name}: {n}" for name, n in zip(label_names, counts)))
+        map_data = prepare_live_brain_map_data(session, family, active_sensors)
+        plotly_chart(plot_brain_map(map_data, family.capitalize()), use_container_width=True)
+        if sensor_label is not None:
+            sensor_id = sensor_options[sensor_label]
+            spectrum_df = prepare_live_spectrum_data(session, sensor_id)
+            plotly_chart(plot_frequency_spectrum(spectrum_df, sensor_id=sensor_id), use_container_width=True)
+
+    live_charts()
@@ -1,11 +1,35 @@
 import streamlit as st
-from utils.viz import plot_parallel_coordinates
+from utils.profiling import plotly_chart
+from utils.figcache import cached_figure
+from utils.prep import get_sample_indices, prepare_parallel_bands
+from utils.viz import plot_parallel_coordinates, plot_parallel_bands
+
+@st.fragment
+def _signal_paths(df):
+    # 视图 / 行数 / 份额控件只重跑这一块
+    col_mode, col_budget, col_alloc = st.columns([2, 2, 1])
+    with col_mode:
+        view = st.radio(
+            "Signal Path View (信号路径视图)",
+            options=["Sample Lines (抽样折线)", "Density Bands (密度带)"],
+            horizontal=True
+        )
+    if view.startswith("Sample"):
+        with col_budget:
+            budget = st.slider("Row Budget (行数上限)", 500, 20000, 3000, step=500)
+        with col_alloc:
+            allocation = st.selectbox("Per-State Share (各状态份额)", options=["proportional", "equal"])
+        fig = cached_figure(df, "plot_parallel_coordinates", (budget, allocation),
+                            lambda: plot_parallel_coordinates(df, get_sample_indices(df, budget=budget, allocation=allocation)))
+    else:
+        fig = cached_figure(df, "plot_parallel_bands", (), lambda: plot_parallel_bands(prepare_parallel_bands(df)))
+    plotly_chart(fig, use_container_width=True)
 
 def render(df):
     #st.markdown("### 2. Overview Global Separability (概览 全局可分性)")
     
     #st.info("Visualizing whether the three mental states can be mathematically distinguished (可视化三种心理状态是否在数学上可区分)")
-        
-    st.plotly_chart(plot_parallel_coordinates(df), use_container_width=True)
+    
+    _signal_paths(df)
 
-    st.markdown("---")
\ No newline at end of file
+    st.markdown("---")
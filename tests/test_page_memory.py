@@ -0,0 +1,78 @@
+"""
+Peak memory of a full page render stays under a fixed budget.
+
+The Overview and every Deep Dive tab are rendered with AppTest on a
+synthetic dataset with the mental-state.csv schema (2479 x 1025), and
+tracemalloc's peak is checked for each run. A first untraced pass
+imports plotly / sklearn / scipy; the caches are then cleared, so the
+traced pass recomputes every chart without counting one-time imports.
+Before labels were attached once at load time, every chart copied the
+whole frame to map Label, and a render cost several hundred MB.
+
+    python -m pytest tests/test_page_memory.py
+"""
+import os
+import sys
+import tracemalloc
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 单次渲染的 tracemalloc 峰值上限：最重的 PCA 标签约 73 MB，一份整表副本（float64）约 20 MB
+PAGE_BUDGET_MB = 90
+
+SCRIPT = """
+from utils.io import load_data
+import sections.overview as overview
+import sections.deep_dives as deep_dives
+df = load_data()
+overview.render(df)
+deep_dives.render(df, ["0", "1", "2", "3"])
+"""
+
+@pytest.fixture
+def dataset_dir(tmp_path, monkeypatch):
+    from benchmarks.synthetic import write_synthetic_csv
+    from core.io import DATA_PATH, read_dataset
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("EEG_SHARED", "0")
+    os.makedirs(os.path.dirname(DATA_PATH))
+    write_synthetic_csv(DATA_PATH)
+    read_dataset(DATA_PATH)   # 预先建立二进制缓存：只测渲染，不测 CSV 解析
+    return tmp_path
+
+def _render_all(at, measure):
+    from sections.deep_dives import PANELS
+    peaks = {"(1) default": measure(at)}
+    for label, _ in PANELS:
+        at.session_state["deep_dive_panel"] = label
+        peaks[label] = measure(at)
+    return peaks
+
+def _run(at):
+    at.run()
+    assert not at.exception, [e.message for e in at.exception]
+
+def _peak_mb(at):
+    tracemalloc.reset_peak()
+    _run(at)
+    return tracemalloc.get_traced_memory()[1] / 1e6
+
+def test_page_render_peak_memory(dataset_dir):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    from utils.figcache import get_figure_cache
+
+    at = AppTest.from_string(SCRIPT, default_timeout=300)
+    _render_all(at, _run)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    get_figure_cache().clear()
+    tracemalloc.start()
+    try:
+        peaks = _render_all(at, _peak_mb)
+    finally:
+        tracemalloc.stop()
+    over = {label: round(mb, 1) for label, mb in peaks.items() if mb > PAGE_BUDGET_MB}
+    assert not over, f"peak over {PAGE_BUDGET_MB} MB: {over}"
@@ -0,0 +1,43 @@
+"""
+Feature separability statistics against scipy, including labels without rows.
+
+    python -m pytest tests/test_separability.py
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.separability import separability
+
+def _data(n_rows=300, n_features=6, n_codes=3, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, n_codes, size=n_rows)
+    values = rng.normal(size=(n_rows, n_features))
+    values[:, 0] += codes   # 只有第一列与标签有关
+    return values, codes
+
+@pytest.mark.parametrize("labels", [["a", "b"], ["a", "b", "c"]], ids=["all-present", "empty-label"])
+def test_f_and_h_match_scipy(labels):
+    from scipy.stats import f_oneway, kruskal
+    values, codes = _data(n_codes=2)
+    table = separability(values, codes, labels, [f"x{i}" for i in range(values.shape[1])], n_permutations=0)
+    for j, feature in enumerate(table.index):
+        groups = [values[codes == k, j] for k in range(2)]
+        assert table.loc[feature, "f"] == pytest.approx(f_oneway(*groups).statistic, rel=1e-9)
+        assert table.loc[feature, "f_p"] == pytest.approx(f_oneway(*groups).pvalue, rel=1e-6)
+        assert table.loc[feature, "h"] == pytest.approx(kruskal(*groups).statistic, rel=1e-9)
+        assert table.loc[feature, "h_p"] == pytest.approx(kruskal(*groups).pvalue, rel=1e-6)
+
+def test_empty_label_does_not_change_permutation_p():
+    values, codes = _data(n_codes=2)
+    features = [f"x{i}" for i in range(values.shape[1])]
+    two = separability(values, codes, ["a", "b"], features, n_permutations=99)
+    three = separability(values, codes, ["a", "b", "c"], features, n_permutations=99)
+    np.testing.assert_allclose(three["perm_p"], two["perm_p"])
+    # 纯噪声列不应全部显著（空标签曾使每个置换都失效，p 恒为 1 / (N + 1)）
+    assert two["perm_p"].iloc[0] == pytest.approx(0.01)
+    assert (two["perm_p"].iloc[1:] > 0.05).any()
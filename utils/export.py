@@ -0,0 +1,275 @@
+"""
+Headless export of the deep-dive figures.
+
+For every input dataset, every figure of the Deep Dive / Overview pages
+is rendered for every region in io.REGIONS and every sensor in
+get_sensor_meta() (dataset-wide figures once), in worker processes, and
+written as HTML (plus a static image when kaleido is installed):
+
+    exports/<dataset>/<figure>[__<region|sensor>].html
+    exports/manifest.json
+
+Each manifest entry records a key over (dataset fingerprint, figure,
+params), the same parts as the utils.figcache key. Re-running skips every
+output file whose key is unchanged and whose files still exist, and datasets are loaded through the binary
+cache in data/.cache/, so only new or modified datasets are re-rendered.
+Each dataset is published once to shared memory (core.shared) and the
+workers attach to it instead of loading their own copy. CSVs above
+EEG_INGEST_MB go through the streamed summary of core.ingest instead
+(built once by the main process). Workers use core.prep directly and
+never import Streamlit.
+
+    python -m utils.export data/mental-state.csv data/subject2.csv -o exports -j 4
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core.io import REGIONS, attach_labels, load_dataset, read_dataset, dataset_fingerprint, filter_by_region, get_sensor_meta
+from core.ingest import load_ingested, use_ingest
+from core.shared import attach, publish, release, shared_enabled
+from core.prep import (
+    get_feature_types,
+    get_pca,
+    get_correlation_engine,
+    get_correlation_network,
+    get_sample_indices,
+    prepare_brain_map_data,
+    prepare_parallel_bands,
+    prepare_spectrum_data,
+    prepare_violin_stats,
+)
+from utils.viz import (
+    plot_feature_type_counts,
+    plot_pca_analysis,
+    plot_covariance_matrix,
+    plot_frequency_spectrum,
+    plot_brain_map,
+    plot_violin_summary,
+    plot_parallel_coordinates,
+    plot_parallel_bands,
+    plot_feature_correlation_network,
+)
+
+MANIFEST = "manifest.json"
+NETWORK_TYPES = ("mean", "std", "skew")
+FAMILY_TITLES = {"mean": "Mean", "std": "Std Dev", "skew": "Skew"}
+
+def _covariance(df):
+    engine = get_correlation_engine(df, get_feature_types(df)["covM"])
+    return plot_covariance_matrix(engine, "covM", 0, 0, engine.size)   # 导出完整矩阵
+
+def _network(df):
+    feature_types = get_feature_types(df)
+    network = get_correlation_network(df, feature_types, NETWORK_TYPES, top_n=120, threshold=0.7)
+    return plot_feature_correlation_network(network, feature_types, list(NETWORK_TYPES), threshold=0.7)
+
+def _spectrum(df, sensors, layout="overlay"):
+    return plot_frequency_spectrum(prepare_spectrum_data(df, list(sensors)), sensor_id=sensors[0], layout=layout)
+
+# 名称 -> (范围, 构建函数)：dataset 范围只导出一次；region 按脑区、sensor 按单个传感器，构建函数的第二个参数是传感器元组
+FIGURES = {
+    "plot_feature_type_counts": ("dataset", lambda df: plot_feature_type_counts(get_feature_types(df))),
+    "plot_pca_analysis": ("dataset", lambda df: plot_pca_analysis(get_pca(df), df["Label"])[0]),
+    "plot_covariance_matrix": ("dataset", _covariance),
+    "plot_frequency_spectrum_overlay": ("dataset", lambda df: _spectrum(df, tuple(get_sensor_meta()))),
+    "plot_frequency_spectrum_small_multiples":
+        ("dataset", lambda df: _spectrum(df, tuple(get_sensor_meta()), layout="small_multiples")),
+    "plot_parallel_coordinates":
+        ("dataset", lambda df: plot_parallel_coordinates(df, get_sample_indices(df, budget=2000))),
+    "plot_parallel_bands": ("dataset", lambda df: plot_parallel_bands(prepare_parallel_bands(df))),
+    "plot_feature_correlation_network": ("dataset", _network),
+    "plot_frequency_spectrum": ("sensor", _spectrum),
+}
+for _family, _title in FAMILY_TITLES.items():
+    FIGURES[f"plot_brain_map_{_family}"] = (
+        "region", lambda df, sensors, f=_family, t=_title: plot_brain_map(prepare_brain_map_data(df, f, list(sensors)), t))
+    FIGURES[f"plot_violin_summary_{_family}"] = (
+        "region", lambda df, sensors, f=_family: plot_violin_summary(prepare_violin_stats(df, f, list(sensors)), f))
+
+def _slug(text):
+    return text.split(" (")[0].split()[0].lower()
+
+def output_dirs(paths, previous=None):
+    """
+    Output folder of every dataset path: its file stem, or stem-<path hash>
+    when that folder already belongs to another dataset (in the manifest
+    `previous` or earlier in paths), so a/s1.csv and b/s1.csv never
+    overwrite each other
+    """
+    owners = {}
+    for entry in (previous or {}).values():
+        owners.setdefault(os.path.dirname(entry["html"]), entry["dataset"])
+    dirs = {}
+    for path in map(os.path.abspath, paths):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if owners.setdefault(stem, path) == path:
+            dirs[path] = stem
+        else:
+            dirs[path] = f"{stem}-{hashlib.sha1(path.encode()).hexdigest()[:8]}"
+    return dirs
+
+def plan_jobs(path, fingerprint, figures=None, out_dir=None):
+    """
+    One job dict per (figure, region / sensor) of dataset path, written
+    under out_dir (default: the file stem)
+    """
+    stem = out_dir or os.path.splitext(os.path.basename(path))[0]
+    meta = get_sensor_meta()
+    jobs = []
+    for name, (scope, _) in FIGURES.items():
+        if figures and name not in figures:
+            continue
+        if scope == "dataset":
+            variants = [((), name)]
+        elif scope == "region":
+            variants = [(tuple(filter_by_region(None, r)), f"{name}__{_slug(r)}") for r in REGIONS]
+        else:
+            variants = [((s,), f"{name}__{meta[s]['name']}") for s in meta]
+        for params, filename in variants:
+            key = hashlib.sha1(json.dumps([fingerprint, name, params]).encode()).hexdigest()
+            jobs.append({"key": key, "dataset": os.path.abspath(path), "fingerprint": fingerprint,
+                         "figure": name, "scope": scope, "params": list(params),
+                         "html": os.path.join(stem, filename + ".html")})
+    return jobs
+
+def image_renderer_available():
+    return importlib.util.find_spec("kaleido") is not None
+
+_datasets = {}   # 每个工作进程内按路径复用已加载的数据集（共享内存映射，core 缓存同样按进程复用）
+
+def _load(path, fingerprint):
+    if path not in _datasets and use_ingest(path):
+        _datasets[path] = load_ingested(path)   # 主进程已写好摘要，这里只读取
+    if path not in _datasets:
+        # 工作进程退出时不会调用 release()，其登记由主进程 release() 时清理
+        shared = attach(fingerprint) if shared_enabled() else None
+        _datasets[path] = attach_labels(shared) if shared is not None else load_dataset(path)
+    return _datasets[path]
+
+def render_job(job, output_dir, image_format=None, include_plotlyjs="directory"):
+    """
+    Builds one figure and writes its files; returns the manifest entry
+    """
+    start = time.perf_counter()
+    df = _load(job["dataset"], job["fingerprint"])
+    scope, build = FIGURES[job["figure"]]
+    fig = build(df) if scope == "dataset" else build(df, tuple(job["params"]))
+    html_path = os.path.join(output_dir, job["html"])
+    os.makedirs(os.path.dirname(html_path), exist_ok=True)
+    fig.write_html(html_path, include_plotlyjs=include_plotlyjs)
+    entry = dict(job, image=None)
+    if image_format:
+        entry["image"] = os.path.splitext(job["html"])[0] + "." + image_format
+        fig.write_image(os.path.join(output_dir, entry["image"]))
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    entry["bytes"] = os.path.getsize(html_path)
+    return entry
+
+def _is_current(entry, output_dir, image_format):
+    files = [entry["html"]] + ([entry.get("image")] if image_format else [])
+    return all(f and os.path.exists(os.path.join(output_dir, f)) for f in files)
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {e["html"]: e for e in json.load(f)["figures"]}
+
+def export(paths, output_dir, workers=None, figures=None, image_format="png",
+           include_plotlyjs="directory", force=False):
+    """
+    Renders every missing or stale figure of the datasets in paths;
+    returns (rendered, reused, failed), failed being (html, error) pairs.
+    The manifest is written even when jobs fail, so every figure rendered
+    before the failure is reused by the next run.
+    """
+    if image_format and not image_renderer_available():
+        print("kaleido not installed: writing HTML only (未安装 kaleido，只导出 HTML)")
+        image_format = None
+    os.makedirs(output_dir, exist_ok=True)
+    stored = load_manifest(output_dir)
+    previous = {} if force else stored
+    dirs = output_dirs(paths, stored)   # --force 时也沿用已有的目录归属
+
+    jobs, published = [], []
+    for path in paths:
+        out_dir = dirs[os.path.abspath(path)]
+        if use_ingest(path):
+            jobs.extend(plan_jobs(path, dataset_fingerprint(load_ingested(path)), figures, out_dir))
+            continue
+        # 在主进程里先建好二进制缓存并发布共享段，工作进程只做内存映射，避免并发写缓存
+        df = read_dataset(path)
+        fingerprint = dataset_fingerprint(df)
+        jobs.extend(plan_jobs(path, fingerprint, figures, out_dir))
+        if shared_enabled() and publish(df) is not None:
+            published.append(fingerprint)
+    exported = {os.path.abspath(p) for p in paths}
+    # 本次未涉及的数据集 / 图表保留原有条目
+    entries = {h: e for h, e in previous.items()
+               if e["dataset"] not in exported or (figures and e["figure"] not in figures)}
+    todo = []
+    for job in jobs:
+        old = previous.get(job["html"])
+        if old is not None and old["key"] == job["key"] and _is_current(old, output_dir, image_format):
+            entries[job["html"]] = old
+        else:
+            todo.append(job)
+    reused = len(jobs) - len(todo)
+    print(f"{len(jobs)} figures: {reused} up to date, {len(todo)} to render", flush=True)
+
+    # 同一数据集的任务相邻提交，工作进程内的数据集和 core 缓存可以复用
+    failed = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render_job, job, output_dir, image_format, include_plotlyjs): job
+                       for job in todo}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    # 单个图表失败不影响其他任务；它没有条目，下次运行会重试
+                    entries.pop(job["html"], None)
+                    failed.append((job["html"], f"{type(e).__name__}: {e}"))
+                    print(f"  {job['html']:60s}  FAILED {failed[-1][1]}", flush=True)
+                    continue
+                entries[entry["html"]] = entry
+                print(f"  {entry['html']:60s} {entry['seconds']:7.2f}s", flush=True)
+    finally:
+        for fingerprint in published:
+            release(fingerprint)
+        # 即使中途出错也写入清单：本次已渲染的图表下次可以直接复用
+        manifest = {"generated": time.strftime("%Y-%m-%dT%H:%M:%S"), "image_format": image_format,
+                    "figures": sorted(entries.values(), key=lambda e: e["html"])}
+        tmp = os.path.join(output_dir, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, os.path.join(output_dir, MANIFEST))
+    return len(todo) - len(failed), reused, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export every analysis figure of one or more datasets")
+    parser.add_argument("datasets", nargs="+", help="feature CSVs with the mental-state.csv schema")
+    parser.add_argument("-o", "--output", default="exports")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--figures", nargs="+", choices=sorted(FIGURES), help="subset of figures")
+    parser.add_argument("--image-format", default="png", help="static image format when kaleido is installed")
+    parser.add_argument("--no-images", action="store_true", help="HTML only")
+    parser.add_argument("--plotlyjs", choices=["directory", "inline", "cdn"], default="directory",
+                        help="directory: one plotly.min.js per dataset folder; inline: self-contained files")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and re-render everything")
+    args = parser.parse_args(argv)
+
+    rendered, reused, failed = export(args.datasets, args.output, args.workers, args.figures,
+                                      None if args.no_images else args.image_format, args.plotlyjs, args.force)
+    print(f"{rendered} rendered, {reused} reused, {len(failed)} failed -> {os.path.join(args.output, MANIFEST)}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Feature extraction from raw Muse recordings (TP9 / AF7 / AF8 / TP10).
+
+Re-implements the feature set of the eeg-feature-generation script that
+produced data/mental-state.csv, with the same column names, but computes
+every sliding window at once: windows are strided views of the recording
+and each feature family is one batched NumPy call over (window x sample x
+channel) arrays. Long recordings or many files are spread over a process
+pool.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import signal, stats
+
+SENSORS = ("TP9", "AF7", "AF8", "TP10")   # 列后缀 _0.._3，与 get_sensor_meta 一致
+PERIOD = 1.0          # 窗口长度（秒），相邻窗口重叠一半
+N_SAMPLES = 150       # 每个窗口重采样后的点数
+MAINS_F = 50.0        # 工频，频谱中去掉 ±1 Hz
+N_TOP = 10            # topFreq 个数
+# 50% 重叠下与当前窗口重复的 lag1 特征（原脚本 remove_redundant 删除的列）
+REDUNDANT_LAG = ("lag1_mean_q3_", "lag1_mean_q4_", "lag1_mean_d_q3q4_",
+                 "lag1_max_q3_", "lag1_max_q4_", "lag1_max_d_q3q4_",
+                 "lag1_min_q3_", "lag1_min_q4_", "lag1_min_d_q3q4_")
+WINDOWS_PER_TASK = 2000   # 进程池中每个任务处理的窗口数
+
+def _spectrum_axis(n_samples=N_SAMPLES, period=PERIOD, mains_f=MAINS_F):
+    """
+    Frequencies kept by the FFT features and their row indices in the
+    one-sided spectrum (DC and the mains band removed)
+    """
+    freqs = np.linspace(0.0, n_samples / (2.0 * period), n_samples // 2)
+    keep = np.arange(1, n_samples // 2)
+    keep = keep[np.abs(freqs[keep] - mains_f) > 1]
+    return freqs[keep], keep
+
+def window_feature_names(n_channels=len(SENSORS), n_samples=N_SAMPLES, period=PERIOD):
+    """
+    Column names of one window's feature vector, in the original order
+    """
+    ch = [str(i) for i in range(n_channels)]
+    names = []
+    for family in ("mean", "std", "max", "min"):
+        names += [f"{family}_{c}" for c in ch]
+        names += [f"{family}_d_h2h1_{c}" for c in ch]
+        if family == "std":
+            names += [f"skew_{c}" for c in ch] + [f"kurt_{c}" for c in ch]
+            continue
+        for q in range(1, 5):
+            names += [f"{family}_q{q}_{c}" for c in ch]
+        for i in range(1, 4):
+            for j in range(i + 1, 5):
+                names += [f"{family}_d_q{i}q{j}_{c}" for c in ch]
+    iu = np.triu_indices(n_channels)
+    names += [f"covM_{i}_{j}" for i, j in zip(*iu)]
+    names += [f"eigenval_{c}" for c in ch]
+    names += [f"logcovM_{i}_{j}" for i, j in zip(*iu)]
+    names += [f"topFreq_{r}_{c}" for c in ch for r in range(1, N_TOP + 1)]
+    freqs, _ = _spectrum_axis(n_samples, period)
+    # 与原脚本相同的命名表达式（包括浮点取整的细节）
+    names += ["freq_" + "{:03d}".format(int(f)) + "_" + c for c in ch for f in 10 * np.round(freqs, 1)]
+    return names
+
+def _stat_with_parts(x, reduce):
+    """
+    reduce over the window, its halves and its quarters:
+    value, h2 - h1, q1..q4 and the six pairwise quarter differences
+    """
+    n = x.shape[1]
+    h1, h2 = np.split(x, [n // 2], axis=1)
+    quarters = np.split(x, [int(0.25 * n), int(0.5 * n), int(0.75 * n)], axis=1)
+    whole = reduce(x)
+    q = [reduce(part) for part in quarters]
+    diffs = [q[i] - q[j] for i in range(3) for j in range(i + 1, 4)]
+    return [whole, reduce(h2) - reduce(h1)] + q + diffs
+
+def window_features(windows, period=PERIOD):
+    """
+    Feature matrix (n_windows x n_features) of resampled windows shaped
+    (n_windows, n_samples, n_channels); columns follow window_feature_names
+    """
+    windows = np.asarray(windows, dtype=np.float64)
+    n_windows, n, n_channels = windows.shape
+    parts = []
+    parts += _stat_with_parts(windows, lambda x: x.mean(axis=1))
+    std = lambda x: x.std(axis=1, ddof=1)   # 与原始提取脚本相同：样本标准差
+    parts += [std(windows), std(windows[:, n // 2:]) - std(windows[:, :n // 2])]
+    parts += [stats.skew(windows, axis=1, bias=False), stats.kurtosis(windows, axis=1, bias=False)]
+    parts += _stat_with_parts(windows, lambda x: x.max(axis=1))
+    parts += _stat_with_parts(windows, lambda x: x.min(axis=1))
+
+    # 协方差矩阵、特征值、对数协方差：一次批量 eigh
+    centered = windows - windows.mean(axis=1, keepdims=True)
+    cov = np.einsum("wni,wnj->wij", centered, centered) / (n - 1)
+    iu = np.triu_indices(n_channels)
+    eigvals, eigvecs = np.linalg.eigh(cov)
+    log_w = np.log(np.clip(eigvals, np.finfo(np.float64).tiny, None))
+    log_cov = np.einsum("wik,wk,wjk->wij", eigvecs, log_w, eigvecs)
+    parts += [cov[:, iu[0], iu[1]], eigvals, np.abs(log_cov[:, iu[0], iu[1]])]
+
+    # 频谱：每个窗口整体归一化到 [-1, 1] 后做批量 FFT
+    lo = windows.min(axis=(1, 2), keepdims=True)
+    hi = windows.max(axis=(1, 2), keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        normalised = -1 + 2 * (windows - lo) / (hi - lo)
+    spectrum = np.abs(np.fft.rfft(normalised, axis=1))[:, :n // 2] * 2 / n
+    freqs, keep = _spectrum_axis(n, period)
+    spectrum = spectrum[:, keep, :]                                   # (w, f, c)
+    top = np.argsort(-spectrum, axis=1, kind="stable")[:, :N_TOP, :]  # (w, top, c)
+    parts.append(freqs[top].transpose(0, 2, 1).reshape(n_windows, -1))
+    parts.append(spectrum.transpose(0, 2, 1).reshape(n_windows, -1))
+    return np.hstack(parts)
+
+def uniform_windows(timestamps, samples, period=PERIOD, n_samples=N_SAMPLES):
+    """
+    Cuts a recording into windows of `period` seconds every period/2 and
+    resamples each to n_samples points.
+    The recording is first interpolated onto a uniform grid at its mean
+    sampling rate, so all windows share one length and can be strided
+    views of a single array; the per-window FFT resampling is then one
+    batched call.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    samples = np.asarray(samples, dtype=np.float64)
+    if len(timestamps) < 2 or timestamps[-1] - timestamps[0] < period:
+        return np.empty((0, n_samples, samples.shape[1]))
+    duration = timestamps[-1] - timestamps[0]
+    rate = (len(timestamps) - 1) / duration
+    grid = timestamps[0] + np.arange(int(duration * rate) + 1) / rate
+    uniform = np.column_stack([np.interp(grid, timestamps, samples[:, c])
+                               for c in range(samples.shape[1])])
+
+    length = int(round(period * rate))
+    step = max(length // 2, 1)
+    views = np.lib.stride_tricks.sliding_window_view(uniform, length, axis=0)[::step]
+    views = views.transpose(0, 2, 1)                                  # (w, length, c)
+    return signal.resample(views, n_samples, axis=1)
+
+def _features_parallel(windows, period, workers):
+    # workers=None 与 extract_many / 命令行一致：使用全部核心
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1 or len(windows) <= WINDOWS_PER_TASK:
+        return window_features(windows, period)
+    chunks = [windows[i:i + WINDOWS_PER_TASK] for i in range(0, len(windows), WINDOWS_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.vstack(list(pool.map(window_features, chunks, [period] * len(chunks))))
+
+def extract_features(recording, state=None, period=PERIOD, n_samples=N_SAMPLES,
+                     timestamp_col="timestamps", channels=SENSORS,
+                     remove_redundant=True, workers=None):
+    """
+    Feature DataFrame of one raw recording, with the same columns as
+    mental-state.csv: lag1_* features of the previous window, the current
+    window's features and (if state is given) Label.
+    recording: DataFrame (or CSV path) with a timestamp column in seconds
+    and one column per channel. Window chunks are split across `workers`
+    processes (default: all cores; 1 = serial).
+    """
+    if isinstance(recording, (str, os.PathLike)):
+        recording = read_muse_csv(recording, timestamp_col)
+    windows = uniform_windows(recording[timestamp_col].to_numpy(),
+                              recording[list(channels)].to_numpy(), period, n_samples)
+    names = window_feature_names(len(channels), n_samples, period)
+    features = _features_parallel(windows, period, workers)
+
+    # 每一行 = 上一个窗口 (lag1_) + 当前窗口
+    columns = ["lag1_" + c for c in names] + names
+    values = np.hstack([features[:-1], features[1:]]) if len(features) > 1 else np.empty((0, len(columns)))
+    df = pd.DataFrame(values, columns=columns)
+    if remove_redundant:
+        df = df.drop(columns=[c for c in columns if c.startswith(REDUNDANT_LAG)])
+    if state is not None:
+        df["Label"] = float(state)
+    return df
+
+def _extract_one(args):
+    source, state, kwargs = args
+    return extract_features(source, state, **kwargs)
+
+def extract_many(sources, workers=None, **kwargs):
+    """
+    Extracts several recordings in parallel (one process per recording,
+    default: all cores) and stacks the results; a single recording splits
+    its windows across the workers instead. sources: iterable of
+    (recording or path, state).
+    """
+    sources = list(sources)
+    # 每个进程处理一条录音时内部串行，避免进程池嵌套；只有一条录音时由它自己按窗口块并行
+    inner = workers if len(sources) == 1 else 1
+    tasks = [(source, state, dict(kwargs, workers=inner)) for source, state in sources]
+    if len(tasks) == 1 or (workers is not None and workers <= 1):
+        frames = [_extract_one(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(_extract_one, tasks))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def read_muse_csv(path, timestamp_col="timestamps"):
+    """
+    Raw Muse export: a timestamp column (seconds) plus TP9, AF7, AF8, TP10
+    (extra columns such as 'Right AUX' are ignored by extract_features)
+    """
+    df = pd.read_csv(path)
+    df.columns = [c.strip() for c in df.columns]
+    return df.dropna(subset=[timestamp_col]).sort_values(timestamp_col, kind="stable")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extract mental-state features from raw Muse recordings")
+    parser.add_argument("recordings", nargs="+",
+                        help="raw CSV files as PATH:LABEL (LABEL 0=Neutral, 1=Relaxed, 2=Concentrating)")
+    parser.add_argument("-o", "--output", default="data/mental-state.csv")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    sources = []
+    for item in args.recordings:
+        path, _, label = item.rpartition(":")
+        sources.append((path, float(label)) if path else (label, None))
+    df = extract_many(sources, workers=args.workers)
+    df.to_csv(args.output, index=False)
+    print(f"{len(df)} windows x {df.shape[1]} columns -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Process-wide LRU of serialized Plotly figures.
+
+Keys are (dataset fingerprint, figure name, parameters): the parameters
+are the widget state the figure depends on (region sensors, sensor,
+family, sizes...). Values are the figure JSON, so the cap is a byte
+count. A hit rebuilds the figure with validation switched off, which
+skips both the prep calls and px / graph_objects construction.
+
+Set EEG_FIGURE_CACHE=0 while editing utils/viz.py so changes show up
+without restarting.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+import plotly.graph_objects as go
+from core.io import dataset_fingerprint
+from utils import profiling
+
+FIGURE_CACHE_ENV = "EEG_FIGURE_CACHE"        # "0" / "off" 关闭（开发时使用）
+FIGURE_CACHE_MB_ENV = "EEG_FIGURE_CACHE_MB"
+DEFAULT_MAX_MB = 64
+
+class FigureCache:
+    """
+    LRU of figure JSON strings bounded by total size in bytes
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is not None:
+                self._entries.move_to_end(key)
+            return spec
+
+    def put(self, key, spec):
+        size = len(spec)
+        if size > self.max_bytes:
+            return   # 单个图表超过上限时不缓存
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._entries[key] = spec
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+def cache_enabled():
+    return os.environ.get(FIGURE_CACHE_ENV, "1").lower() not in ("0", "false", "off", "no")
+
+_cache = FigureCache(int(float(os.environ.get(FIGURE_CACHE_MB_ENV, DEFAULT_MAX_MB)) * 2 ** 20))
+
+def get_figure_cache():
+    return _cache
+
+def cached_figure(df, name, params, build):
+    """
+    Figure `name` of dataset df for widget state `params` (hashable);
+    build() is only called on a miss
+    """
+    if not cache_enabled():
+        return build()
+    key = (dataset_fingerprint(df), name, params)
+    spec = _cache.get(key)
+    recorder = profiling.active()
+    if recorder is not None:
+        recorder.add(kind="cache", name=f"figure:{name}", hit=spec is not None)
+    if spec is not None:
+        return go.Figure(json.loads(spec), _validate=False)
+    fig = build()
+    _cache.put(key, fig.to_json())
+    return fig
@@ -1,29 +1,57 @@
-import streamlit as st
-import pandas as pd
+"""
+Streamlit layer over core.io: the app's cached default dataset.
+"""
+from core.io import (
+    DATA_PATH,
+    CACHE_DIR,
+    LABEL_MAP,
+    REGIONS,
+    source_fingerprint,
+    read_dataset,
+    attach_labels,
+    dataset_fingerprint,
+    load_dataset,
+    get_sensor_meta,
+    filter_by_region,
+    cached_overview,
+)
+from utils.profiling import cache_resource, use_streamlit_cache
 
-@st.cache_data
-def load_data():
-    return pd.read_csv("data/mental-state.csv")
+use_streamlit_cache()
+
+# cache_resource：各会话共享同一个数据框（cache_data 每次命中都要反序列化一份副本）
+# 数据矩阵发布在共享内存段里，其他服务进程 / 导出进程映射同一份物理内存；页面只读取它，不做原地修改
+# core.ingest / core.shared 在函数内导入：它们依赖 pandas，首页不需要
+def _release(df):
+    from core.compact import forget_compact
+    from core.shared import release
+    forget_compact(dataset_fingerprint(df))
+    release(dataset_fingerprint(df))
 
-def get_sensor_meta():
-    # Defines metadata for sensors including coordinates for the Brain Map
-    # 0=TP9 (Left Ear), 1=AF7 (Left Front), 2=AF8 (Right Front), 3=TP10 (Right Ear)
-    return {
-        "0": {"name": "TP9", "region": "Temporal", "x": -4, "y": 0},
-        "1": {"name": "AF7", "region": "Frontal",  "x": -1.5, "y": 3},
-        "2": {"name": "AF8", "region": "Frontal",  "x": 1.5, "y": 3},
-        "3": {"name": "TP10", "region": "Temporal", "x": 4, "y": 0}
-    }
+@cache_resource(on_release=_release)
+def load_data():
+    from core.compact import compact_enabled, compact_frame
+    from core.ingest import load_ingested, use_ingest
+    from core.shared import load_shared
+    # 超过 EEG_INGEST_MB 的 CSV 装不进内存：流式导入，返回行样本，全量统计由 core.prep 从摘要读取
+    if use_ingest(DATA_PATH):
+        return load_ingested(DATA_PATH)
+    if compact_enabled():
+        # float32 模式：从内存映射的缓存转换一次，之后只保留 float32 矩阵
+        # 不经过共享内存段：float64 段会一直占用内存，映射的缓存页则可被回收
+        return compact_frame(load_dataset(DATA_PATH))
+    return load_shared(DATA_PATH)
 
-def filter_by_region(df, region_selection):
+def load_overview():
     """
-    Returns a list of column suffixes (e.g. ['0', '3']) based on selection
+    Rows, missing values and (label, rows) pairs of the default dataset:
+    read from the binary cache metadata when it is current, so the intro
+    page neither imports pandas nor loads the dataset; otherwise computed
+    on load_data() (also for streamed CSVs, whose counts cover every row)
     """
-    meta = get_sensor_meta()
-    
-    if region_selection == "Frontal Lobe (AF7 AF8)":
-        return ["1", "2"]
-    elif region_selection == "Temporal Lobe (TP9 TP10)":
-        return ["0", "3"]
-    else: # All Sensors
-        return ["0", "1", "2", "3"]
\ No newline at end of file
+    overview = cached_overview(DATA_PATH)
+    if overview is None:
+        from utils.prep import get_overview
+        overview = get_overview(load_data())
+        overview = dict(overview, label_counts=[(str(k), int(v)) for k, v in overview["label_counts"].items()])
+    return overview
@@ -1,79 +1,68 @@
-import streamlit as st
-import pandas as pd
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-import numpy as np
+"""
+Streamlit layer over core.prep: the core caches run on st.cache_data /
+st.cache_resource, live sessions are app-wide resources, and every public
+function is wrapped for the profiler.
+"""
+from core.aggregates import SpectrumTensor
+from core.classify import MODELS
+from core.io import LABEL_MAP, get_sensor_meta
+from core.prep import (
+    get_pca,
+    get_pca_data,
+    get_state_aggregates,
+    get_correlation_network,
+    get_correlation_engine,
+    get_feature_types,
+    get_overview,
+    get_separability,
+    get_top_features,
+    prepare_separability_table,
+    prepare_classifier_table,
+    prepare_brain_map_data,
+    brain_map_frame,
+    get_spectrum_tensor,
+    prepare_spectrum_data,
+    spectrum_frame,
+    prepare_top_freq_table,
+    prepare_violin_stats,
+    get_sample_indices,
+    prepare_parallel_bands,
+)
+from utils.profiling import cache_resource, instrument, use_streamlit_cache
 
-# 定义标签映射字典：将数字转换为人类可读的文字
-LABEL_MAP = {
-    0: "Neutral (中性)", 
-    1: "Relaxed (放松)", 
-    2: "Concentrating (专注)"
-}
+use_streamlit_cache()
 
-@st.cache_data
-def get_pca_data(df):
-    features = df.select_dtypes(include=[np.number])
-    # 确保有数据才运行
-    if features.shape[0] > 0 and features.shape[1] > 0:
-        scaler = StandardScaler()
-        scaled_features = scaler.fit_transform(features)
-        
-        pca = PCA(n_components=2)
-        components = pca.fit_transform(scaled_features)
-        
-        pca_df = pd.DataFrame(data=components, columns=['PC1', 'PC2'])
-        
-        # --- 核心修改：将 0,1,2 映射为文字 ---
-        # fillna 是为了防止有未知标签报错，虽然这里应该不会有
-        pca_df['Label'] = df['Label'].map(LABEL_MAP).fillna(df['Label'])
-        
-        return pca_df
-    return pd.DataFrame()
+@cache_resource(max_entries=4)
+def get_live_session(source_kind, address):
+    """
+    一个数据源对应一个实时会话（跨重跑保留环形缓冲区和累计统计，所有浏览器会话共享）
+    source_kind: 'socket'（address = "host:port"，格式错误时抛出 ValueError）或 'file'（address = 文件路径）
+    """
+    # 实时模块依赖 scipy.signal，只在打开实时页面时导入
+    from utils.stream import LiveSession, SocketSource, FileTailSource
+    if source_kind == "socket":
+        host, _, port = address.rpartition(":")
+        if not port.isdigit() or not 0 < int(port) < 65536:
+            raise ValueError(f"expected host:port with a port in 1-65535, got {address!r}")
+        source = SocketSource(host or "127.0.0.1", int(port))
+    else:
+        source = FileTailSource(address)
+    return LiveSession(source, list(LABEL_MAP.values()))
 
-def get_feature_types(df):
+def prepare_live_brain_map_data(session, feature_family, active_sensors):
     """
-    将特征按类型分类
-    返回一个字典，键为特征类型，值为该类型的所有特征列名列表
+    实时模式的大脑拓扑图数据：直接读取会话的累计均值（与会话时长无关）
     """
-    cols = [c for c in df.columns if c != 'Label']
-    types = {
-        "mean": [c for c in cols if "_mean_" in c or c.startswith("mean")],
-        "std": [c for c in cols if "_std_" in c or c.startswith("std")],
-        "skew": [c for c in cols if "_skew_" in c or c.startswith("skew")],
-        "kurt": [c for c in cols if "_kurt_" in c or c.startswith("kurt")],
-        "covM": [c for c in cols if "covM" in c],
-        "logcovM": [c for c in cols if "logcovM" in c],
-        "eigen": [c for c in cols if "eigenval" in c],
-        "freq": [c for c in cols if "freq_" in c and "topFreq" not in c],
-        "topFreq": [c for c in cols if "topFreq" in c],
-    }
-    return types
+    return brain_map_frame(session.schema, session.aggregates(),
+                           feature_family, active_sensors)
 
-def prepare_brain_map_data(df, feature_family, active_sensors):
+def prepare_live_spectrum_data(session, sensor_ids):
     """
-    为大脑拓扑图聚合数据
+    实时模式的频谱数据：各状态的累计均值和 95% 置信区间
     """
-    from utils.io import get_sensor_meta
-    meta = get_sensor_meta()
-    
-    # --- 核心修改：先创建一个带有文字标签的临时副本 ---
-    df_mapped = df.copy()
-    df_mapped['Label'] = df_mapped['Label'].map(LABEL_MAP).fillna(df_mapped['Label'])
-    
-    map_data = []
-    # 只循环过滤器允许的传感器
-    for s_id in active_sensors:
-        col = f"{feature_family}_{s_id}"
-        if col in df.columns:
-            # 按文字标签分组计算均值
-            grouped = df_mapped.groupby('Label')[col].mean()
-            for label, value in grouped.items():
-                map_data.append({
-                    "State": label,  # 这里现在是 "Neutral (中性)" 等文字了
-                    "Sensor": meta[s_id]["name"],
-                    "X": meta[s_id]["x"],
-                    "Y": meta[s_id]["y"],
-                    "Value": value
-                })
-    return pd.DataFrame(map_data)
\ No newline at end of file
+    spectrum = SpectrumTensor(session.aggregates(), session.schema,
+                              list(get_sensor_meta().keys()))
+    return spectrum_frame(spectrum, sensor_ids)
+
+# 调试模式下为公开函数计时（未开启时只多一次判断）
+instrument(globals(), "prep", modules=("core.prep",))
@@ -0,0 +1,277 @@
+"""
+Opt-in render profiler.
+
+Enabled with EEG_PROFILE=1 or the sidebar toggle. While a run is being
+recorded, every probe (section render, public utils.prep / utils.viz
+function) logs its wall time and peak traced allocation, the cache
+decorators below log hits and misses of every cached function, and
+plotly_chart logs the JSON size of each figure sent to the browser.
+When no run is being recorded the wrappers only check a thread-local and
+call through.
+
+tracemalloc is process-wide while recorders are per session (thread):
+tracing starts with the first active recorder and stops with the last
+one. Peaks are only reset while a single run is being recorded; with
+several profiled sessions at once, alloc_kb is an upper bound that may
+include the other sessions' allocations.
+
+Streamlit is imported on first use, so utils.viz (which imports this
+module for instrument) stays usable in headless jobs.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import types
+from contextlib import contextmanager
+from core import cache as core_cache
+
+PROFILE_ENV = "EEG_PROFILE"        # =1 时默认开启
+PROFILE_LOG_ENV = "EEG_PROFILE_LOG"  # 设置后每次运行的记录追加到该 JSON lines 文件
+
+_state = threading.local()   # Streamlit 每个会话在自己的脚本线程里运行
+_tracing_lock = threading.Lock()
+_tracing = {"recorders": 0, "owned": False}   # 进程内正在记录的运行数；tracemalloc 是否由这里开启
+
+def env_enabled():
+    return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+class RunRecorder:
+    """
+    Events of one script run: probes (kind, name, seconds, alloc_kb, depth),
+    cache lookups (name, hit) and chart payloads (name, payload_kb)
+    """
+
+    def __init__(self):
+        self.run_id = f"{time.time():.3f}"
+        self.events = []
+        self._stack = []
+        self._closed = False
+        with _tracing_lock:
+            if _tracing["recorders"] == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing["owned"] = True
+            _tracing["recorders"] += 1
+
+    def close(self):
+        with _tracing_lock:
+            if self._closed:
+                return
+            self._closed = True
+            _tracing["recorders"] -= 1
+            # 最后一个记录结束时才停止（只停止自己开启的追踪）
+            if _tracing["recorders"] == 0 and _tracing["owned"]:
+                tracemalloc.stop()
+                _tracing["owned"] = False
+
+    @staticmethod
+    def _reset_peak():
+        # 其他会话也在记录时不重置峰值，否则会抹掉它们的测量
+        with _tracing_lock:
+            if _tracing["recorders"] == 1:
+                tracemalloc.reset_peak()
+
+    def _enter(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1]["max"] = max(self._stack[-1]["max"], peak)
+        frame = {"start": current, "max": current}
+        self._stack.append(frame)
+        self._reset_peak()
+        return frame
+
+    def _exit(self, frame):
+        # 嵌套探针：reset_peak 之前把峰值传给外层，外层峰值不丢失
+        _, peak = tracemalloc.get_traced_memory()
+        frame["max"] = max(frame["max"], peak)
+        self._stack.pop()
+        if self._stack:
+            self._stack[-1]["max"] = max(self._stack[-1]["max"], frame["max"])
+        self._reset_peak()
+        return (frame["max"] - frame["start"]) / 1024
+
+    def add(self, **event):
+        event.setdefault("depth", len(self._stack))
+        self.events.append(dict(event, run=self.run_id))
+
+def active():
+    return getattr(_state, "recorder", None)
+
+def start_run(enabled):
+    """
+    Starts recording this script run if enabled (ends any previous one)
+    """
+    end_run()
+    _state.recorder = RunRecorder() if enabled else None
+    return _state.recorder
+
+def end_run():
+    recorder = active()
+    if recorder is not None:
+        recorder.close()
+        _state.recorder = None
+        log_path = os.environ.get(PROFILE_LOG_ENV)
+        if log_path:
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(to_jsonl(recorder.events))
+    return recorder
+
+@contextmanager
+def probe(kind, name):
+    recorder = active()
+    if recorder is None:
+        yield
+        return
+    frame = recorder._enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        alloc_kb = recorder._exit(frame)
+        recorder.add(kind=kind, name=name, seconds=seconds, alloc_kb=alloc_kb)
+
+def profiled(kind, fn):
+    """
+    fn wrapped in a probe (no-op unless a run is being recorded)
+    """
+    name = f"{fn.__module__}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if active() is None:
+            return fn(*args, **kwargs)
+        with probe(kind, name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def instrument(namespace, kind, modules=()):
+    """
+    Wraps every public function defined in a module namespace, e.g.
+    instrument(globals(), "viz") at the bottom of utils/viz.py; callers that
+    import the names afterwards get the wrapped versions. Functions
+    re-exported from `modules` are wrapped too (utils.prep over core.prep)
+    """
+    sources = {namespace["__name__"], *modules}
+    for name, obj in list(namespace.items()):
+        if (isinstance(obj, types.FunctionType) and not name.startswith("_")
+                and obj.__module__ in sources):
+            namespace[name] = profiled(kind, obj)
+
+def _counted(st_decorator, **kwargs):
+    def decorate(fn):
+        name = f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def body(*args, **kw):
+            # 只有缓存未命中时 Streamlit 才会执行函数体
+            _state.missed = True
+            return fn(*args, **kw)
+        cached = st_decorator(**kwargs)(body) if kwargs else st_decorator(body)
+
+        @functools.wraps(fn)
+        def call(*args, **kw):
+            recorder = active()
+            if recorder is None:
+                return cached(*args, **kw)
+            outer, _state.missed = getattr(_state, "missed", False), False
+            try:
+                return cached(*args, **kw)
+            finally:
+                recorder.add(kind="cache", name=name, hit=not _state.missed)
+                _state.missed = outer
+        call.clear = cached.clear
+        return call
+    return decorate
+
+def cache_data(**kwargs):
+    """
+    st.cache_data that also counts hits / misses while profiling
+    """
+    import streamlit as st
+    return _counted(st.cache_data, **kwargs)
+
+def cache_resource(**kwargs):
+    """
+    st.cache_resource that also counts hits / misses while profiling
+    """
+    import streamlit as st
+    return _counted(st.cache_resource, **kwargs)
+
+class StreamlitCacheBackend:
+    """
+    core.cache backend for the app: memoized core functions become
+    st.cache_data / st.cache_resource functions (shared across sessions,
+    counted by the profiler)
+    """
+
+    def wrap(self, fn, kind, max_entries):
+        decorator = cache_resource if kind == "resource" else cache_data
+        return decorator(max_entries=max_entries)(fn)
+
+    def clear(self):
+        import streamlit as st
+        st.cache_data.clear()
+        st.cache_resource.clear()
+
+_streamlit_backend = StreamlitCacheBackend()
+
+def use_streamlit_cache():
+    """
+    Routes core.cache through Streamlit (idempotent; called by the utils layer)
+    """
+    if core_cache.get_backend() is not _streamlit_backend:
+        core_cache.set_backend(_streamlit_backend)
+
+def plotly_chart(fig, **kwargs):
+    """
+    st.plotly_chart that records the serialized figure size while profiling
+    """
+    recorder = active()
+    if recorder is not None:
+        title = fig.layout.title.text or "untitled"
+        recorder.add(kind="chart", name=title, payload_kb=len(fig.to_json()) / 1024)
+    import streamlit as st
+    return st.plotly_chart(fig, **kwargs)
+
+def summary_frame(events):
+    """
+    One row per (kind, name): calls, total / max seconds, peak allocation,
+    cache hits / misses and chart payload
+    """
+    import pandas as pd   # 只在报告里用到：不拖慢首页
+    if not events:
+        return pd.DataFrame()
+    df = pd.DataFrame(events)
+    for col in ("seconds", "alloc_kb", "payload_kb", "hit"):
+        if col not in df:
+            df[col] = pd.NA
+    df["hit"] = df["hit"].astype("boolean")
+    out = df.groupby(["kind", "name"], sort=False).agg(
+        calls=("name", "size"),
+        total_s=("seconds", lambda s: s.sum(min_count=1)),
+        max_s=("seconds", "max"),
+        peak_alloc_kb=("alloc_kb", "max"),
+        cache_hits=("hit", lambda h: int(h.fillna(False).sum())),
+        cache_misses=("hit", lambda h: int((~h.dropna()).sum())),
+        payload_kb=("payload_kb", lambda s: s.sum(min_count=1)),
+    ).reset_index()
+    return out.sort_values("total_s", ascending=False, na_position="last").reset_index(drop=True)
+
+def to_jsonl(events):
+    return "".join(json.dumps(e, default=str) + "\n" for e in events)
+
+def render_report(recorder):
+    """
+    Profiler table and JSON lines download for the finished run
+    """
+    if recorder is None:
+        return
+    import streamlit as st
+    with st.expander("Profiler (性能分析)", expanded=True):
+        st.caption("Timings include tracemalloc overhead (计时包含内存追踪的额外开销)")
+        st.dataframe(summary_frame(recorder.events), use_container_width=True)
+        st.download_button("Download JSON lines (下载 JSONL)", to_jsonl(recorder.events),
+                           file_name=f"profile-{recorder.run_id}.jsonl", mime="application/json")
@@ -0,0 +1,351 @@
+"""
+Live ingestion of Muse samples.
+
+Samples arrive as text lines "timestamp,TP9,AF7,AF8,TP10[,label]" from a
+local TCP socket or a growing file, go into a fixed-size ring buffer, and
+every completed window (same windows as utils.features) updates per-state
+running statistics. Each poll costs O(new samples), independent of how
+long the session has been running.
+
+`python -m utils.stream raw.csv --port 5555` replays a recorded session
+as a stand-in for the headset.
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+import numpy as np
+from scipy import signal
+from core.aggregates import STATS, StateAggregates
+from core.schema import FeatureSchema
+from utils.features import SENSORS, PERIOD, N_SAMPLES, window_features, window_feature_names
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of (timestamp, channels, label) rows; old rows
+    are overwritten once it is full
+    """
+
+    def __init__(self, capacity, n_channels):
+        self.capacity = capacity
+        self._times = np.zeros(capacity)
+        self._values = np.zeros((capacity, n_channels))
+        self._labels = np.full(capacity, -1, dtype=np.int64)
+        self.total = 0   # 累计写入的行数
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, timestamps, values, labels=None):
+        """
+        Appends rows; labels is the state code of each row (-1 = none)
+        """
+        if labels is None:
+            labels = np.full(len(timestamps), -1, dtype=np.int64)
+        timestamps, values, labels = timestamps[-self.capacity:], values[-self.capacity:], labels[-self.capacity:]
+        idx = (self.total + np.arange(len(timestamps))) % self.capacity
+        self._times[idx] = timestamps
+        self._values[idx] = values
+        self._labels[idx] = labels
+        self.total += len(timestamps)
+
+    def latest(self, n=None):
+        """
+        (timestamps, values, labels) of the last n rows (default: all held
+        rows) in arrival order
+        """
+        n = len(self) if n is None else min(n, len(self))
+        idx = (self.total - n + np.arange(n)) % self.capacity
+        return self._times[idx], self._values[idx], self._labels[idx]
+
+class RunningStats:
+    """
+    Per-label running count / mean / M2 of every column (Welford, merged a
+    batch at a time with Chan's formula); NaNs are skipped per column
+    """
+
+    def __init__(self, n_labels, n_columns):
+        self.count = np.zeros((n_labels, n_columns))
+        self.mean = np.zeros((n_labels, n_columns))
+        self.m2 = np.zeros((n_labels, n_columns))
+
+    def update(self, code, rows):
+        rows = np.atleast_2d(rows)
+        valid = ~np.isnan(rows)
+        n_b = valid.sum(axis=0)
+        if not n_b.any():
+            return
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, np.nansum(rows, axis=0) / n_b, 0.0)
+        m2_b = np.nansum((rows - mean_b) ** 2, axis=0)
+        n_a, mean_a = self.count[code], self.mean[code]
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean[code] = np.where(n > 0, mean_a + delta * n_b / n, 0.0)
+            self.m2[code] += m2_b + np.where(n > 0, delta ** 2 * n_a * n_b / n, 0.0)
+        self.count[code] = n
+
+    @property
+    def var(self):
+        # ddof=1，与 compute_state_aggregates 的 std 一致
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+def _parse_lines(lines, n_channels):
+    """
+    (timestamps, values, labels) of well-formed numeric lines; headers and
+    broken lines are dropped. labels is -1 where a line has no label.
+    """
+    rows = []
+    for line in lines:
+        parts = line.strip().split(",")
+        if len(parts) < 1 + n_channels:
+            continue
+        try:
+            row = [float(p) for p in parts[:2 + n_channels]]
+        except ValueError:
+            continue
+        rows.append(row + [-1.0] * (2 + n_channels - len(row)))
+    if not rows:
+        return np.empty(0), np.empty((0, n_channels)), np.empty(0, dtype=np.int64)
+    rows = np.asarray(rows)
+    return rows[:, 0], rows[:, 1:1 + n_channels], rows[:, 1 + n_channels].astype(np.int64)
+
+class SocketSource:
+    """
+    Reads lines from a TCP server (e.g. the replay script) without blocking;
+    reconnects on the next poll if the connection drops
+    """
+
+    def __init__(self, host="127.0.0.1", port=5555):
+        self.host, self.port = host, port
+        self._sock = None
+        self._pending = b""
+        self.status = "disconnected"
+
+    def read_lines(self):
+        if self._sock is None:
+            try:
+                self._sock = socket.create_connection((self.host, self.port), timeout=0.5)
+                self._sock.setblocking(False)
+                self.status = f"connected to {self.host}:{self.port}"
+            except OSError as e:
+                self.status = f"cannot connect to {self.host}:{self.port} ({e})"
+                return []
+        chunks = []
+        while True:
+            try:
+                data = self._sock.recv(1 << 16)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                data, self.status = b"", f"connection lost ({e})"
+            if not data:
+                self._sock.close()
+                self._sock = None
+                break
+            chunks.append(data)
+        data = self._pending + b"".join(chunks)
+        *lines, self._pending = data.split(b"\n")
+        return [l.decode("ascii", "ignore") for l in lines]
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+class FileTailSource:
+    """
+    Follows a CSV file that another process keeps appending to (tail -f);
+    starts at the current end of the file unless from_start=True
+    """
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self._offset = None if not from_start else 0
+        self._pending = ""
+        self.status = "waiting for file"
+
+    def read_lines(self):
+        if not os.path.exists(self.path):
+            self.status = f"waiting for {self.path}"
+            return []
+        size = os.path.getsize(self.path)
+        if self._offset is None or size < self._offset:
+            # 首次打开从文件末尾开始；文件被截断则从头开始
+            self._offset = size if self._offset is None else 0
+        with open(self.path, "r", encoding="ascii", errors="ignore") as f:
+            f.seek(self._offset)
+            data = f.read()
+            self._offset = f.tell()
+        self.status = f"following {self.path}"
+        *lines, self._pending = (self._pending + data).split("\n")
+        return lines
+
+    def close(self):
+        pass
+
+class LiveSession:
+    """
+    Ring buffer + incremental window features + per-state running stats.
+    poll() ingests whatever the source has, emits every window that has
+    completed since the last call and folds its features into the stats of
+    the state of its samples (the label carried by each sample, else the
+    label given to poll); windows spanning a state change are not folded.
+    One session can be polled from several threads (app viewers of the
+    same source); poll / reset / aggregates hold a lock.
+    """
+
+    def __init__(self, source, label_names, buffer_seconds=10.0, rate=256,
+                 period=PERIOD, n_samples=N_SAMPLES, channels=SENSORS):
+        self.source = source
+        self.label_names = list(label_names)
+        self.period, self.n_samples = period, n_samples
+        self.channels = list(channels)
+        self.columns = window_feature_names(len(self.channels), n_samples, period)
+        self.schema = FeatureSchema(self.columns)
+        self.buffer = RingBuffer(int(buffer_seconds * rate), len(self.channels))
+        self.label = 0             # 默认状态（poll 未指定且样本自身不带标签时使用）
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = RunningStats(len(self.label_names), len(self.columns))
+            self.n_windows = 0
+            self.latest_features = None
+            self._next_end = None
+
+    def poll(self, label=None):
+        """
+        Ingests new samples, unlabeled ones as state `label` (default
+        self.label); returns the number of windows added
+        """
+        label = self.label if label is None else label
+        with self._lock:
+            times, values, labels = _parse_lines(self.source.read_lines(), len(self.channels))
+            if len(times) == 0:
+                return 0
+            # 每个样本记下自己的状态：样本自带标签优先，否则取本次 poll 的标签
+            labels = np.where(labels >= 0, labels, label)
+            added = 0
+            # 分批写入环形缓冲区，保证每个窗口的数据在被覆盖前已处理
+            step = max(self.buffer.capacity // 2, 1)
+            for start in range(0, len(times), step):
+                sl = slice(start, start + step)
+                self.buffer.extend(times[sl], values[sl], labels[sl])
+                added += self._emit_windows()
+            return added
+
+    def _emit_windows(self):
+        times, values, labels = self.buffer.latest()
+        if self._next_end is None:
+            self._next_end = times[0] + self.period
+        ends = []
+        while self._next_end <= times[-1]:
+            ends.append(self._next_end)
+            self._next_end += self.period / 2
+        if not ends:
+            return 0
+        windows, codes = [], []
+        for end in ends:
+            lo, hi = np.searchsorted(times, [end - self.period, end])
+            if hi - lo < 2:
+                continue
+            windows.append(signal.resample(values[lo:hi], self.n_samples, axis=0))
+            # 窗口的状态取自它自己的样本；跨越状态切换的窗口不计入任何状态（-1）
+            window_labels = labels[lo:hi]
+            codes.append(int(window_labels[0]) if np.all(window_labels == window_labels[0]) else -1)
+        if not windows:
+            return 0
+        features = window_features(np.stack(windows), self.period)
+        codes = np.asarray(codes)
+        for code in np.unique(codes):
+            if 0 <= code < len(self.label_names):
+                self.stats.update(code, features[codes == code])
+        self.latest_features = features[-1]
+        self.n_windows += len(features)
+        return len(features)
+
+    def window_counts(self):
+        """
+        Windows folded into each state so far
+        """
+        with self._lock:
+            return self.stats.count[:, 0].astype(int)
+
+    def aggregates(self):
+        """
+        Running stats as a StateAggregates cube over the window columns
+        (mean / std / count; quantiles are not tracked and stay NaN)
+        """
+        cube = np.full((len(self.label_names), len(self.columns), len(STATS)), np.nan)
+        with self._lock:
+            seen = self.stats.count > 0
+            cube[..., STATS.index("mean")] = np.where(seen, self.stats.mean, np.nan)
+            cube[..., STATS.index("std")] = np.sqrt(self.stats.var)
+            cube[..., STATS.index("count")] = self.stats.count
+        return StateAggregates(self.label_names, self.columns, cube)
+
+def replay(path, host="127.0.0.1", port=5555, output=None, speed=1.0, label=None,
+           loop=False, timestamp_col="timestamps", channels=SENSORS):
+    """
+    Streams a raw recording in real time (scaled by speed) to one TCP
+    client at a time, or appends it to `output` for FileTailSource
+    """
+    from utils.features import read_muse_csv
+    raw = read_muse_csv(path, timestamp_col)
+    times = raw[timestamp_col].to_numpy(dtype=np.float64)
+    values = raw[list(channels)].to_numpy(dtype=np.float64)
+    suffix = "" if label is None else f",{int(label)}"
+
+    def lines():
+        offset = 0.0
+        while True:
+            for t, row in zip(times, values):
+                yield t + offset, ",".join([f"{t + offset:.6f}"] + [f"{v:.3f}" for v in row]) + suffix + "\n"
+            if not loop:
+                return
+            offset += times[-1] - times[0] + (times[-1] - times[0]) / max(len(times) - 1, 1)
+
+    def paced(sink):
+        start, t0 = time.monotonic(), None
+        for t, line in lines():
+            t0 = t if t0 is None else t0
+            delay = (t - t0) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+            sink(line)
+
+    if output is not None:
+        with open(output, "a", encoding="ascii") as f:
+            paced(lambda line: (f.write(line), f.flush()))
+        return
+    with socket.create_server((host, port)) as server:
+        print(f"replaying {path} on {host}:{port}")
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    paced(lambda line: conn.sendall(line.encode("ascii")))
+                except OSError:
+                    continue
+            if not loop:
+                return
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a raw Muse recording as a live stream")
+    parser.add_argument("recording", help="raw CSV with timestamps, TP9, AF7, AF8, TP10")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--output", help="append to this file instead of serving a socket")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed factor")
+    parser.add_argument("--label", type=int, help="state code attached to every sample")
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args(argv)
+    replay(args.recording, args.host, args.port, args.output, args.speed, args.label, args.loop)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,96 @@
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
+from core.schema import get_schema
+from core.prep import regional_average
+from utils.profiling import instrument
 
-def plot_pca_2d(pca_df):
+# 散点图渲染模式阈值（点数）
+WEBGL_MIN_POINTS = 5_000       # 以上改用 WebGL (scattergl)
+DENSITY_MIN_POINTS = 200_000   # 以上在服务端分箱，只发送密度栅格
+DENSITY_BINS = 150
+
+def scatter_render_mode(n_points, mode="auto"):
+    """
+    'svg' / 'webgl' / 'density'; 'auto' picks by point count
+    """
+    if mode != "auto":
+        return mode
+    if n_points >= DENSITY_MIN_POINTS:
+        return "density"
+    if n_points >= WEBGL_MIN_POINTS:
+        return "webgl"
+    return "svg"
+
+def _bin_edges(values, bins):
+    low, high = float(values.min()), float(values.max())
+    if low == high:
+        # 常数分量：边界相同会让 histogram2d 报错，向两侧各扩展半个单位
+        pad = max(abs(low), 1.0) * 0.5
+        low, high = low - pad, high + pad
+    return np.linspace(low, high, bins + 1)
+
+def plot_density_2d(points_df, x, y, color, title, labels=None, bins=DENSITY_BINS):
+    """
+    服务端二维直方图：每个类别一个面板，颜色为 log(1+计数)
+    图的大小只取决于 bins，与点数无关
+    """
+    valid = points_df[[x, y]].notna().all(axis=1)
+    xs = points_df.loc[valid, x].to_numpy()
+    ys = points_df.loc[valid, y].to_numpy()
+    groups = points_df.loc[valid, color]
+    if len(xs) == 0:
+        return px.scatter(title="No Data")
+    # 所有面板共用同一组分箱边界，便于比较
+    x_edges = _bin_edges(xs, bins)
+    y_edges = _bin_edges(ys, bins)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+
+    names = [g for g in pd.unique(groups) if pd.notna(g)]
+    if isinstance(groups.dtype, pd.CategoricalDtype):
+        names = [g for g in groups.cat.categories if g in set(names)]
+    fig = make_subplots(rows=1, cols=len(names), shared_xaxes=True, shared_yaxes=True,
+                        subplot_titles=[str(g) for g in names])
+    codes = pd.Categorical(groups, categories=names).codes
+    for i, name in enumerate(names):
+        mask = codes == i
+        counts, _, _ = np.histogram2d(xs[mask], ys[mask], bins=[x_edges, y_edges])
+        fig.add_trace(go.Heatmap(x=x_centers, y=y_centers, z=np.log1p(counts.T).astype(np.float32),
+                                 coloraxis="coloraxis", name=str(name),
+                                 hovertemplate=f"{name}<br>{x}=%{{x:.2f}}<br>{y}=%{{y:.2f}}"
+                                               "<br>log(1+count)=%{z:.2f}<extra></extra>"),
+                      row=1, col=i + 1)
+    labels = labels or {}
+    fig.update_xaxes(title_text=labels.get(x, x))
+    fig.update_yaxes(title_text=labels.get(y, y), col=1)
+    fig.update_layout(title=f"{title} - density of {len(xs):,} points",
+                      coloraxis=dict(colorscale="Viridis", colorbar_title="log(1+n)"),
+                      template="plotly_white")
+    return fig
+
+def _pca_scatter(pca_df, title, labels=None, render_mode="auto"):
+    mode = scatter_render_mode(len(pca_df), render_mode)
+    if mode == "density":
+        return plot_density_2d(pca_df, 'PC1', 'PC2', 'Label', title, labels=labels)
     return px.scatter(pca_df, x='PC1', y='PC2', color='Label',
-                      title="2D Data Projection PCA (数据二维投影)",
+                      title=title, labels=labels,
                       opacity=0.6, template="plotly_white",
+                      render_mode="webgl" if mode == "webgl" else "svg",
                       color_discrete_sequence=px.colors.qualitative.Bold)
 
+def plot_pca_2d(pca_df, render_mode="auto"):
+    return _pca_scatter(pca_df, "2D Data Projection PCA (数据二维投影)", render_mode=render_mode)
+
+PARALLEL_AXIS_LABELS = {
+    "mean_0": "TP9 (Left Ear)",
+    "mean_1": "AF7 (Left Front)",
+    "mean_2": "AF8 (Right Front)",
+    "mean_3": "TP10 (Right Ear)"
+}
+
 def plot_brain_map(map_df, feature_name):
     """
     Draws the Brain Topography Map (3 Heads for 3 States)
@@ -60,22 +140,19 @@ def plot_violin_comparison(df, feature_family, active_sensors):
     Aggregates selected sensors and plots distribution
     """
     # 1. Select relevant columns
-    cols = [f"{feature_family}_{s}" for s in active_sensors if f"{feature_family}_{s}" in df.columns]
+    positions = get_schema(df).select(feature_family, lag=0, variant="", sensor=active_sensors)
     
-    if not cols:
+    if len(positions) == 0:
         return px.scatter(title="No Data")
 
-    # --- FIX: Map labels for the Violin Plot as well ---
-    plot_df = df.copy()
-    label_map = {
-        0: "Neutral (中性)", 
-        1: "Relaxed (放松)", 
-        2: "Concentrating (专注)"
-    }
-    plot_df['Label'] = plot_df['Label'].map(label_map)
-
     # 2. Average the values across the selected region
-    plot_df['Regional_Avg'] = plot_df[cols].mean(axis=1)
+    # Label is already a categorical of readable names, so only the two
+    # plotted columns are materialised (no copy of the whole frame);
+    # in compact mode the row means read the float32 matrix
+    plot_df = pd.DataFrame({
+        'Label': df['Label'],
+        'Regional_Avg': regional_average(df, positions)
+    })
     
     # 3. Plot Violin
     fig = px.violin(plot_df, x="Label", y="Regional_Avg", color="Label", box=True,
@@ -84,50 +161,106 @@ def plot_violin_comparison(df, feature_family, active_sensors):
                     template="seaborn")
     return fig
 
-def plot_parallel_coordinates(df):
+def plot_violin_summary(violin_stats, feature_family):
+    """
+    Violin plot drawn from server-side KDE curves and box statistics
+    (utils.prep.prepare_violin_stats) instead of raw rows
+    """
+    if violin_stats is None or not violin_stats["states"]:
+        return px.scatter(title="No Data")
+
+    grid = violin_stats["grid"]
+    colors = px.colors.qualitative.Plotly
+    # 所有状态共用同一宽度比例，形状之间可比较
+    peak = max(density.max() for _, density, _ in violin_stats["states"]) or 1.0
+    fig = go.Figure()
+    for i, (name, density, stats) in enumerate(violin_stats["states"]):
+        color = colors[i % len(colors)]
+        half_width = density / peak * 0.4
+        # 去掉密度几乎为 0 的两端
+        keep = density >= density.max() * 1e-3
+        y = grid[keep]
+        w = half_width[keep]
+        fig.add_trace(go.Scatter(x=np.concatenate([i - w, (i + w)[::-1]]),
+                                 y=np.concatenate([y, y[::-1]]),
+                                 fill='toself', mode='lines', line=dict(color=color, width=1),
+                                 name=name, legendgroup=name, hoverinfo='skip'))
+        fig.add_trace(go.Box(x=[i], q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+                             lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]],
+                             mean=[stats["mean"]], width=0.08, fillcolor='white',
+                             line=dict(color=color), name=name, legendgroup=name,
+                             showlegend=False, hovertemplate=f"{name}<br>n={stats['n']}<extra></extra>"))
+    names = [name for name, _, _ in violin_stats["states"]]
+    fig.update_layout(title=f"Regional Distribution {feature_family} (区域分布对比)",
+                      template="seaborn",
+                      xaxis=dict(tickvals=list(range(len(names))), ticktext=names, title="Label"),
+                      yaxis_title="Regional_Avg",
+                      legend_title_text="Label")
+    return fig
+
+def plot_parallel_coordinates(df, sample_indices=None):
     """
     平行坐标图:展示每个样本在4个传感器上的原始数值路径
+    sample_indices: 只画这些行（utils.prep.get_sample_indices 的分层抽样），None 表示全部行
+    parcoords 本身由 WebGL 渲染，抽样限制的是发送到浏览器的行数
     """
     # 1. 选择要展示的列（这里选 Mean 电压，因为它最直观）
     cols = ['mean_0', 'mean_1', 'mean_2', 'mean_3']
     
-    # 2. 数据准备
-    plot_df = df[cols + ['Label']].copy()
-    
-    # 平行坐标图在 Plotly 中需要数字作为颜色映射，所以我们需要手动映射一下
-    # 但为了图例显示文字，我们用稍微 trick 一点的方法：使用 px.line_polars 的逻辑或者直接用 scatter 模拟
-    # 不过 px.parallel_coordinates 是最标准的
-    
-    # 为了颜色能正确显示类别，我们需要把 Label 映射回数字，但作为 color_continuous_scale 使用
-    label_map_reverse = {
-        "Neutral (中性)": 0,
-        "Relaxed (放松)": 1, 
-        "Concentrating (专注)": 2
-    }
-    # 处理可能已经是数字的情况
-    if plot_df['Label'].dtype == 'O': # 如果是字符串
-         plot_df['Color_ID'] = plot_df['Label'].map(label_map_reverse)
+    # 2. 数据准备（只取这4列，抽样时只取样本行）
+    labels = df['Label']
+    plot_df = df[cols]
+    if sample_indices is not None:
+        plot_df = plot_df.iloc[sample_indices]
+        labels = labels.iloc[sample_indices]
+    
+    # 平行坐标图在 Plotly 中需要数字作为颜色映射
+    # Label 是 Categorical 时直接用类别编码 (0,1,2)，否则本身就是数字
+    if isinstance(labels.dtype, pd.CategoricalDtype):
+        color_id = labels.cat.codes.to_numpy()
     else:
-         plot_df['Color_ID'] = plot_df['Label']
+        color_id = labels.to_numpy()
 
+    title = "Global Signal Path: Raw Voltage Flow (全局信号路径：原始电压流向)"
+    if sample_indices is not None and len(plot_df) < len(df):
+        title += f" - stratified sample of {len(plot_df):,} / {len(df):,} rows"
     fig = px.parallel_coordinates(plot_df, 
                                   dimensions=cols,
-                                  color="Color_ID",
+                                  color=color_id,
                                   # 使用红蓝绿配色
                                   color_continuous_scale=[(0.0, "blue"), (0.5, "green"), (1.0, "red")],
-                                  labels={
-                                      "mean_0": "TP9 (Left Ear)",
-                                      "mean_1": "AF7 (Left Front)",
-                                      "mean_2": "AF8 (Right Front)",
-                                      "mean_3": "TP10 (Right Ear)"
-                                  },
-                                  title="Global Signal Path: Raw Voltage Flow (全局信号路径：原始电压流向)")
+                                  labels=PARALLEL_AXIS_LABELS,
+                                  title=title)
     
     # 隐藏侧边的颜色条数字，因为只有0,1,2没意义
     fig.update_layout(coloraxis_showscale=False)
     
     return fig
 
+def plot_parallel_bands(band_df):
+    """
+    平行坐标的“密度带”模式：每个状态在4个传感器上的四分位区间 (q25-q75) 和中位数折线
+    band_df 来自 utils.prep.prepare_parallel_bands，与行数无关
+    """
+    if band_df.empty:
+        return px.line(title="No Data")
+    colors = {"Neutral (中性)": "blue", "Relaxed (放松)": "green", "Concentrating (专注)": "red"}
+    fig = go.Figure()
+    for i, (state, d) in enumerate(band_df.groupby('State', sort=False, observed=True)):
+        color = colors.get(state, px.colors.qualitative.Plotly[i % 10])
+        axis = [PARALLEL_AXIS_LABELS.get(c, c) for c in d['Column']]
+        fig.add_trace(go.Scatter(x=axis + axis[::-1],
+                                 y=np.concatenate([d['Q75'], d['Q25'][::-1]]),
+                                 fill='toself', fillcolor=color, opacity=0.2,
+                                 line=dict(width=0), hoverinfo='skip',
+                                 legendgroup=state, showlegend=False))
+        fig.add_trace(go.Scatter(x=axis, y=d['Median'], mode='lines+markers', name=state,
+                                 line=dict(color=color, width=3), legendgroup=state))
+    fig.update_layout(title="Global Signal Path: Per-State Quartile Bands (全局信号路径：各状态四分位带)",
+                      yaxis_title="Mean Voltage (平均电压)",
+                      template="plotly_white")
+    return fig
+
 def plot_feature_type_counts(feature_types):
     """
     绘制特征类型统计柱状图
@@ -146,44 +279,58 @@ def plot_feature_type_counts(feature_types):
     fig.update_layout(xaxis_tickangle=-45)
     return fig
 
-def plot_pca_analysis(df):
+def plot_separability_ranking(top_df, by='f'):
+    """
+    最能区分状态的特征排行（横向柱状图，颜色为特征类型）
+    top_df 来自 prepare_separability_table
+    """
+    if top_df.empty:
+        return px.bar(title="No Data")
+    titles = {'f': 'ANOVA F', 'h': 'Kruskal-Wallis H', 'mi': 'Mutual Information (互信息)',
+              'eta_sq': 'Eta Squared (η²)', 'epsilon_sq': 'Epsilon Squared (ε²)', 'cohen_d': "max |Cohen's d|"}
+    fig = px.bar(top_df, x=by, y='feature', color='Family', orientation='h',
+                 hover_data=['Sensor', 'f_p', 'perm_p', 'pair'],
+                 title=f'Top {len(top_df)} Separating Features by {titles.get(by, by)} (最能区分状态的特征)',
+                 labels={by: titles.get(by, by), 'feature': 'Feature (特征)'},
+                 template='plotly_white')
+    fig.update_layout(yaxis={'categoryorder': 'array', 'categoryarray': list(top_df['feature'])[::-1]})
+    return fig
+
+def plot_accuracy_latency(table):
+    """
+    分类器基准：准确率（误差线为各折标准差）对单样本推理延迟，左上角最优
+    table 来自 prepare_classifier_table
+    """
+    if table.empty:
+        return px.scatter(title="No Data")
+    fig = px.scatter(table, x='Latency (ms)', y='Accuracy', error_y='Accuracy Std',
+                     color='Sensors', symbol='Model', log_x=True,
+                     hover_data=['Features', 'Selection Accuracy', 'Fit (ms)', 'Batch (us/row)', 'Accuracy / ms', 'Params'],
+                     title='Decoding Accuracy vs Inference Latency (解码准确率与推理延迟)',
+                     labels={'Latency (ms)': 'Single-sample Latency, ms (单样本推理延迟)',
+                             'Accuracy': 'Nested CV Accuracy (嵌套交叉验证准确率)'},
+                     template='plotly_white')
+    fig.update_traces(marker_size=12)
+    return fig
+
+def plot_pca_analysis(pca, labels, render_mode="auto"):
     """
     PCA降维分析，返回PCA图和解释方差比例
+    pca 是 utils.prep.get_pca 的拟合结果（散点与方差来自同一次拟合）
+    点数多时自动切换 WebGL / 服务端密度图（见 scatter_render_mode）
     """
-    # 选择数值特征
-    features = df.select_dtypes(include=[np.number])
-    # 排除Label列（如果它是数值类型）
-    if 'Label' in features.columns:
-        features = features.drop('Label', axis=1)
-    
-    if features.shape[0] == 0 or features.shape[1] == 0:
+    if pca is None or pca.scores.shape[1] < 2:
         return px.scatter(title="No Data"), None
     
-    # 标准化
-    scaler = StandardScaler()
-    scaled_features = scaler.fit_transform(features)
-    
-    # PCA降维
-    pca = PCA(n_components=2)
-    components = pca.fit_transform(scaled_features)
-    
     # 创建PCA DataFrame
-    pca_df = pd.DataFrame(data=components, columns=['PC1', 'PC2'])
-    label_map = {
-        0: "Neutral (中性)", 
-        1: "Relaxed (放松)", 
-        2: "Concentrating (专注)"
-    }
-    pca_df['Label'] = df['Label'].map(label_map).fillna(df['Label'])
+    pca_df = pd.DataFrame(data=pca.scores[:, :2], columns=['PC1', 'PC2'])
+    pca_df['Label'] = np.asarray(labels)
     
     # 绘制PCA散点图
-    fig = px.scatter(pca_df, x='PC1', y='PC2', color='Label',
-                     title='PCA Dimensionality Reduction (PCA降维可视化)',
-                     labels={'PC1': f'PC1 ({pca.explained_variance_ratio_[0]:.2%} variance)',
-                            'PC2': f'PC2 ({pca.explained_variance_ratio_[1]:.2%} variance)'},
-                     opacity=0.6,
-                     template='plotly_white',
-                     color_discrete_sequence=px.colors.qualitative.Bold)
+    fig = _pca_scatter(pca_df, 'PCA Dimensionality Reduction (PCA降维可视化)',
+                       labels={'PC1': f'PC1 ({pca.explained_variance_ratio_[0]:.2%} variance)',
+                               'PC2': f'PC2 ({pca.explained_variance_ratio_[1]:.2%} variance)'},
+                       render_mode=render_mode)
     
     # 计算解释方差比例
     explained_var = {
@@ -194,171 +341,98 @@ def plot_pca_analysis(df):
     
     return fig, explained_var
 
-def plot_covariance_matrix(df, feature_types):
+def plot_covariance_matrix(engine, family='covM', row_start=0, col_start=0, size=30):
     """
-    可视化协方差矩阵(covM特征)
+    可视化特征相关性矩阵的一个窗口（默认 covM 特征的前 30x30）
+    engine 来自 utils.prep.get_correlation_engine，只计算窗口覆盖到的块
     """
-    covM_cols = feature_types.get('covM', [])
-    if len(covM_cols) == 0:
-        return px.imshow([[0]], title="No covM features found")
-    
-    # 提取covM特征数据
-    covM_data = df[covM_cols].values
-    
-    # 计算协方差矩阵（如果covM特征数量合理）
-    # 注意：covM特征本身可能已经是协方差矩阵的元素，我们需要理解其结构
-    # 这里我们计算这些特征之间的相关性矩阵
-    if covM_data.shape[1] > 1:
-        corr_matrix = np.corrcoef(covM_data.T)
-        
-        # 如果特征太多，只取前30x30
-        max_size = 30
-        if corr_matrix.shape[0] > max_size:
-            corr_matrix = corr_matrix[:max_size, :max_size]
-            labels = covM_cols[:max_size]
-        else:
-            labels = covM_cols
-        
-        fig = px.imshow(corr_matrix,
-                       title='Covariance Matrix Features Correlation (协方差矩阵特征相关性)',
-                       labels=dict(x='Features (特征)', y='Features (特征)', color='Correlation (相关性)'),
-                       color_continuous_scale='RdBu',
-                       aspect='auto')
-        return fig
-    else:
-        return px.scatter(title="Insufficient covM features for correlation matrix")
+    if engine is None or engine.size == 0:
+        return px.imshow([[0]], title=f"No {family} features found")
+    if engine.size < 2:
+        return px.scatter(title=f"Insufficient {family} features for correlation matrix")
+    
+    corr_window = engine.window(row_start, col_start, size)
+    row_labels = engine.columns[row_start:row_start + corr_window.shape[0]]
+    col_labels = engine.columns[col_start:col_start + corr_window.shape[1]]
+    
+    fig = px.imshow(corr_window, x=col_labels, y=row_labels,
+                   title=f'{family} Features Correlation (特征相关性) - '
+                         f'rows {row_start}-{row_start + len(row_labels) - 1}, '
+                         f'cols {col_start}-{col_start + len(col_labels) - 1} of {engine.size}',
+                   labels=dict(x='Features (特征)', y='Features (特征)', color='Correlation (相关性)'),
+                   color_continuous_scale='RdBu',
+                   zmin=-1, zmax=1,
+                   aspect='auto')
+    return fig
 
-def plot_frequency_spectrum(df, feature_types, sensor_id='0'):
+def plot_frequency_spectrum(spectrum_df, sensor_id='0', layout='overlay', show_ci=True):
     """
     频率结构分析 - 绘制频谱图
-    freq_xxx_sensor_id 是频率特征，例如 lag1_freq_010_0
+    spectrum_df 来自 prepare_spectrum_data：Frequency / Amplitude / CI_Low / CI_High / State / Sensor
+    多个传感器时 layout='overlay' 叠加在同一坐标轴（线型区分传感器），
+    layout='small_multiples' 每个传感器一个子图
     """
-    freq_cols = feature_types.get('freq', [])
-    # 筛选特定传感器的频率特征
-    sensor_freq_cols = [c for c in freq_cols if c.endswith(f'_{sensor_id}')]
-    
-    if len(sensor_freq_cols) == 0:
+    if spectrum_df.empty:
         return px.line(title=f"No frequency features for sensor {sensor_id}")
     
-    # 按状态分组计算平均频率值
-    label_map = {
-        0: "Neutral (中性)", 
-        1: "Relaxed (放松)", 
-        2: "Concentrating (专注)"
-    }
-    df_mapped = df.copy()
-    df_mapped['Label'] = df_mapped['Label'].map(label_map).fillna(df_mapped['Label'])
-    
-    # 提取频率编号（例如：lag1_freq_010_0 -> 010）
-    freq_values = []
-    freq_cols_sorted = sorted(sensor_freq_cols)
-    
-    for col in freq_cols_sorted:
-        # 尝试从列名提取频率值
-        # 格式通常是：lag1_freq_010_0 或 lag1_freq_020_0
-        parts = col.split('_')
-        freq_val = None
-        for part in parts:
-            if part.isdigit() and len(part) >= 2:
-                freq_val = int(part)
-                break
-        if freq_val is None:
-            # 如果找不到，使用列名的hash作为频率值（用于排序）
-            freq_val = hash(col) % 1000
-        freq_values.append(freq_val)
-    
-    # 按状态分组计算平均值
-    plot_data = []
-    for state in df_mapped['Label'].unique():
-        state_data = df_mapped[df_mapped['Label'] == state][freq_cols_sorted].mean()
-        for freq, val in zip(freq_values, state_data):
-            plot_data.append({
-                'Frequency': freq,
-                'Amplitude': val,
-                'State': state
-            })
-    
-    plot_df = pd.DataFrame(plot_data)
-    
-    # 按频率排序
-    plot_df = plot_df.sort_values('Frequency')
-    
-    # 绘制频谱图
-    fig = px.line(plot_df, x='Frequency', y='Amplitude', color='State',
-                  title=f'Frequency Spectrum Analysis - Sensor {sensor_id} (频率结构分析 - 传感器 {sensor_id})',
-                  labels={'Frequency': 'Frequency Index (频率索引)', 
-                         'Amplitude': 'Amplitude (幅值)',
-                         'State': 'State (状态)'},
-                  template='plotly_white')
+    sensors = list(pd.unique(spectrum_df['Sensor']))
+    states = list(pd.unique(spectrum_df['State']))
+    facets = layout == 'small_multiples' and len(sensors) > 1
+    colors = px.colors.qualitative.Plotly
+    dashes = ['solid', 'dash', 'dot', 'dashdot']
+    
+    fig = make_subplots(rows=1, cols=len(sensors) if facets else 1, shared_yaxes=True,
+                        subplot_titles=sensors if facets else None)
+    for si, sensor in enumerate(sensors):
+        col = si + 1 if facets else 1
+        for ci, state in enumerate(states):
+            d = spectrum_df[(spectrum_df['Sensor'] == sensor) & (spectrum_df['State'] == state)]
+            color = colors[ci % len(colors)]
+            name = state if facets or len(sensors) == 1 else f"{state} - {sensor}"
+            if show_ci:
+                # 95% 置信区间带
+                r, g, b = px.colors.hex_to_rgb(color)
+                fig.add_trace(go.Scatter(x=np.concatenate([d['Frequency'], d['Frequency'][::-1]]),
+                                         y=np.concatenate([d['CI_High'], d['CI_Low'][::-1]]),
+                                         fill='toself', fillcolor=f'rgba({r},{g},{b},0.15)',
+                                         line=dict(width=0), hoverinfo='skip',
+                                         showlegend=False, legendgroup=name),
+                              row=1, col=col)
+            fig.add_trace(go.Scatter(x=d['Frequency'], y=d['Amplitude'], mode='lines', name=name,
+                                     line=dict(color=color, dash='solid' if facets else dashes[si % len(dashes)]),
+                                     legendgroup=name, showlegend=not facets or si == 0),
+                          row=1, col=col)
+    
+    if len(sensors) == 1:
+        title = f'Frequency Spectrum Analysis - Sensor {sensor_id} (频率结构分析 - 传感器 {sensor_id})'
+    else:
+        title = 'Frequency Spectrum Analysis - All Sensors (频率结构分析 - 全部传感器)'
+    fig.update_xaxes(title_text='Frequency Index (频率索引)')
+    fig.update_yaxes(title_text='Amplitude (幅值)', col=1)
+    fig.update_layout(title=title, legend_title_text='State (状态)', template='plotly_white')
     
     return fig
 
-def plot_feature_correlation_network(df, feature_types, selected_types=['mean', 'std', 'skew'], 
-                                     top_n=30, threshold=0.7):
+def plot_feature_correlation_network(network, feature_types, selected_types=['mean', 'std', 'skew'], 
+                                     threshold=0.7):
     """
     特征相关性网络图
-    选择特定类型的特征，计算相关性，绘制网络图
-    使用简单的力导向布局算法
+    network 来自 utils.prep.get_correlation_network（边 + 缓存的力导向布局）
     """
-    # 收集选定的特征
-    selected_features = []
-    for feat_type in selected_types:
-        selected_features.extend(feature_types.get(feat_type, []))
-    
-    if len(selected_features) == 0:
+    if network is None:
         return px.scatter(title="No features selected")
     
-    # 限制特征数量
-    if len(selected_features) > top_n:
-        selected_features = selected_features[:top_n]
-    
-    # 提取特征数据并计算相关性
-    feat_data = df[selected_features].values
-    corr_matrix = np.corrcoef(feat_data.T)
+    selected_features = network["features"]
+    pos = network["pos"]
+    edge_i, edge_j, _ = network["edges"]
     
-    # 构建边的列表（相关性高于阈值）
-    edges = []
-    for i in range(len(selected_features)):
-        for j in range(i+1, len(selected_features)):
-            corr_val = corr_matrix[i, j]
-            if abs(corr_val) >= threshold:
-                edges.append((i, j, abs(corr_val)))
-    
-    if len(edges) == 0:
+    if len(edge_i) == 0:
         return px.scatter(title=f"No correlations above threshold {threshold}")
     
-    # 简单的力导向布局（简化版）
-    n_nodes = len(selected_features)
-    pos = np.random.rand(n_nodes, 2) * 2 - 1  # 初始随机位置
-    
-    # 迭代几次更新位置（简单的力导向算法）
-    for _ in range(50):
-        new_pos = pos.copy()
-        for i in range(n_nodes):
-            force = np.zeros(2)
-            for j in range(n_nodes):
-                if i != j:
-                    diff = pos[i] - pos[j]
-                    dist = np.linalg.norm(diff) + 0.01
-                    # 排斥力
-                    force += diff / dist * 0.1
-                    # 如果有边，添加吸引力
-                    for edge in edges:
-                        if (edge[0] == i and edge[1] == j) or (edge[0] == j and edge[1] == i):
-                            force -= diff * 0.05
-            new_pos[i] += force
-        pos = new_pos
-        # 归一化到[-1, 1]范围
-        pos = (pos - pos.mean(axis=0)) / (pos.std(axis=0) + 0.01) * 0.5
-    
-    # 提取节点和边的位置
-    edge_x = []
-    edge_y = []
-    for edge in edges:
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
+    # 提取边的位置：每条边 [x0, x1, None]，用 NaN 断开线段
+    gap = np.full(len(edge_i), np.nan)
+    edge_x = np.column_stack([pos[edge_i, 0], pos[edge_j, 0], gap]).ravel()
+    edge_y = np.column_stack([pos[edge_i, 1], pos[edge_j, 1], gap]).ravel()
     
     # 创建边的trace
     edge_trace = go.Scatter(x=edge_x, y=edge_y,
@@ -367,25 +441,21 @@ def plot_feature_correlation_network(df, feature_types, selected_types=['mean',
                            mode='lines')
     
     # 创建节点的trace
-    node_x = []
-    node_y = []
     node_text = []
     node_hover = []
     node_color = []
     type_colors = {'mean': '#ef553b', 'std': '#636efa', 'skew': '#00cc96', 'kurt': '#ffa15a'}
-    
-    for i, feat in enumerate(selected_features):
-        x, y = pos[i]
-        node_x.append(x)
-        node_y.append(y)
+    # 特征 -> 类型，按选中顺序建立一次，避免逐节点扫描列表
+    feature_type_of = {}
+    for t in reversed(selected_types):
+        for feat in feature_types.get(t, []):
+            feature_type_of[feat] = t
+    
+    node_x = pos[:, 0]
+    node_y = pos[:, 1]
+    for feat in selected_features:
         # 确定特征类型
-        feat_type = None
-        for t in selected_types:
-            if feat in feature_types.get(t, []):
-                feat_type = t
-                break
-        if feat_type is None:
-            feat_type = 'unknown'
+        feat_type = feature_type_of.get(feat, 'unknown')
         
         node_text.append(feat.split('_')[-1])  # 显示最后一个部分（通常是传感器ID）
         node_hover.append(f"{feat}<br>Type: {feat_type}")
@@ -418,4 +488,7 @@ def plot_feature_correlation_network(df, feature_types, selected_types=['mean',
                        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
                        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)))
     
-    return fig
\ No newline at end of file
+    return fig
+
+# 调试模式下为公开函数计时（未开启时只多一次判断）
+instrument(globals(), "viz")